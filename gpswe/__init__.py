@@ -9,5 +9,7 @@ from .config import *
 from .protocols import *
 from .gps_server import *
 from .connections import *
+from .datagrams import *
+from .workers import *
 
 __version__ = "0.0.1"
@@ -1 +1,2 @@
 from .settings import *
+from .logging_config import *
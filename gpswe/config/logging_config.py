@@ -0,0 +1,35 @@
+import logging
+import logging.handlers
+import queue
+from config.settings import settings
+from protocols.utils.log_summary import set_log_summary_interval
+
+_handler = None
+
+
+def configure_logging(level: str = None, use_queue: bool = None):
+    """
+    Настройка логирования сервера. При LOG_QUEUE запись в поток вывода
+    выполняется в отдельном потоке через QueueHandler/QueueListener,
+    и цикл событий не блокируется. Возвращает QueueListener или None
+    """
+    global _handler
+    level = level or settings.LOG_LEVEL or "INFO"
+    use_queue = settings.LOG_QUEUE if use_queue is None else use_queue
+    if settings.LOG_SUMMARY_INTERVAL:
+        set_log_summary_interval(settings.LOG_SUMMARY_INTERVAL)
+    root = logging.getLogger()
+    if _handler is not None:
+        root.removeHandler(_handler)
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter(logging.BASIC_FORMAT))
+    listener = None
+    if use_queue:
+        log_queue = queue.SimpleQueue()
+        listener = logging.handlers.QueueListener(log_queue, handler)
+        listener.start()
+        handler = logging.handlers.QueueHandler(log_queue)
+    _handler = handler
+    root.addHandler(handler)
+    root.setLevel(level)
+    return listener
@@ -8,15 +8,45 @@ class ServerSettings(BaseModel):
     """
 
     BUFF_SIZE: Optional[int]
+    USE_BUFFERED_PROTOCOL: Optional[bool]
+    USE_UVLOOP: Optional[bool]
     HOST: Optional[str]
     PORT: Optional[int]
+    WIALON_PORT: Optional[int]
+    EGTS_PORT: Optional[int]
+    WIALON_UDP_PORT: Optional[int]
+    UDP_MAX_PENDING: Optional[int]
+    WORKERS: Optional[int]
+    WORKER_STATS_INTERVAL: Optional[float]
     WIALON_PROTOCOL_VERSION: Optional[str]
     EGTS_PROTOCOL_VERSION: Optional[str]
+    EGTS_BUFFER_LIMIT: Optional[int]
+    EGTS_MAX_FRAME_SIZE: Optional[int]
+    WIALON_MAX_LINE_SIZE: Optional[int]
+    MAX_CONNECTIONS: Optional[int]
+    MAX_CONNECTIONS_PER_IP: Optional[int]
+    IDLE_TIMEOUT: Optional[float]
+    SHUTDOWN_TIMEOUT: Optional[float]
     POSTGRES_DB: Optional[str]
     POSTGRES_USER: Optional[str]
     POSTGRES_PASSWORD: Optional[str]
     POSTGRES_HOST: Optional[str]
     POSTGRES_PORT: Optional[str]
+    POSTGRES_POOL_MIN_SIZE: Optional[int]
+    POSTGRES_POOL_MAX_SIZE: Optional[int]
+    POSTGRES_STATEMENT_CACHE_SIZE: Optional[int]
+    POSTGRES_SENSORS_INDEX: Optional[bool]
+    INGEST_QUEUE_SIZE: Optional[int]
+    INGEST_WRITERS: Optional[int]
+    LOGIN_CACHE_SIZE: Optional[int]
+    LOGIN_CACHE_TTL: Optional[float]
+    LOGIN_RATE_LIMIT: Optional[float]
+    LOGIN_SMOOTHING_WINDOW: Optional[float]
+    LOG_LEVEL: Optional[str]
+    LOG_QUEUE: Optional[bool]
+    LOG_SUMMARY_INTERVAL: Optional[float]
+    METRICS_HOST: Optional[str]
+    METRICS_PORT: Optional[int]
 
 settings = ServerSettings()
 
@@ -25,11 +55,36 @@ settings = ServerSettings()
 """
 
 settings.BUFF_SIZE = 8192
+settings.USE_BUFFERED_PROTOCOL = False
+settings.USE_UVLOOP = False
 settings.HOST = "0.0.0.0"
 settings.PORT = 10500
+settings.WORKER_STATS_INTERVAL = 10
+settings.WIALON_UDP_PORT = None
+settings.UDP_MAX_PENDING = 10000
 settings.WIALON_PROTOCOL_VERSION = "2.0"
+settings.EGTS_BUFFER_LIMIT = 131072
+settings.EGTS_MAX_FRAME_SIZE = 65553
+settings.WIALON_MAX_LINE_SIZE = 65536
+settings.MAX_CONNECTIONS = 50000
+settings.MAX_CONNECTIONS_PER_IP = 1000
+settings.IDLE_TIMEOUT = 600
+settings.SHUTDOWN_TIMEOUT = 30
 settings.POSTGRES_DB = "gpswe_test"
 settings.POSTGRES_USER = "test"
 settings.POSTGRES_PASSWORD = "pass"
 settings.POSTGRES_HOST = "0.0.0.0"
 settings.POSTGRES_PORT = "5432"
+settings.POSTGRES_POOL_MIN_SIZE = 2
+settings.POSTGRES_POOL_MAX_SIZE = 20
+settings.POSTGRES_STATEMENT_CACHE_SIZE = 100
+settings.POSTGRES_SENSORS_INDEX = False
+settings.INGEST_QUEUE_SIZE = 10000
+settings.INGEST_WRITERS = 10
+settings.LOGIN_CACHE_SIZE = 100000
+settings.LOGIN_CACHE_TTL = 3600
+settings.LOGIN_SMOOTHING_WINDOW = 5
+settings.LOG_LEVEL = "INFO"
+settings.LOG_QUEUE = False
+settings.LOG_SUMMARY_INTERVAL = 60
+settings.METRICS_HOST = "127.0.0.1"
@@ -1,57 +1,407 @@
+import asyncio
 import logging
 from protocols.wialon import wialon_protocol
 from protocols.egts import egts_protocol
+from protocols.detection import Protocols
+from protocols.session import Session
+from protocols.utils.wialon_stream import FrameSizeError
+from protocols.db.ingest import IngestQueue
 from config.settings import settings
+from protocols.utils.log_summary import LogSummary
+from protocols.metrics import connections_open, connections_total, connections_shed
 
-logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger("gpswe::handle_connection")
+protocol_logger = logging.getLogger("gpswe::tracker_protocol")
+# Подключения и отключения трекеров выводятся сводкой
+connections_summary = LogSummary(logger)
+protocol_summary = LogSummary(protocol_logger)
 
+# Количество необработанных пакетов, при котором чтение из сокета приостанавливается
+FRAMES_BACKLOG_LIMIT = 64
 
-async def handle_connection(reader, writer):
+
+async def process_wialon(frames: list, session: Session, ingest: IngestQueue):
     """
-    Прослушивание сервера и обработка полученных данных
+    Обработка пакетов Wialon и сборка ответа на них
     """
-    logger = logging.getLogger("gpswe::handle_connection")
-    addr = writer.get_extra_info("peername")
-    dsl = {
-        "database": settings.POSTGRES_DB,
-        "user": settings.POSTGRES_USER,
-        "password": settings.POSTGRES_PASSWORD,
-        "host": settings.POSTGRES_HOST,
-        "port": settings.POSTGRES_PORT,
-    }
-    logger.info(f"Connected by {addr}")
-    while True:
-        try:
-            data = await reader.read(settings.BUFF_SIZE)
-        except ConnectionError:
-            logger.info(f"Client suddenly closed while receiving from {addr}")
-            break
-        if not data:
-            break
-        data = data.upper()
+    answers = []
+    for item in frames:
+        send_data = await wialon_protocol(item, session, ingest)
+        if send_data:
+            answers.append(send_data)
+    return "".join(answers).encode("utf-8")
+
+
+async def process_egts(frames: list, session: Session, ingest: IngestQueue):
+    """
+    Обработка пакетов EGTS и сборка ответа на них
+    """
+    answers = []
+    for item in frames:
+        answers.append(await egts_protocol(item, ingest, session))
+    return b"".join(answers)
+
+
+PROCESSORS = {
+    Protocols.WIALON: process_wialon,
+    Protocols.EGTS: process_egts,
+}
+
+
+class ConnectionLimits:
+    """
+    Ограничения количества соединений и счетчики соединений,
+    закрытых по каждому из правил. Также хранит функции закрытия
+    открытых соединений для плавной остановки сервера
+    """
+
+    def __init__(self, max_connections: int = None, max_per_ip: int = None):
+        self.max_connections = max_connections
+        self.max_per_ip = max_per_ip
+        self.active = 0
+        self.shed = {
+            "max_connections": 0,
+            "max_per_ip": 0,
+            "idle_timeout": 0,
+            "frame_size": 0,
+            "unknown_protocol": 0,
+            "shutdown": 0,
+        }
+        self.closing = False
+        self._per_ip = {}
+        self._closers = set()
+        self._drained = None
+
+    def acquire(self, ip: str, closer=None):
+        """
+        Учет нового соединения, False - если превышен один из лимитов.
+        closer(force) закрывает соединение при остановке сервера
+        """
+        if self.closing:
+            self.count_shed("shutdown")
+            return False
+        if self.max_connections and self.active >= self.max_connections:
+            self.count_shed("max_connections")
+            return False
+        count = self._per_ip.get(ip, 0)
+        if self.max_per_ip and count >= self.max_per_ip:
+            self.count_shed("max_per_ip")
+            return False
+        self.active += 1
+        self._per_ip[ip] = count + 1
+        if closer is not None:
+            self._closers.add(closer)
+        connections_open.inc()
+        connections_total.inc()
+        return True
+
+    def count_shed(self, reason: str):
+        """
+        Учет соединения, закрытого по одному из правил
+        """
+        self.shed[reason] += 1
+        connections_shed.inc(reason)
+
+    def release(self, ip: str, closer=None):
+        """
+        Учет закрытого соединения
+        """
+        self.active -= 1
+        connections_open.dec()
+        self._closers.discard(closer)
+        count = self._per_ip.pop(ip) - 1
+        if count:
+            self._per_ip[ip] = count
+        if self._drained is not None and not self.active:
+            self._drained.set()
+
+    async def drain(self, timeout: float = None):
+        """
+        Остановка приема новых соединений и закрытие открытых после
+        обработки уже прочитанных пакетов. По истечении timeout оставшиеся
+        соединения закрываются принудительно, возвращается их количество
+        """
+        self.closing = True
+        self._drained = asyncio.Event()
+        if not self.active:
+            return 0
+        for closer in list(self._closers):
+            closer(False)
         try:
-            answer = data.decode("utf-8").split("\r\n")
-            for item in answer:
-                # Обработка Wialon протокола
-                send_data = await wialon_protocol(item, addr, dsl)
-                # Отправление ответа клиенту
-                try:
-                    writer.write(bytearray(send_data.encode("utf-8")))
-                    await writer.drain()
-                except ConnectionError:
-                    logger.info("Client suddenly closed, cannot send")
-                    break
-        except UnicodeDecodeError:
-            answer = data
-            # Обработка EGTS протокола
-            send_data = await egts_protocol(answer, dsl)
+            await asyncio.wait_for(self._drained.wait(), timeout)
+            return 0
+        except asyncio.TimeoutError:
+            forced = self.active
+            for closer in list(self._closers):
+                closer(True)
+            return forced
+
+    def as_dict(self):
+        return {"active": self.active, "shed": dict(self.shed)}
+
+
+async def handle_connection(
+    reader,
+    writer,
+    ingest: IngestQueue,
+    protocol: Protocols = None,
+    limits: ConnectionLimits = None,
+):
+    """
+    Прослушивание сервера и обработка полученных данных
+    """
+    session = Session(writer.get_extra_info("peername"), protocol)
+    ip = session.addr[0] if session.addr else None
+    if limits is None:
+        limits = ConnectionLimits()
+
+    def close_connection(force: bool):
+        if force:
+            writer.transport.abort()
+            return
+        # Уже прочитанные данные будут обработаны, после чего read вернет EOF
+        writer.transport.pause_reading()
+        reader.feed_eof()
+
+    if not limits.acquire(ip, close_connection):
+        logger.warning(f"Connection limit reached, closing {session.addr}")
+        writer.close()
+        await writer.wait_closed()
+        return
+    connections_summary.add("connected", "Connected by %s", session.addr)
+    try:
+        while True:
+            try:
+                if settings.IDLE_TIMEOUT:
+                    data = await asyncio.wait_for(
+                        reader.read(settings.BUFF_SIZE), settings.IDLE_TIMEOUT
+                    )
+                else:
+                    data = await reader.read(settings.BUFF_SIZE)
+            except asyncio.TimeoutError:
+                limits.count_shed("idle_timeout")
+                connections_summary.add(
+                    "idle_timeout", "Idle timeout, closing %s", session.addr
+                )
+                break
+            except ConnectionError:
+                connections_summary.add(
+                    "closed_while_receiving",
+                    "Client suddenly closed while receiving from %s",
+                    session.addr,
+                )
+                break
+            if not data:
+                break
+            # Протокол определяется один раз на соединение
+            if session.framer is None and not session.pin(data, settings):
+                limits.count_shed("unknown_protocol")
+                logger.warning(f"Unknown protocol from {session.addr}")
+                break
+            try:
+                frames = session.framer.feed(data)
+            except FrameSizeError as e:
+                limits.count_shed("frame_size")
+                logger.warning(f"Frame of {e} bytes is too large from {session.addr}")
+                break
+            try:
+                send_data = await PROCESSORS[session.protocol](
+                    frames, session, ingest
+                )
+            except Exception:
+                logger.exception(
+                    f"Error processing packets from {session.addr}, closing"
+                )
+                break
+            if not send_data:
+                continue
             # Отправление ответа клиенту
             try:
                 writer.write(send_data)
                 await writer.drain()
             except ConnectionError:
-                logger.info("Client suddenly closed, cannot send")
+                connections_summary.add(
+                    "closed_while_sending", "Client suddenly closed, cannot send"
+                )
                 break
-    writer.close()
-    await writer.wait_closed()
-    logger.info(f"Disconnected by: {addr}")
+    finally:
+        limits.release(ip, close_connection)
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except ConnectionError:
+            pass
+        connections_summary.add("disconnected", "Disconnected by: %s", session.addr)
+
+
+class TrackerProtocol(asyncio.BufferedProtocol):
+    """
+    Обработка соединения трекера без StreamReader/StreamWriter:
+    данные читаются в общий заранее выделенный буфер сервера
+    """
+
+    __slots__ = (
+        "ingest",
+        "limits",
+        "session",
+        "transport",
+        "buffer",
+        "frames",
+        "task",
+        "timer",
+        "last_read",
+        "counted",
+        "closing",
+    )
+
+    def __init__(
+        self,
+        ingest: IngestQueue,
+        buffer: memoryview,
+        protocol: Protocols = None,
+        limits: ConnectionLimits = None,
+    ):
+        self.ingest = ingest
+        self.buffer = buffer
+        self.limits = limits if limits is not None else ConnectionLimits()
+        self.session = Session(None, protocol)
+        self.transport = None
+        self.frames = []
+        self.task = None
+        self.timer = None
+        self.last_read = 0.0
+        self.counted = False
+        self.closing = False
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.session.addr = transport.get_extra_info("peername")
+        if not self.limits.acquire(self.session.addr[0], self.close):
+            protocol_logger.warning(
+                f"Connection limit reached, closing {self.session.addr}"
+            )
+            transport.abort()
+            return
+        self.counted = True
+        protocol_summary.add("connected", "Connected by %s", self.session.addr)
+        if settings.IDLE_TIMEOUT:
+            loop = asyncio.get_running_loop()
+            self.last_read = loop.time()
+            self.timer = loop.call_later(settings.IDLE_TIMEOUT, self._check_idle)
+
+    def _check_idle(self):
+        """
+        Закрытие соединения без данных дольше IDLE_TIMEOUT. Таймер не
+        пересоздается на каждое чтение, а переносится на оставшееся время
+        """
+        loop = asyncio.get_running_loop()
+        idle = loop.time() - self.last_read
+        if idle < settings.IDLE_TIMEOUT:
+            self.timer = loop.call_later(
+                settings.IDLE_TIMEOUT - idle, self._check_idle
+            )
+            return
+        self.timer = None
+        self.limits.count_shed("idle_timeout")
+        protocol_summary.add(
+            "idle_timeout", "Idle timeout, closing %s", self.session.addr
+        )
+        self.transport.close()
+
+    def close(self, force: bool):
+        """
+        Закрытие соединения при остановке сервера: новые данные не читаются,
+        соединение закрывается после ответа на уже прочитанные пакеты
+        """
+        if force:
+            self.transport.abort()
+            return
+        self.closing = True
+        self.transport.pause_reading()
+        if self.task is None:
+            self.transport.close()
+
+    def get_buffer(self, sizehint: int):
+        return self.buffer
+
+    def buffer_updated(self, nbytes: int):
+        session = self.session
+        data = self.buffer[:nbytes]
+        if self.timer is not None:
+            self.last_read = asyncio.get_running_loop().time()
+        # Протокол определяется один раз на соединение
+        if session.framer is None and not session.pin(data, settings):
+            self.limits.count_shed("unknown_protocol")
+            protocol_logger.warning(f"Unknown protocol from {session.addr}")
+            self.transport.close()
+            return
+        # Буфер общий для всех соединений, поэтому данные сразу передаются
+        # в нарезчик, который копирует их в собственный буфер соединения
+        try:
+            frames = session.framer.feed(data)
+        except FrameSizeError as e:
+            self.limits.count_shed("frame_size")
+            protocol_logger.warning(
+                f"Frame of {e} bytes is too large from {session.addr}"
+            )
+            self.transport.close()
+            return
+        if not frames:
+            return
+        self.frames.extend(frames)
+        if len(self.frames) >= FRAMES_BACKLOG_LIMIT:
+            self.transport.pause_reading()
+        if self.task is None:
+            self.task = asyncio.ensure_future(self._process())
+
+    async def _process(self):
+        """
+        Последовательная обработка накопленных пакетов соединения.
+        При ошибке обработчика она записывается в журнал, а соединение
+        закрывается
+        """
+        try:
+            while self.frames:
+                frames, self.frames = self.frames, []
+                send_data = await PROCESSORS[self.session.protocol](
+                    frames, self.session, self.ingest
+                )
+                if send_data and not self.transport.is_closing():
+                    self.transport.write(send_data)
+            if self.closing:
+                self.transport.close()
+            elif not self.transport.is_closing():
+                self.transport.resume_reading()
+        except Exception:
+            protocol_logger.exception(
+                f"Error processing packets from {self.session.addr}, closing"
+            )
+            self.frames = []
+            self.transport.close()
+        finally:
+            self.task = None
+
+    def eof_received(self):
+        return False
+
+    def connection_lost(self, exc):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        if not self.counted:
+            return
+        self.counted = False
+        self.limits.release(self.session.addr[0], self.close)
+        protocol_summary.add(
+            "disconnected", "Disconnected by: %s", self.session.addr
+        )
+
+
+def tracker_protocol_factory(
+    ingest: IngestQueue, protocol: Protocols = None, limits: ConnectionLimits = None
+):
+    """
+    Фабрика TrackerProtocol с общим буфером приема для всех соединений
+    """
+    buffer = memoryview(bytearray(settings.BUFF_SIZE))
+    return lambda: TrackerProtocol(ingest, buffer, protocol, limits)
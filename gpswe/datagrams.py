@@ -0,0 +1,78 @@
+import asyncio
+import logging
+from protocols.wialon import wialon_protocol
+from protocols.detection import Protocols
+from protocols.session import Session
+from protocols.utils.wialon_stream import split_wialon_datagram
+from protocols.db.ingest import IngestQueue
+from protocols.metrics import udp_datagrams
+
+logger = logging.getLogger("gpswe::wialon_datagram_protocol")
+
+
+class WialonDatagramProtocol(asyncio.DatagramProtocol):
+    """
+    Прием пакетов Wialon IPS по UDP. Каждая датаграмма обрабатывается
+    отдельно, без состояния соединения, ответ отправляется отправителю
+    """
+
+    def __init__(self, ingest: IngestQueue, max_pending: int = 10000):
+        self.ingest = ingest
+        self.max_pending = max_pending
+        self.transport = None
+        self.tasks = set()
+        self.dropped = 0
+        self.closing = False
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data: bytes, addr):
+        if self.closing:
+            return
+        # Чтение UDP нельзя приостановить, поэтому при перегрузке
+        # датаграммы отбрасываются, и трекер повторит отправку
+        if len(self.tasks) >= self.max_pending:
+            self.dropped += 1
+            udp_datagrams.inc("dropped")
+            return
+        udp_datagrams.inc("received")
+        task = asyncio.ensure_future(self._process(data, addr))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def _process(self, data: bytes, addr):
+        """
+        Обработка пакетов датаграммы и отправка ответа
+        """
+        session = Session(addr, Protocols.WIALON)
+        answers = []
+        for imei, frame in split_wialon_datagram(data):
+            if imei is not None:
+                session.imei = imei
+            send_data = await wialon_protocol(frame, session, self.ingest)
+            if send_data:
+                answers.append(send_data)
+        if answers and not self.transport.is_closing():
+            self.transport.sendto("".join(answers).encode("utf-8"), addr)
+
+    def error_received(self, exc):
+        logger.warning(f"UDP error: {exc}")
+
+    async def drain(self, timeout: float = None):
+        """
+        Остановка приема и ожидание обработки принятых датаграмм,
+        возвращает количество прерванных по истечении timeout
+        """
+        self.closing = True
+        tasks = list(self.tasks)
+        if tasks:
+            await asyncio.wait(tasks, timeout=timeout)
+        pending = [task for task in tasks if not task.done()]
+        for task in pending:
+            task.cancel()
+        self.transport.close()
+        return len(pending)
+
+    def as_dict(self):
+        return {"pending": len(self.tasks), "dropped": self.dropped}
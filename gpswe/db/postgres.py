@@ -31,6 +31,7 @@ init_gpswe = """
         alt INTEGER,
         sats INTEGER,
         crc16 INTEGER NOT NULL,
+        navigate_time timestamp with time zone,
         created timestamp with time zone,
         modified timestamp with time zone,
         FOREIGN KEY (imei) REFERENCES gpswe.wialon_login(imei) ON DELETE CASCADE
@@ -56,6 +57,9 @@ init_gpswe = """
         adc TEXT,
         lbutton TEXT,
         params TEXT,
+        navigate_time timestamp with time zone,
+        sensors JSONB,
+        adc_values NUMERIC[],
         created timestamp with time zone,
         modified timestamp with time zone,
         FOREIGN KEY (imei) REFERENCES gpswe.wialon_login(imei) ON DELETE CASCADE
@@ -77,9 +81,29 @@ init_gpswe = """
         long_deg DECIMAL NOT NULL,
         speed INTEGER NOT NULL,
         course INTEGER NOT NULL,
+        navigate_time timestamp with time zone,
         created timestamp with time zone,
         modified timestamp with time zone
     );
+
+    -- navigate_time для таблиц, созданных до появления столбца
+    ALTER TABLE gpswe.wialon_cut_data
+        ADD COLUMN IF NOT EXISTS navigate_time timestamp with time zone;
+    ALTER TABLE gpswe.wialon_extend_data
+        ADD COLUMN IF NOT EXISTS navigate_time timestamp with time zone;
+    ALTER TABLE gpswe.egts_data
+        ADD COLUMN IF NOT EXISTS navigate_time timestamp with time zone;
+    ALTER TABLE gpswe.wialon_extend_data
+        ADD COLUMN IF NOT EXISTS sensors JSONB,
+        ADD COLUMN IF NOT EXISTS adc_values NUMERIC[];
+
+    CREATE INDEX IF NOT EXISTS wialon_extend_data_imei_time_idx
+        ON gpswe.wialon_extend_data (imei, navigate_time);
+"""
+
+init_sensors_index = """
+    CREATE INDEX IF NOT EXISTS wialon_extend_data_sensors_idx
+        ON gpswe.wialon_extend_data USING GIN (sensors);
 """
 
 get_cut_wialon_info_sql = """
@@ -128,6 +152,24 @@ get_egts_info_sql = """
     WHERE dt.datetime BETWEEN '{from_datetime}' AND '{to_datetime}'
 """
 
+get_sensor_series_sql = """
+    SELECT navigate_time,
+    CASE WHEN jsonb_typeof(sensors -> $2::text) = 'number'
+    THEN (sensors ->> $2::text)::numeric END AS value
+    FROM gpswe.wialon_extend_data
+    WHERE imei = $1 AND sensors ? $2::text
+    AND navigate_time BETWEEN $3 AND $4
+    ORDER BY navigate_time
+"""
+
+get_adc_series_sql = """
+    SELECT navigate_time, adc_values[$2::integer] AS value
+    FROM gpswe.wialon_extend_data
+    WHERE imei = $1 AND cardinality(adc_values) >= $2::integer
+    AND navigate_time BETWEEN $3 AND $4
+    ORDER BY navigate_time
+"""
+
 check_egts_sql = """
     SELECT EXISTS
     ( SELECT 1
@@ -153,12 +195,15 @@ async def conn_context_postgres(dsl: dict):
     await conn.close()
 
 
-async def postgres_init(dsl: dict):
+async def postgres_init(dsl: dict, sensors_index: bool = False):
     """
-    Создание всех необходимых таблиц
+    Создание всех необходимых таблиц, GIN-индекс по доп. параметрам
+    создается по запросу
     """
     async with conn_context_postgres(dsl) as conn:
         await conn.execute(init_gpswe)
+        if sensors_index:
+            await conn.execute(init_sensors_index)
 
 
 async def postgres_get_info(
@@ -171,53 +216,105 @@ async def postgres_get_info(
     Получение информации по GPS в промежуток времени
     """
     async with conn_context_postgres(dsl) as conn:
-        resp = []
-        resp_data = {"speed": "", "distance": "", "coordinates": []}
-        extend_wialon = await conn.fetchval(check_extend_wialon_sql.format(imei=imei))
-        if extend_wialon:
-            resp = await conn.fetchval(
-                get_extend_wialon_info_sql.format(
-                    imei=imei,
-                    from_datetime=from_datetime,
-                    to_datetime=to_datetime,
-                )
-            )
-        cut_wialon = await conn.fetchval(check_cut_wialon_sql.format(imei=imei))
-        if cut_wialon:
-            resp = await conn.fetchval(
-                get_cut_wialon_info_sql.format(
-                    imei=imei,
-                    from_datetime=from_datetime,
-                    to_datetime=to_datetime,
-                )
-            )
-        egts = await conn.fetchval(check_egts_sql.format(imei=imei))
-        if egts:
-            resp = await conn.fetch(
-                get_egts_info_sql.format(
-                    imei=imei,
-                    from_datetime=from_datetime,
-                    to_datetime=to_datetime,
-                )
+        return await _get_info(conn, imei, from_datetime, to_datetime)
+
+
+async def postgres_pool_get_info(
+    pool,
+    imei: str,
+    from_datetime: datetime.datetime,
+    to_datetime: datetime.datetime,
+):
+    """
+    Получение информации по GPS в промежуток времени через общий пул
+    """
+    async with pool.acquire() as conn:
+        return await _get_info(conn, imei, from_datetime, to_datetime)
+
+
+async def _get_info(
+    conn,
+    imei: str,
+    from_datetime: datetime.datetime,
+    to_datetime: datetime.datetime,
+):
+    """
+    Запросы информации по GPS через открытое соединение
+    """
+    resp = []
+    resp_data = {"speed": "", "distance": "", "coordinates": []}
+    extend_wialon = await conn.fetchval(check_extend_wialon_sql.format(imei=imei))
+    if extend_wialon:
+        resp = await conn.fetchval(
+            get_extend_wialon_info_sql.format(
+                imei=imei,
+                from_datetime=from_datetime,
+                to_datetime=to_datetime,
             )
-        if len(resp) > 0:
-            resp_data["speed"] = await get_average_speed(
-                [item.get("speed") for item in resp]
+        )
+    cut_wialon = await conn.fetchval(check_cut_wialon_sql.format(imei=imei))
+    if cut_wialon:
+        resp = await conn.fetchval(
+            get_cut_wialon_info_sql.format(
+                imei=imei,
+                from_datetime=from_datetime,
+                to_datetime=to_datetime,
             )
-            resp_data["distance"] = await get_distance(
-                [
-                    [float(item.get("lat_deg")), float(item.get("long_deg"))]
-                    for item in resp
-                ]
+        )
+    egts = await conn.fetchval(check_egts_sql.format(imei=imei))
+    if egts:
+        resp = await conn.fetch(
+            get_egts_info_sql.format(
+                imei=imei,
+                from_datetime=from_datetime,
+                to_datetime=to_datetime,
             )
-            resp_data["coordinates"] = [
-                {
-                    "latitude": float(item.get("lat_deg")),
-                    "longitude": float(item.get("long_deg")),
-                }
-                for item in resp
-            ]
-        return resp_data
+        )
+    if len(resp) > 0:
+        resp_data["speed"] = await get_average_speed(
+            [item.get("speed") for item in resp]
+        )
+        resp_data["distance"] = await get_distance(
+            [[float(item.get("lat_deg")), float(item.get("long_deg"))] for item in resp]
+        )
+        resp_data["coordinates"] = [
+            {
+                "latitude": float(item.get("lat_deg")),
+                "longitude": float(item.get("long_deg")),
+            }
+            for item in resp
+        ]
+    return resp_data
+
+
+async def postgres_get_sensor_series(
+    conn,
+    imei: str,
+    sensor: str,
+    from_datetime: datetime.datetime,
+    to_datetime: datetime.datetime,
+):
+    """
+    Значения доп. параметра Wialon в промежуток времени: записи
+    (navigate_time, value), нечисловое значение - NULL
+    """
+    return await conn.fetch(
+        get_sensor_series_sql, imei, sensor, from_datetime, to_datetime
+    )
+
+
+async def postgres_get_adc_series(
+    conn,
+    imei: str,
+    index: int,
+    from_datetime: datetime.datetime,
+    to_datetime: datetime.datetime,
+):
+    """
+    Значения входа ADC (нумерация с 1) в промежуток времени: записи
+    (navigate_time, value)
+    """
+    return await conn.fetch(get_adc_series_sql, imei, index, from_datetime, to_datetime)
 
 
 async def get_average_speed(speed_list: list):
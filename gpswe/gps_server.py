@@ -1,11 +1,47 @@
 import asyncio
+import contextlib
 import datetime
+import functools
+import signal
 from config.settings import settings
+from config.logging_config import configure_logging
 import logging
-from connections import handle_connection
-from db.postgres import postgres_init, postgres_get_info
+from connections import (
+    ConnectionLimits,
+    handle_connection,
+    tracker_protocol_factory,
+)
+from datagrams import WialonDatagramProtocol
+from db.postgres import (
+    conn_context_postgres,
+    postgres_init,
+    postgres_get_info,
+    postgres_pool_get_info,
+    postgres_get_sensor_series,
+    postgres_get_adc_series,
+)
+from protocols.db.pool import PostgresPool, pool_context_postgres
+from protocols.db.ingest import IngestQueue
+from protocols.db.login_cache import LoginCache
+from protocols.detection import Protocols
+from protocols.metrics import start_metrics_server
+from protocols.utils.log_summary import flush_log_summaries
 
-logging.basicConfig(level=logging.DEBUG)
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+logger = logging.getLogger("gpswe::start_server")
+
+
+def new_event_loop():
+    """
+    Создание цикла событий, uvloop используется при наличии и включенной настройке
+    """
+    if settings.USE_UVLOOP and uvloop is not None:
+        return uvloop.new_event_loop()
+    return asyncio.new_event_loop()
 
 
 async def _init_db():
@@ -28,7 +64,7 @@ async def _init_db():
             "port": settings.POSTGRES_PORT,
         }
         logger.info("Start initialized db")
-        await postgres_init(dsl)
+        await postgres_init(dsl, bool(settings.POSTGRES_SENSORS_INDEX))
     else:
         logger.warning("Not all DB data was provided")
 
@@ -41,11 +77,17 @@ def init_db():
     loop.run_until_complete(_init_db())
 
 
-async def _start_server():
+async def _start_server(
+    wialon_port: int = None,
+    egts_port: int = None,
+    reuse_port: bool = False,
+    report_stats=None,
+    metrics_port: int = None,
+    pool: PostgresPool = None,
+):
     """
     Запуск сервера
     """
-    logger = logging.getLogger("gpswe::start_server")
     if (
         settings.POSTGRES_DB
         and settings.POSTGRES_PORT
@@ -53,26 +95,176 @@ async def _start_server():
         and settings.POSTGRES_PASSWORD
         and settings.POSTGRES_USER
     ):
-        server = await asyncio.start_server(
-            handle_connection, settings.HOST, settings.PORT
+        dsl = {
+            "database": settings.POSTGRES_DB,
+            "user": settings.POSTGRES_USER,
+            "password": settings.POSTGRES_PASSWORD,
+            "host": settings.POSTGRES_HOST,
+            "port": settings.POSTGRES_PORT,
+        }
+        # На общем порту протокол определяется по первым байтам соединения,
+        # на выделенных портах протокол задан заранее
+        listeners = [
+            (settings.PORT, None),
+            (wialon_port or settings.WIALON_PORT, Protocols.WIALON),
+            (egts_port or settings.EGTS_PORT, Protocols.EGTS),
+        ]
+        # Один пул соединений на все время работы сервера,
+        # переданный пул (например, замена БД в нагрузочных тестах) не закрывается
+        pool_context = (
+            pool_context_postgres(
+                dsl,
+                settings.POSTGRES_POOL_MIN_SIZE,
+                settings.POSTGRES_POOL_MAX_SIZE,
+                settings.POSTGRES_STATEMENT_CACHE_SIZE,
+            )
+            if pool is None
+            else contextlib.nullcontext(pool)
         )
-        async with server:
-            logger.info(f"Server started at: {settings.HOST}:{settings.PORT}")
-            await server.serve_forever()
+        async with pool_context as pool:
+            # Очередь отделяет обработку сокетов от записи в БД
+            ingest = IngestQueue(
+                pool,
+                settings.INGEST_QUEUE_SIZE,
+                settings.INGEST_WRITERS,
+                LoginCache(
+                    settings.LOGIN_CACHE_SIZE,
+                    settings.LOGIN_CACHE_TTL,
+                    settings.LOGIN_RATE_LIMIT,
+                    settings.LOGIN_SMOOTHING_WINDOW,
+                ),
+            ).start()
+            limits = ConnectionLimits(
+                settings.MAX_CONNECTIONS, settings.MAX_CONNECTIONS_PER_IP
+            )
+            datagrams = None
+
+            def server_stats():
+                return {
+                    "pool": pool.stats.as_dict(),
+                    "ingest": ingest.stats.as_dict(),
+                    "logins": ingest.logins.as_dict(),
+                    "connections": limits.as_dict(),
+                    "udp": datagrams.as_dict() if datagrams else {},
+                }
+
+            loop = asyncio.get_running_loop()
+            servers = []
+            for port, protocol in listeners:
+                if not port:
+                    continue
+                if settings.USE_BUFFERED_PROTOCOL:
+                    server = await loop.create_server(
+                        tracker_protocol_factory(ingest, protocol, limits),
+                        settings.HOST,
+                        port,
+                        reuse_port=reuse_port,
+                    )
+                else:
+                    server = await asyncio.start_server(
+                        functools.partial(
+                            handle_connection,
+                            ingest=ingest,
+                            protocol=protocol,
+                            limits=limits,
+                        ),
+                        settings.HOST,
+                        port,
+                        reuse_port=reuse_port,
+                    )
+                servers.append(server)
+                logger.info(
+                    f"Server started at: {settings.HOST}:{port} "
+                    f"({protocol.value if protocol else 'auto'})"
+                )
+            # Прием Wialon по UDP без состояния соединения
+            if settings.WIALON_UDP_PORT:
+                _, datagrams = await loop.create_datagram_endpoint(
+                    lambda: WialonDatagramProtocol(ingest, settings.UDP_MAX_PENDING),
+                    local_addr=(settings.HOST, settings.WIALON_UDP_PORT),
+                    reuse_port=reuse_port,
+                )
+                logger.info(
+                    f"UDP server started at: "
+                    f"{settings.HOST}:{settings.WIALON_UDP_PORT} (wialon)"
+                )
+            # Метрики в формате Prometheus на локальном порту
+            if metrics_port:
+                servers.append(
+                    await start_metrics_server(settings.METRICS_HOST, metrics_port)
+                )
+            # Периодическая отправка статистики, например, супервизору воркеров
+            reporter = (
+                asyncio.ensure_future(report_stats(server_stats))
+                if report_stats
+                else None
+            )
+            # SIGTERM и SIGINT запускают плавную остановку сервера
+            stop = asyncio.Event()
+            signals = []
+            for signum in (signal.SIGTERM, signal.SIGINT):
+                try:
+                    loop.add_signal_handler(signum, stop.set)
+                    signals.append(signum)
+                except (NotImplementedError, RuntimeError):
+                    pass
+            try:
+                await stop.wait()
+                logger.info("Shutting down the server")
+            finally:
+                for signum in signals:
+                    loop.remove_signal_handler(signum)
+                if reporter is not None:
+                    reporter.cancel()
+                # Новые соединения не принимаются, открытые закрываются
+                # после ответа на уже прочитанные пакеты
+                for server in servers:
+                    server.close()
+                forced = await limits.drain(settings.SHUTDOWN_TIMEOUT)
+                if forced:
+                    logger.warning(
+                        f"{forced} connections were aborted after the shutdown timeout"
+                    )
+                if datagrams is not None:
+                    interrupted = await datagrams.drain(settings.SHUTDOWN_TIMEOUT)
+                    if interrupted:
+                        logger.warning(
+                            f"{interrupted} UDP datagrams were not answered "
+                            f"before the shutdown timeout"
+                        )
+                for server in servers:
+                    await server.wait_closed()
+                dropped = await ingest.close(settings.SHUTDOWN_TIMEOUT)
+                if dropped:
+                    logger.warning(f"Ingest queue closed with {dropped} unsaved items")
+                flush_log_summaries()
+                logger.info(f"Server stats: {server_stats()}")
     else:
         logger.warning("Not all DB data was provided")
 
 
-def start_server():
+def start_server(wialon_port: int = None, egts_port: int = None):
     """
     Ассинхронный запуск сервера
     """
-    loop = asyncio.new_event_loop()
-    loop.run_until_complete(_start_server())
+    listener = configure_logging()
+    loop = new_event_loop()
+    try:
+        loop.run_until_complete(
+            _start_server(
+                wialon_port, egts_port, metrics_port=settings.METRICS_PORT
+            )
+        )
+    finally:
+        if listener is not None:
+            listener.stop()
 
 
 async def _get_coordinates(
-    imei: str, from_datetime: datetime.datetime, to_datetime: datetime.datetime
+    imei: str,
+    from_datetime: datetime.datetime,
+    to_datetime: datetime.datetime,
+    pool: PostgresPool = None,
 ):
     """
     Получение доп. данных в промежутке дат
@@ -93,6 +285,8 @@ async def _get_coordinates(
             "port": settings.POSTGRES_PORT,
         }
         logger.info("Get extend GPS data")
+        if pool is not None:
+            return await postgres_pool_get_info(pool, imei, from_datetime, to_datetime)
         return await postgres_get_info(dsl, imei, from_datetime, to_datetime)
     else:
         logger.warning("Not all DB data was provided")
@@ -106,3 +300,70 @@ def get_coordinates(
     """
     loop = asyncio.new_event_loop()
     return loop.run_until_complete(_get_coordinates(imei, from_datetime, to_datetime))
+
+
+async def _get_series(
+    query,
+    imei: str,
+    key,
+    from_datetime: datetime.datetime,
+    to_datetime: datetime.datetime,
+    pool: PostgresPool = None,
+):
+    """
+    Получение временного ряда доп. параметра или входа ADC
+    """
+    logger = logging.getLogger("gpswe::get_series")
+    if (
+        settings.POSTGRES_DB
+        and settings.POSTGRES_PORT
+        and settings.POSTGRES_HOST
+        and settings.POSTGRES_PASSWORD
+        and settings.POSTGRES_USER
+    ):
+        dsl = {
+            "database": settings.POSTGRES_DB,
+            "user": settings.POSTGRES_USER,
+            "password": settings.POSTGRES_PASSWORD,
+            "host": settings.POSTGRES_HOST,
+            "port": settings.POSTGRES_PORT,
+        }
+        if pool is not None:
+            async with pool.acquire() as conn:
+                return await query(conn, imei, key, from_datetime, to_datetime)
+        async with conn_context_postgres(dsl) as conn:
+            return await query(conn, imei, key, from_datetime, to_datetime)
+    else:
+        logger.warning("Not all DB data was provided")
+
+
+def get_sensor_series(
+    imei: str,
+    sensor: str,
+    from_datetime: datetime.datetime,
+    to_datetime: datetime.datetime,
+):
+    """
+    Ассинхронный запуск получения значений доп. параметра в промежутке дат
+    """
+    loop = asyncio.new_event_loop()
+    return loop.run_until_complete(
+        _get_series(
+            postgres_get_sensor_series, imei, sensor, from_datetime, to_datetime
+        )
+    )
+
+
+def get_adc_series(
+    imei: str,
+    index: int,
+    from_datetime: datetime.datetime,
+    to_datetime: datetime.datetime,
+):
+    """
+    Ассинхронный запуск получения значений входа ADC в промежутке дат
+    """
+    loop = asyncio.new_event_loop()
+    return loop.run_until_complete(
+        _get_series(postgres_get_adc_series, imei, index, from_datetime, to_datetime)
+    )
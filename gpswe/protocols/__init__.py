@@ -3,3 +3,6 @@ from .models import *
 from .egts import *
 from .wialon import *
 from .utils import *
+from .detection import *
+from .session import *
+from .metrics import *
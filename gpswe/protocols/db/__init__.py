@@ -1,2 +1,5 @@
 from .postgres import *
 from .decorator import *
+from .pool import *
+from .ingest import *
+from .login_cache import *
@@ -1,3 +1,5 @@
+import asyncio
+import inspect
 import logging
 import random
 from functools import wraps
@@ -37,10 +39,33 @@ def backoff(
     ),
 ):
     """
-    backoff-декоратор для отказоустойчивости сервиса при сбоях подключения к БД
+    backoff-декоратор для отказоустойчивости сервиса при сбоях подключения к БД.
+    Для корутин ожидание не блокирует цикл событий, а после последней
+    попытки исключение пробрасывается
     """
 
     def decorator(target):
+        if inspect.iscoroutinefunction(target):
+
+            @wraps(target)
+            async def async_retry(*args, **kwargs):
+                handler.setFormatter(logger_formatter)
+                logger.addHandler(handler)
+                for attempt in range(tries):
+                    try:
+                        return await target(*args, **kwargs)
+                    except Exception as e:
+                        if attempt == tries - 1:
+                            raise
+                        sleep_time = _sleep_time(
+                            start_sleep_time, border_sleep_time, factor, attempt, logger
+                        )
+                        logger.error(f"Exception is catched {e}")
+                        logger.warning(f"Wait fo {sleep_time} seconds and try again")
+                        await asyncio.sleep(sleep_time)
+
+            return async_retry
+
         @wraps(target)
         def retry(*args, **kwargs):
             handler.setFormatter(logger_formatter)
@@ -0,0 +1,141 @@
+import asyncio
+import logging
+import time
+from .pool import PostgresPool
+from .login_cache import LoginCache
+from ..metrics import ingest_items, ingest_wait_seconds
+
+logger = logging.getLogger("gpswe::ingest_queue")
+
+
+class IngestStats:
+    """
+    Статистика очереди записи в БД
+    """
+
+    __slots__ = (
+        "enqueued",
+        "written",
+        "failed",
+        "blocked",
+        "depth",
+        "wait_total",
+        "wait_max",
+    )
+
+    def __init__(self):
+        self.enqueued = 0
+        self.written = 0
+        self.failed = 0
+        self.blocked = 0
+        self.depth = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def add_wait(self, wait_time: float):
+        self.wait_total += wait_time
+        if wait_time > self.wait_max:
+            self.wait_max = wait_time
+
+    def as_dict(self):
+        processed = self.written + self.failed
+        return {
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "failed": self.failed,
+            "blocked": self.blocked,
+            "depth": self.depth,
+            "wait_total": round(self.wait_total, 6),
+            "wait_avg": round(self.wait_total / processed, 6) if processed else 0.0,
+            "wait_max": round(self.wait_max, 6),
+        }
+
+
+class IngestQueue:
+    """
+    Ограниченная очередь между разбором пакетов и записью в БД.
+    Пока очередь заполнена, put ожидает, и чтение из сокета приостанавливается.
+    При нулевом размере очереди данные записываются сразу
+    """
+
+    def __init__(
+        self,
+        pool: PostgresPool,
+        maxsize: int = 10000,
+        writers: int = 10,
+        logins: LoginCache = None,
+    ):
+        self.pool = pool
+        self.logins = logins if logins is not None else LoginCache()
+        self.maxsize = maxsize
+        self.writers = writers
+        self.stats = IngestStats()
+        self._queue = asyncio.Queue(maxsize) if maxsize else None
+        self._tasks = []
+
+    def start(self):
+        """
+        Запуск задач записи в БД
+        """
+        if self._queue is not None:
+            self._tasks = [
+                asyncio.ensure_future(self._writer()) for _ in range(self.writers)
+            ]
+        return self
+
+    async def put(self, save, data):
+        """
+        Постановка данных в очередь на сохранение функцией save(pool, data)
+        """
+        self.stats.enqueued += 1
+        if self._queue is None:
+            await self._save(save, data)
+            return
+        if self._queue.full():
+            self.stats.blocked += 1
+        await self._queue.put((save, data, time.perf_counter()))
+        self.stats.depth = self._queue.qsize()
+
+    async def _save(self, save, data):
+        try:
+            await save(self.pool, data)
+        except Exception as e:
+            self.stats.failed += 1
+            ingest_items.inc("failed")
+            logger.error(f"Failed to save {type(data).__name__}: {e}")
+        else:
+            self.stats.written += 1
+            ingest_items.inc("written")
+
+    async def _writer(self):
+        """
+        Задача записи данных из очереди в БД
+        """
+        while True:
+            save, data, enqueued = await self._queue.get()
+            self.stats.depth = self._queue.qsize()
+            wait_time = time.perf_counter() - enqueued
+            self.stats.add_wait(wait_time)
+            ingest_wait_seconds.observe(wait_time)
+            try:
+                await self._save(save, data)
+            finally:
+                self._queue.task_done()
+
+    async def close(self, timeout: float = 0):
+        """
+        Запись оставшихся в очереди данных не дольше timeout секунд
+        (None - без ограничения) и остановка задач записи.
+        Возвращает количество несохраненных данных
+        """
+        if self._queue is not None and self._tasks and timeout != 0:
+            try:
+                await asyncio.wait_for(self._queue.join(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        # Данные, запись которых была прервана, тоже не сохранены
+        return self.stats.enqueued - self.stats.written - self.stats.failed
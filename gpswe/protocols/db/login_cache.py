@@ -0,0 +1,101 @@
+import asyncio
+import time
+from collections import OrderedDict
+
+
+class RateSmoother:
+    """
+    Равномерное распределение событий во времени (token bucket):
+    событие сверх допустимой частоты ожидает не дольше window секунд
+    """
+
+    __slots__ = ("rate", "burst", "window", "delayed", "_tokens", "_updated")
+
+    def __init__(self, rate: float, window: float = 5.0, burst: int = None):
+        self.rate = rate
+        self.burst = burst or max(1, int(rate))
+        self.window = window
+        self.delayed = 0
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+
+    async def wait(self):
+        """
+        Ожидание своей очереди, возвращает время задержки
+        """
+        now = time.monotonic()
+        self._tokens = min(
+            self.burst, self._tokens + (now - self._updated) * self.rate
+        )
+        self._updated = now
+        self._tokens -= 1
+        if self._tokens >= 0:
+            return 0.0
+        # Отрицательный остаток - уже занятые места в очереди
+        delay = min(-self._tokens / self.rate, self.window)
+        self.delayed += 1
+        await asyncio.sleep(delay)
+        return delay
+
+
+class LoginCache:
+    """
+    LRU-кэш известных трекеров с временем жизни записей.
+    Повторный логин известного трекера не требует обращения к БД,
+    а новые логины распределяются во времени при заданном rate
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 100000,
+        ttl: float = 3600,
+        rate: float = None,
+        window: float = 5.0,
+    ):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.smoother = RateSmoother(rate, window) if rate else None
+        self._items = OrderedDict()
+
+    def __len__(self):
+        return len(self._items)
+
+    def get(self, imei: str):
+        """
+        Сохраненные данные логина или None
+        """
+        item = self._items.get(imei)
+        if item is None or item[0] < time.monotonic():
+            if item is not None:
+                del self._items[imei]
+            self.misses += 1
+            return None
+        self._items.move_to_end(imei)
+        self.hits += 1
+        return item[1]
+
+    def add(self, imei: str, value):
+        """
+        Сохранение данных логина
+        """
+        self._items[imei] = (time.monotonic() + self.ttl, value)
+        self._items.move_to_end(imei)
+        while len(self._items) > self.maxsize:
+            self._items.popitem(last=False)
+
+    async def wait(self):
+        """
+        Сглаживание всплеска логинов, которым нужна запись в БД
+        """
+        if self.smoother is not None:
+            await self.smoother.wait()
+
+    def as_dict(self):
+        return {
+            "size": len(self._items),
+            "hits": self.hits,
+            "misses": self.misses,
+            "delayed": self.smoother.delayed if self.smoother else 0,
+        }
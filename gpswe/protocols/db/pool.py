@@ -0,0 +1,119 @@
+import logging
+import time
+from contextlib import asynccontextmanager
+import asyncpg
+from .decorator import backoff
+
+
+class PoolStats:
+    """
+    Статистика ожидания соединений из пула
+    """
+
+    __slots__ = ("acquired", "waiting", "wait_total", "wait_max")
+
+    def __init__(self):
+        self.acquired = 0
+        self.waiting = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def add_wait(self, wait_time: float):
+        self.acquired += 1
+        self.wait_total += wait_time
+        if wait_time > self.wait_max:
+            self.wait_max = wait_time
+
+    def as_dict(self):
+        return {
+            "acquired": self.acquired,
+            "waiting": self.waiting,
+            "wait_total": round(self.wait_total, 6),
+            "wait_avg": round(self.wait_total / self.acquired, 6)
+            if self.acquired
+            else 0.0,
+            "wait_max": round(self.wait_max, 6),
+        }
+
+
+class PostgresPool:
+    """
+    Пул соединений с postgres на время жизни сервера
+    """
+
+    def __init__(
+        self,
+        dsl: dict,
+        min_size: int = 2,
+        max_size: int = 20,
+        statement_cache_size: int = 100,
+    ):
+        self.dsl = dsl
+        self.min_size = min_size
+        self.max_size = max_size
+        self.statement_cache_size = statement_cache_size
+        self.stats = PoolStats()
+        self._pool = None
+
+    async def open(self):
+        """
+        Создание соединений пула
+        """
+        self._pool = await self._create_pool()
+        return self
+
+    @backoff(logger=logging.getLogger("gpswe::postgres_pool"))
+    async def _create_pool(self):
+        """
+        Создание пула с повторными попытками, пока postgres недоступен
+        """
+        # asyncpg кэширует подготовленные выражения на каждом соединении,
+        # поэтому INSERT-запросы парсятся сервером один раз на соединение
+        return await asyncpg.create_pool(
+            **self.dsl,
+            min_size=self.min_size,
+            max_size=self.max_size,
+            statement_cache_size=self.statement_cache_size,
+        )
+
+    async def close(self):
+        """
+        Закрытие всех соединений пула
+        """
+        if self._pool is not None:
+            await self._pool.close()
+            self._pool = None
+
+    @asynccontextmanager
+    async def acquire(self):
+        """
+        Получение соединения из пула с учетом времени ожидания
+        """
+        started = time.perf_counter()
+        self.stats.waiting += 1
+        try:
+            conn = await self._pool.acquire()
+        finally:
+            self.stats.waiting -= 1
+        self.stats.add_wait(time.perf_counter() - started)
+        try:
+            yield conn
+        finally:
+            await self._pool.release(conn)
+
+
+@asynccontextmanager
+async def pool_context_postgres(
+    dsl: dict,
+    min_size: int = 2,
+    max_size: int = 20,
+    statement_cache_size: int = 100,
+):
+    """
+    Пул соединений с базой postgres
+    """
+    pool = await PostgresPool(dsl, min_size, max_size, statement_cache_size).open()
+    try:
+        yield pool
+    finally:
+        await pool.close()
@@ -1,10 +1,17 @@
-import logging
-from contextlib import asynccontextmanager
-import asyncpg
-from .decorator import backoff
+from typing import Union
+from .pool import PostgresPool
 from ..models.egts import EGTSData
 from ..models.wialon import WialonLogin, WialonCutData, WialonExtendData
 from ..models.client import Client
+from ..models.records import (
+    WialonLoginRecord,
+    WialonCutRecord,
+    WialonExtendRecord,
+    EGTSRecord,
+    ClientRecord,
+    as_record,
+)
+from ..metrics import db_insert_seconds
 
 save_wialon_login_sql = """
     INSERT INTO 
@@ -20,10 +27,10 @@ save_wialon_cut_data_sql = """
     gpswe.wialon_cut_data (imei, date, 
     time, lat_deg, lat_sign, long_deg,
     long_sign, speed, course, alt,
-    sats, crc16) 
+    sats, crc16, navigate_time) 
     VALUES ($1, $2, 
     $3, $4, $5, $6, $7,
-    $8, $9, $10, $11, $12)
+    $8, $9, $10, $11, $12, $13)
 """
 
 save_wialon_extend_data_sql = """
@@ -31,98 +38,116 @@ save_wialon_extend_data_sql = """
     gpswe.wialon_extend_data (imei, date, 
     time, lat_deg, lat_sign, long_deg,
     long_sign, speed, course, alt,
-    sats, crc16, hdop, inputs,
-    outputs, adc, lbutton, params) 
+    sats, crc16, navigate_time, hdop, inputs,
+    outputs, adc, lbutton, params,
+    sensors, adc_values) 
     VALUES ($1, $2, 
     $3, $4, $5, $6, $7,
     $8, $9, $10, $11, $12,
-    $13, $14, $15, $16, $17, $18)
+    $13, $14, $15, $16, $17, $18, $19,
+    $20, $21)
 """
 
 save_client_sql = """
     INSERT INTO 
     gpswe.client (ip, port, imei) 
     VALUES ($1, $2, $3)
+    ON CONFLICT (ip) DO UPDATE SET port = EXCLUDED.port, imei = EXCLUDED.imei
 """
 
 save_egts_data_sql = """
     INSERT INTO 
     gpswe.egts_data (oid, date, 
     time, lat_deg, long_deg, speed,
-    course) 
+    course, navigate_time) 
     VALUES ($1, $2, 
-    $3, $4, $5, $6, $7)
+    $3, $4, $5, $6, $7, $8)
 """
 
 get_client_sql = """
     SELECT gc.imei
     FROM gpswe.client AS gc
-    WHERE gc.ip IN ({1})
+    WHERE gc.ip = $1
 """
 
 
-@asynccontextmanager
-async def conn_context_postgres(dsl: dict):
-    """
-    Подключение к базе postgres
-    """
-
-    @backoff(logger=logging.getLogger("main::conn_context_postgres"))
-    async def connect(dsl: dict):
-        conn = await asyncpg.connect(**dsl)
-        return conn
-
-    conn = await connect(dsl)
-    yield conn
-    await conn.close()
-
-
-async def save_wialon_login(dsl: dict, data: WialonLogin):
+@db_insert_seconds.timed("wialon_login")
+async def save_wialon_login(
+    pool: PostgresPool, data: Union[WialonLoginRecord, WialonLogin]
+):
     """
     Сохранение WialonLogin
     """
-    async with conn_context_postgres(dsl) as conn:
-        await conn.fetch(save_wialon_login_sql, *list(data.dict().values()))
+    async with pool.acquire() as conn:
+        await conn.fetch(save_wialon_login_sql, *as_record(data))
 
 
-async def save_wialon_cut_data(dsl: dict, data: WialonCutData):
+@db_insert_seconds.timed("wialon_cut_data")
+async def save_wialon_cut_data(
+    pool: PostgresPool, data: Union[WialonCutRecord, WialonCutData]
+):
     """
     Сохранение WialonCutData
     """
-    async with conn_context_postgres(dsl) as conn:
-        await conn.fetch(save_wialon_cut_data_sql, *list(data.dict().values()))
+    async with pool.acquire() as conn:
+        await conn.fetch(save_wialon_cut_data_sql, *as_record(data))
 
 
-async def save_wialon_extend_data(dsl: dict, data: WialonExtendData):
+@db_insert_seconds.timed("wialon_extend_data")
+async def save_wialon_extend_data(
+    pool: PostgresPool, data: Union[WialonExtendRecord, WialonExtendData]
+):
     """
     Сохранение WialonExtendData
     """
-    async with conn_context_postgres(dsl) as conn:
-        await conn.fetch(save_wialon_extend_data_sql, *list(data.dict().values()))
+    async with pool.acquire() as conn:
+        await conn.fetch(save_wialon_extend_data_sql, *as_record(data))
 
 
-async def save_client(dsl: dict, data: Client):
+@db_insert_seconds.timed("wialon_black_box")
+async def save_wialon_black_box(pool: PostgresPool, data: list):
+    """
+    Сохранение сообщений черного ящика Wialon одним COPY на таблицу
+    """
+    tables = (
+        ("wialon_extend_data", WialonExtendRecord),
+        ("wialon_cut_data", WialonCutRecord),
+    )
+    data = [as_record(item) for item in data]
+    async with pool.acquire() as conn:
+        async with conn.transaction():
+            for table, record_type in tables:
+                records = [item for item in data if type(item) is record_type]
+                if records:
+                    await conn.copy_records_to_table(
+                        table,
+                        records=records,
+                        columns=record_type._fields,
+                        schema_name="gpswe",
+                    )
+
+
+@db_insert_seconds.timed("client")
+async def save_client(pool: PostgresPool, data: Union[ClientRecord, Client]):
     """
     Сохранение Client
     """
-    async with conn_context_postgres(dsl) as conn:
-        await conn.fetch(save_client_sql, *list(data.dict().values()))
+    async with pool.acquire() as conn:
+        await conn.fetch(save_client_sql, *as_record(data))
 
 
-async def save_egts_data(dsl: dict, data: EGTSData):
+@db_insert_seconds.timed("egts_data")
+async def save_egts_data(pool: PostgresPool, data: Union[EGTSRecord, EGTSData]):
     """
     Сохранение EGTSData
     """
-    async with conn_context_postgres(dsl) as conn:
-        await conn.fetch(save_egts_data_sql, *list(data.dict().values()))
+    async with pool.acquire() as conn:
+        await conn.fetch(save_egts_data_sql, *as_record(data))
 
 
-async def get_client(dsl: dict, ip: str):
+async def get_client(pool: PostgresPool, ip: str):
     """
     Получение Client по IP
     """
-    async with conn_context_postgres(dsl) as conn:
-        current_fetch = await conn.fetch(
-            get_client_sql.format({}, ", ".join(f"'{arg}'" for arg in [ip]))
-        )
-        return current_fetch[0].get("imei")
+    async with pool.acquire() as conn:
+        return await conn.fetchval(get_client_sql, ip)
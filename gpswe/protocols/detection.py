@@ -0,0 +1,25 @@
+from enum import Enum
+from .utils.wialon_stream import WIALON_FRAME_START
+from .utils.egts_stream import EGTS_PROTOCOL_VERSION
+
+
+class Protocols(Enum):
+    """
+    Поддерживаемые протоколы трекеров
+    """
+
+    WIALON = "wialon"
+    EGTS = "egts"
+
+
+def detect_protocol(data: bytes):
+    """
+    Определение протокола по первому байту соединения
+    """
+    if not data:
+        return None
+    if data[0] == WIALON_FRAME_START:
+        return Protocols.WIALON
+    if data[0] == EGTS_PROTOCOL_VERSION:
+        return Protocols.EGTS
+    return None
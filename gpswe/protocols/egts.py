@@ -4,29 +4,39 @@ from .utils.egts_packages import (
     data_encode_package,
     data_package,
     data_response,
+    ResultCodes,
 )
-from .utils.egts_parser import egts_parser
-from .models.egts import EGTSData
+from .db.ingest import IngestQueue
+from .session import Session
+from .utils.log_summary import LogSummary
+from .metrics import packet_seconds, egts_packets
 
-logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger("gpswe::egts_protocol")
+packets_summary = LogSummary(logger)
 
 
-async def egts_protocol(item: str, dsl: dict):
+@packet_seconds.timed("egts")
+async def egts_protocol(item: str, ingest: IngestQueue, session: Session = None):
     """
     Парсинг данных протокола EGTS
     """
-    logger = logging.getLogger("gpswe::egts_protocol")
-    logger.info("Processing the headers package")
+    packets_summary.add("Processing the headers package")
     result_code, pid, offset_data = await headers_package(item)
+    if result_code is None:
+        # Пакет для маршрутизации не подтверждается
+        egts_packets.inc("ROUTED")
+        return b""
+    records = []
     if offset_data:
-        logger.info("Processing the data package")
-        encoded_data = await data_encode_package(
+        packets_summary.add("Processing the data package")
+        result_code, encoded_data = await data_encode_package(
             item,
             offset_data.get("current_offset"),
             offset_data.get("header_length"),
             offset_data.get("frame_data_length"),
+            records,
         )
         for encoded_data_item in encoded_data:
-            validated_data = EGTSData(**egts_parser(encoded_data_item))
-            await data_package(validated_data, dsl)
-    return await data_response(pid, result_code)
+            await data_package(encoded_data_item, ingest)
+    egts_packets.inc(ResultCodes(result_code).name)
+    return await data_response(pid, result_code, records, session)
@@ -0,0 +1,305 @@
+import asyncio
+import functools
+import logging
+import time
+
+# Границы корзин гистограмм задержек в секундах
+LATENCY_BUCKETS = (
+    0.0001,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+METRICS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+logger = logging.getLogger("gpswe::metrics")
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels_text(labelnames: tuple, labels: tuple, extra: str = ""):
+    """
+    Метки в формате Prometheus: {name="value",...}
+    """
+    items = [
+        f'{name}="{_escape(value)}"' for name, value in zip(labelnames, labels)
+    ]
+    if extra:
+        items.append(extra)
+    return "{" + ",".join(items) + "}" if items else ""
+
+
+class Counter:
+    """
+    Монотонно растущий счетчик с метками
+    """
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.values = {}
+
+    def inc(self, *labels, value: float = 1):
+        self.values[labels] = self.values.get(labels, 0) + value
+
+    def get(self, *labels):
+        return self.values.get(labels, 0)
+
+    def render(self):
+        lines = []
+        for labels, value in self.values.items():
+            lines.append(
+                f"{self.name}{_labels_text(self.labelnames, labels)} {value}"
+            )
+        return lines
+
+    def as_dict(self):
+        return {
+            ",".join(map(str, labels)): value for labels, value in self.values.items()
+        }
+
+
+class Gauge(Counter):
+    """
+    Текущее значение с метками, может уменьшаться
+    """
+
+    kind = "gauge"
+
+    def dec(self, *labels, value: float = 1):
+        self.inc(*labels, value=-value)
+
+    def set(self, *labels, value: float):
+        self.values[labels] = value
+
+
+class _HistogramValue:
+    __slots__ = ("buckets", "count", "sum")
+
+    def __init__(self, size: int):
+        self.buckets = [0] * size
+        self.count = 0
+        self.sum = 0.0
+
+
+class Histogram:
+    """
+    Гистограмма значений (задержек) с метками
+    """
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple = (),
+        buckets: tuple = LATENCY_BUCKETS,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.bounds = tuple(buckets)
+        self.values = {}
+
+    def observe(self, value: float, *labels):
+        item = self.values.get(labels)
+        if item is None:
+            item = self.values[labels] = _HistogramValue(len(self.bounds))
+        item.count += 1
+        item.sum += value
+        # Корзины хранятся без накопления, суммы считаются при выводе
+        for index, bound in enumerate(self.bounds):
+            if value <= bound:
+                item.buckets[index] += 1
+                break
+
+    def timed(self, *labels):
+        """
+        Декоратор корутины, учитывающий время ее выполнения
+        """
+
+        def decorator(func):
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    self.observe(time.perf_counter() - started, *labels)
+
+            return wrapper
+
+        return decorator
+
+    def render(self):
+        lines = []
+        for labels, item in self.values.items():
+            cumulative = 0
+            for bound, count in zip(self.bounds, item.buckets):
+                cumulative += count
+                le = _labels_text(self.labelnames, labels, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            le = _labels_text(self.labelnames, labels, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{le} {item.count}")
+            text = _labels_text(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{text} {item.sum}")
+            lines.append(f"{self.name}_count{text} {item.count}")
+        return lines
+
+    def as_dict(self):
+        return {
+            ",".join(map(str, labels)): {
+                "count": item.count,
+                "sum": round(item.sum, 6),
+                "buckets": dict(zip(map(str, self.bounds), item.buckets)),
+            }
+            for labels, item in self.values.items()
+        }
+
+
+class MetricsRegistry:
+    """
+    Реестр метрик процесса сервера
+    """
+
+    def __init__(self):
+        self._metrics = {}
+
+    def register(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: tuple = ()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: tuple = ()):
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple = (),
+        buckets: tuple = LATENCY_BUCKETS,
+    ):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def get(self, name: str):
+        return self._metrics[name]
+
+    def render(self):
+        """
+        Все метрики в текстовом формате Prometheus
+        """
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def as_dict(self):
+        return {name: metric.as_dict() for name, metric in self._metrics.items()}
+
+
+metrics = MetricsRegistry()
+
+connections_open = metrics.gauge(
+    "gpswe_connections_open", "Number of open tracker connections"
+)
+connections_total = metrics.counter(
+    "gpswe_connections_total", "Number of accepted tracker connections"
+)
+connections_shed = metrics.counter(
+    "gpswe_connections_shed_total",
+    "Number of tracker connections closed by a limit",
+    ("reason",),
+)
+wialon_packets = metrics.counter(
+    "gpswe_wialon_packets_total",
+    "Number of Wialon packets by type and answer code",
+    ("type", "code"),
+)
+egts_packets = metrics.counter(
+    "gpswe_egts_packets_total",
+    "Number of EGTS transport packets by result code",
+    ("result",),
+)
+udp_datagrams = metrics.counter(
+    "gpswe_udp_datagrams_total",
+    "Number of received Wialon UDP datagrams by result",
+    ("result",),
+)
+packet_seconds = metrics.histogram(
+    "gpswe_packet_seconds",
+    "Time of processing one packet including the ingest queue wait",
+    ("protocol",),
+)
+ingest_items = metrics.counter(
+    "gpswe_ingest_items_total",
+    "Number of items saved to the database by result",
+    ("result",),
+)
+ingest_wait_seconds = metrics.histogram(
+    "gpswe_ingest_wait_seconds", "Time items spend in the ingest queue"
+)
+db_insert_seconds = metrics.histogram(
+    "gpswe_db_insert_seconds", "Time of database inserts", ("table",)
+)
+
+
+async def _handle_metrics_request(reader, writer):
+    """
+    Ответ на HTTP-запрос метрик
+    """
+    try:
+        request_line = await reader.readline()
+        while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+            pass
+        parts = request_line.split()
+        if parts[:1] == [b"GET"] and parts[1:2] in ([b"/"], [b"/metrics"]):
+            body = metrics.render().encode("utf-8")
+            status = "200 OK"
+        else:
+            body = b"Not Found\n"
+            status = "404 Not Found"
+        writer.write(
+            (
+                f"HTTP/1.1 {status}\r\n"
+                f"Content-Type: {METRICS_CONTENT_TYPE}\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: close\r\n\r\n"
+            ).encode("ascii")
+            + body
+        )
+        await writer.drain()
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+
+async def start_metrics_server(host: str, port: int):
+    """
+    Запуск HTTP-сервера метрик в формате Prometheus
+    """
+    server = await asyncio.start_server(_handle_metrics_request, host, port)
+    logger.info(f"Metrics server started at: {host}:{port}")
+    return server
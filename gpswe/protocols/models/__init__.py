@@ -2,3 +2,4 @@ from .wialon import *
 from .egts import *
 from .client import *
 from .validators import *
+from .records import *
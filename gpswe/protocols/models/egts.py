@@ -15,3 +15,4 @@ class EGTSData(BaseModel):
     long_deg: Optional[float]
     speed: Optional[int]
     course: Optional[int]
+    navigate_time: Optional[datetime.datetime]
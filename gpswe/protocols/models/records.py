@@ -0,0 +1,134 @@
+import datetime
+from typing import NamedTuple, Optional
+from pydantic import BaseModel
+
+from .wialon import WialonLogin, WialonCutData, WialonExtendData
+from .egts import EGTSData
+from .client import Client
+
+
+class WialonLoginRecord(NamedTuple):
+    """
+    Запись логина Wialon в порядке столбцов gpswe.wialon_login
+    """
+
+    imei: str
+    protocol_version: str
+    password: Optional[str]
+    crc16: int
+
+    model = WialonLogin
+
+
+class WialonCutRecord(NamedTuple):
+    """
+    Запись сокращенного пакета в порядке столбцов gpswe.wialon_cut_data
+    """
+
+    imei: Optional[str]
+    date: datetime.date
+    time: datetime.time
+    lat_deg: float
+    lat_sign: str
+    long_deg: float
+    long_sign: str
+    speed: Optional[int]
+    course: Optional[int]
+    alt: Optional[int]
+    sats: Optional[int]
+    crc16: int
+    navigate_time: Optional[datetime.datetime]
+
+    model = WialonCutData
+
+
+class WialonExtendRecord(NamedTuple):
+    """
+    Запись расширенного пакета в порядке столбцов gpswe.wialon_extend_data
+    """
+
+    imei: Optional[str]
+    date: datetime.date
+    time: datetime.time
+    lat_deg: float
+    lat_sign: str
+    long_deg: float
+    long_sign: str
+    speed: Optional[int]
+    course: Optional[int]
+    alt: Optional[int]
+    sats: Optional[int]
+    crc16: int
+    navigate_time: Optional[datetime.datetime]
+    hdop: Optional[float]
+    inputs: Optional[int]
+    outputs: Optional[int]
+    adc: Optional[str]
+    lbutton: Optional[str]
+    params: Optional[str]
+    # Доп. параметры по типам в JSON для столбца jsonb
+    sensors: Optional[str]
+    adc_values: Optional[list]
+
+    model = WialonExtendData
+
+
+class EGTSRecord(NamedTuple):
+    """
+    Запись точки EGTS в порядке столбцов gpswe.egts_data
+    """
+
+    oid: Optional[int]
+    date: datetime.date
+    time: datetime.time
+    lat_deg: float
+    long_deg: float
+    speed: int
+    course: int
+    navigate_time: Optional[datetime.datetime]
+
+    model = EGTSData
+
+
+class ClientRecord(NamedTuple):
+    """
+    Запись клиента в порядке столбцов gpswe.client
+    """
+
+    ip: Optional[str]
+    port: Optional[int]
+    imei: Optional[str]
+
+    model = Client
+
+
+# Записи для моделей pydantic: поля моделей идут в том же порядке
+MODEL_RECORDS = {
+    record.model: record
+    for record in (
+        WialonLoginRecord,
+        WialonCutRecord,
+        WialonExtendRecord,
+        EGTSRecord,
+        ClientRecord,
+    )
+}
+
+
+def as_record(data):
+    """
+    Запись для сохранения: записи возвращаются как есть,
+    модели pydantic с публичного API преобразуются
+    """
+    if isinstance(data, BaseModel):
+        return MODEL_RECORDS[type(data)](**data.dict())
+    return data
+
+
+def as_model(record):
+    """
+    Модель pydantic для записи, например, для выдачи на публичном API.
+    Значения уже проверены, поэтому модель создается без проверки:
+    иначе Union[str, ...] превратил бы числа в строки
+    """
+    return record.model.construct(**record._asdict())
@@ -128,7 +128,7 @@ def check_params(value):
     Проверка доп. параметров Wialon
     """
     if " " in value:
-        return ErrorData.PARAMS_SPACE, None
+        return ErrorData.PARAMS_SPACE.value, None
     try:
         params = value.split(",")
         for param in params:
@@ -33,6 +33,7 @@ class WialonCutData(BaseModel):
     alt: Union[str, int, None]
     sats: Union[str, int, None]
     crc16: int
+    navigate_time: Optional[datetime.datetime]
 
 
 class WialonExtendData(WialonCutData):
@@ -47,3 +48,5 @@ class WialonExtendData(WialonCutData):
     adc: Union[str, None]
     lbutton: Union[str, None]
     params: Union[str, None]
+    sensors: Optional[str]
+    adc_values: Optional[list]
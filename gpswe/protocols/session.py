@@ -0,0 +1,46 @@
+from .detection import Protocols, detect_protocol
+from .utils.wialon_stream import WialonFramer
+from .utils.egts_stream import EGTSFramer
+
+
+class Session:
+    """
+    Состояние подключенного трекера
+    """
+
+    __slots__ = (
+        "addr",
+        "protocol",
+        "framer",
+        "imei",
+        "client_looked_up",
+        "packet_id",
+        "record_number",
+    )
+
+    def __init__(self, addr, protocol: Protocols = None):
+        self.addr = addr
+        self.protocol = protocol
+        self.framer = None
+        # IMEI из пакета логина Wialon
+        self.imei = None
+        # Таблица client уже проверялась, в том числе безрезультатно
+        self.client_looked_up = False
+        # Счетчики PID и RN ответов EGTS
+        self.packet_id = 0
+        self.record_number = 0
+
+    def pin(self, data, settings):
+        """
+        Определение протокола по первым данным и создание нарезчика пакетов
+        с ограничениями из настроек сервера
+        """
+        if self.protocol is None:
+            self.protocol = detect_protocol(data)
+        if self.protocol == Protocols.WIALON:
+            self.framer = WialonFramer(settings.WIALON_MAX_LINE_SIZE)
+        elif self.protocol == Protocols.EGTS:
+            self.framer = EGTSFramer(
+                settings.EGTS_BUFFER_LIMIT, settings.EGTS_MAX_FRAME_SIZE
+            )
+        return self.framer is not None
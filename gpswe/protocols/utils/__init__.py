@@ -1,5 +1,11 @@
+from .datetime_decoder import *
 from .egts_parser import *
+from .egts_decoder import *
 from .egts_packages import *
 from .calculation_data import *
 from .wialon_parser import *
+from .wialon_decoder import *
 from .wialon_packages import *
+from .wialon_stream import *
+from .egts_stream import *
+from .log_summary import *
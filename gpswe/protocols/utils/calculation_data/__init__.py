@@ -1 +1,2 @@
-from .crc import *
+from .checksum import *
+from .crc import *
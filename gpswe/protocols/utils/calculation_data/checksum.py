@@ -0,0 +1,64 @@
+import crcmod
+
+
+class CrcState:
+    """
+    Инкрементальный расчет crc, например, по частям потока
+    """
+
+    __slots__ = ("engine", "value")
+
+    def __init__(self, engine, value: int):
+        self.engine = engine
+        self.value = value
+
+    def update(self, data):
+        self.value = self.engine.update(data, self.value)
+        return self
+
+
+class CrcEngine:
+    """
+    Табличный расчет crc: таблица строится один раз при создании,
+    bytes, bytearray и срезы memoryview обрабатываются без копирования,
+    результат - целое число
+    """
+
+    __slots__ = ("name", "init", "_calculate")
+
+    def __init__(self, name: str, poly: int, init: int, reverse: bool, xor_out: int):
+        self.name = name
+        self.init = init
+        # crcmod использует C-расширение, если оно собрано
+        self._calculate = crcmod.mkCrcFun(poly, init, reverse, xor_out)
+
+    def __call__(self, data) -> int:
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        return self._calculate(data)
+
+    def update(self, data, value: int) -> int:
+        """
+        Продолжение расчета с результата для предыдущих данных
+        """
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        return self._calculate(data, value)
+
+    def new(self, data=b""):
+        """
+        Состояние для инкрементального расчета
+        """
+        return CrcState(self, self.update(data, self.init))
+
+
+# Параметры совпадают с crcmod.predefined
+CRC8 = CrcEngine("crc-8", 0x107, 0x00, False, 0x00)
+CRC16 = CrcEngine("crc-16", 0x18005, 0x0000, True, 0x0000)
+CRC_CCITT_FALSE = CrcEngine("crc-ccitt-false", 0x11021, 0xFFFF, False, 0x0000)
+# CRC-8 заголовка транспортного уровня EGTS (ГОСТ 33472): полином 0x31, начальное 0xFF
+CRC8_EGTS = CrcEngine("crc-8-egts", 0x131, 0xFF, False, 0x00)
+
+CRC_ENGINES = {
+    engine.name: engine for engine in (CRC8, CRC16, CRC_CCITT_FALSE, CRC8_EGTS)
+}
@@ -1,15 +1,16 @@
 import crcmod.predefined
+from .checksum import CRC_ENGINES
 
 
 def crc(data: str, crc_type: str, need_encode=True):
     """
     Расчет контрольной суммы crc алгоритмом
     """
-    # Создаем объект CRC с предустановленным параметром
-    crc = crcmod.predefined.Crc(crc_type)
     # Кодируем строку в байты, если необходимо
     if need_encode:
         data = data.encode("utf-8")
-    # Вычисляем контрольную сумму
-    checksum = crc.new(data).hexdigest()
-    return int(checksum, 16)
+    engine = CRC_ENGINES.get(crc_type)
+    if engine is not None:
+        return engine(data)
+    # Алгоритмы без заранее построенной таблицы
+    return crcmod.predefined.mkPredefinedCrcFun(crc_type)(data)
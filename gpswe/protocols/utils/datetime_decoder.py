@@ -0,0 +1,63 @@
+import datetime
+import functools
+
+UTC = datetime.timezone.utc
+# Начало отсчета времени EGTS
+EGTS_EPOCH = datetime.datetime(2010, 1, 1, tzinfo=UTC)
+
+DATE_FORMAT = "%d%m%y"
+TIME_FORMAT = "%H%M%S.%f"
+
+
+def _is_digits(value: str):
+    return value.isascii() and value.isdigit()
+
+
+@functools.lru_cache(maxsize=16)
+def decode_date(value: str):
+    """
+    Дата Wialon в формате DDMMYY. Сообщения трекера приходят в пределах
+    одних суток, поэтому результат кешируется. Запись другой ширины
+    разбирается strptime, ошибки - ValueError, как у strptime
+    """
+    if len(value) == 6 and _is_digits(value):
+        year = int(value[4:])
+        # Век как у %y: 69-99 - 1900-е, 00-68 - 2000-е
+        year += 1900 if year >= 69 else 2000
+        return datetime.date(year, int(value[2:4]), int(value[:2]))
+    return datetime.datetime.strptime(value, DATE_FORMAT).date()
+
+
+def decode_time(value: str):
+    """
+    Время Wialon в формате HHMMSS.f (от 1 до 6 знаков дробной части).
+    Запись другой ширины разбирается strptime
+    """
+    fraction = value[7:]
+    if (
+        value[6:7] == "."
+        and 0 < len(fraction) <= 6
+        and _is_digits(value[:6])
+        and _is_digits(fraction)
+    ):
+        return datetime.time(
+            int(value[:2]),
+            int(value[2:4]),
+            int(value[4:6]),
+            int(fraction.ljust(6, "0")),
+        )
+    return datetime.datetime.strptime(value, TIME_FORMAT).time()
+
+
+def timestamp(date: datetime.date, time: datetime.time):
+    """
+    Момент времени UTC для сохранения из даты и времени Wialon
+    """
+    return datetime.datetime.combine(date, time, UTC)
+
+
+def egts_timestamp(seconds: int):
+    """
+    Момент времени UTC из секунд от начала отсчета EGTS
+    """
+    return EGTS_EPOCH + datetime.timedelta(seconds=seconds)
@@ -0,0 +1,508 @@
+import datetime
+import struct
+from typing import NamedTuple, Optional
+
+from .datetime_decoder import egts_timestamp
+
+# Транспортный заголовок: PRV, SKID, флаги, HL, HE, FDL, PID, PT
+TRANSPORT_HEADER = struct.Struct("<BBBBBHHB")
+# Поля маршрутизации при RTE = 1: PRA, RCA, TTL
+TRANSPORT_ROUTING = struct.Struct("<HHB")
+# HL без полей маршрутизации и с ними, включая HCS
+TRANSPORT_HEADER_LENGTH = TRANSPORT_HEADER.size + 1
+ROUTED_HEADER_LENGTH = TRANSPORT_HEADER_LENGTH + TRANSPORT_ROUTING.size
+# Заголовок записи уровня поддержки услуг: RL, RN, RFL
+RECORD_HEADER = struct.Struct("<HHB")
+RECORD_SERVICES = struct.Struct("<BB")
+SUBRECORD_HEADER = struct.Struct("<BH")
+# EGTS_SR_POS_DATA: NTM, LAT, LONG, FLG, SPD, DIR, ODM, DIN, SRC
+POS_DATA = struct.Struct("<IIIBHB3sBB")
+UINT32 = struct.Struct("<I")
+
+# Флаги транспортного заголовка
+HEADER_PRF = 0xC0
+HEADER_RTE = 0x20
+HEADER_ENA = 0x18
+HEADER_CMP = 0x04
+HEADER_PR = 0x03
+
+# Флаги записи (RFL)
+RECORD_OBFE = 0x01
+RECORD_EVFE = 0x02
+RECORD_TMFE = 0x04
+
+# Флаги EGTS_SR_POS_DATA (FLG)
+POS_VLD = 0x01
+POS_MV = 0x10
+POS_LAHS = 0x20
+POS_LOHS = 0x40
+POS_ALTE = 0x80
+# Биты поля SPD: скорость, знак высоты и старший бит направления
+SPEED_MASK = 0x3FFF
+SPEED_ALTS = 0x4000
+SPEED_DIRH = 0x8000
+
+# Типы подзаписей сервиса EGTS_TELEDATA_SERVICE (SRT)
+EGTS_SR_RECORD_RESPONSE = 0
+EGTS_SR_POS_DATA = 16
+EGTS_SR_EXT_POS_DATA = 17
+EGTS_SR_AD_SENSORS_DATA = 18
+EGTS_SR_COUNTERS_DATA = 19
+EGTS_SR_STATE_DATA = 20
+EGTS_SR_LIQUID_LEVEL_SENSOR = 27
+
+RECORD_RESPONSE = struct.Struct("<HB")
+AD_SENSORS_HEADER = struct.Struct("<BBB")
+STATE_DATA = struct.Struct("<BBBBB")
+LIQUID_LEVEL_SENSOR_HEADER = struct.Struct("<BH")
+UINT16 = struct.Struct("<H")
+
+# Флаги EGTS_SR_EXT_POS_DATA: VDOP, HDOP, PDOP, SAT, NS
+EXT_POS_VFE = 0x01
+EXT_POS_HFE = 0x02
+EXT_POS_PFE = 0x04
+EXT_POS_SFE = 0x08
+EXT_POS_NSFE = 0x10
+
+# Флаги EGTS_SR_LIQUID_LEVEL_SENSOR
+LLS_NUMBER = 0x07
+LLS_RDF = 0x08
+LLS_UNITS = 0x30
+LLS_ERROR = 0x40
+
+
+class TransportHeader(NamedTuple):
+    """
+    Транспортный заголовок EGTS
+    """
+
+    protocol_version: int
+    security_key_id: int
+    prefix: int
+    route: bool
+    encryption: int
+    compressed: bool
+    priority: int
+    header_length: int
+    header_encoding: int
+    frame_data_length: int
+    pid: int
+    packet_type: int
+    pra: Optional[int]
+    rca: Optional[int]
+    ttl: Optional[int]
+    hcs: Optional[int]
+
+
+class RecordHeader(NamedTuple):
+    """
+    Заголовок записи уровня поддержки услуг (SDR)
+    """
+
+    record_length: int
+    record_number: int
+    flags: int
+    oid: Optional[int]
+    evid: Optional[int]
+    time: Optional[int]
+    source_service: int
+    recipient_service: int
+    data_offset: int
+
+
+class RecordResponse(NamedTuple):
+    """
+    Подзапись EGTS_SR_RECORD_RESPONSE
+    """
+
+    confirmed_record_number: int
+    record_status: int
+
+
+class PosData(NamedTuple):
+    """
+    Подзапись EGTS_SR_POS_DATA
+    """
+
+    navigate_time: datetime.datetime
+    lat_deg: float
+    long_deg: float
+    flags: int
+    speed: float
+    course: int
+    odometer: int
+    digital_inputs: int
+    source: int
+    altitude: Optional[int]
+
+
+def decode_transport_header(data):
+    """
+    Разбор транспортного заголовка без проверки HCS. Поля маршрутизации
+    читаются только при RTE и HL, в который они помещаются
+    """
+    (
+        protocol_version,
+        security_key_id,
+        flags,
+        header_length,
+        header_encoding,
+        frame_data_length,
+        pid,
+        packet_type,
+    ) = TRANSPORT_HEADER.unpack_from(data)
+    pra = rca = ttl = None
+    if flags & HEADER_RTE and header_length >= ROUTED_HEADER_LENGTH:
+        pra, rca, ttl = TRANSPORT_ROUTING.unpack_from(data, TRANSPORT_HEADER.size)
+    return TransportHeader(
+        protocol_version,
+        security_key_id,
+        (flags & HEADER_PRF) >> 6,
+        bool(flags & HEADER_RTE),
+        (flags & HEADER_ENA) >> 3,
+        bool(flags & HEADER_CMP),
+        flags & HEADER_PR,
+        header_length,
+        header_encoding,
+        frame_data_length,
+        pid,
+        packet_type,
+        pra,
+        rca,
+        ttl,
+        data[header_length - 1] if header_length <= len(data) else None,
+    )
+
+
+def decode_record_header(data, offset: int):
+    """
+    Разбор заголовка записи, начинающейся с offset
+    """
+    record_length, record_number, flags = RECORD_HEADER.unpack_from(data, offset)
+    offset += RECORD_HEADER.size
+    oid = evid = time = None
+    if flags & RECORD_OBFE:
+        (oid,) = UINT32.unpack_from(data, offset)
+        offset += 4
+    if flags & RECORD_EVFE:
+        (evid,) = UINT32.unpack_from(data, offset)
+        offset += 4
+    if flags & RECORD_TMFE:
+        (time,) = UINT32.unpack_from(data, offset)
+        offset += 4
+    source_service, recipient_service = RECORD_SERVICES.unpack_from(data, offset)
+    return RecordHeader(
+        record_length,
+        record_number,
+        flags,
+        oid,
+        evid,
+        time,
+        source_service,
+        recipient_service,
+        offset + RECORD_SERVICES.size,
+    )
+
+
+def iter_records(data, offset: int, end: int):
+    """
+    Записи уровня поддержки услуг в границах [offset, end).
+    Запись, выходящая за границу, считается ошибкой формата
+    """
+    while offset < end:
+        record = decode_record_header(data, offset)
+        record_end = record.data_offset + record.record_length
+        if record_end > end:
+            raise ValueError(f"Record {record.record_number} exceeds the frame data")
+        yield record
+        offset = record_end
+
+
+def iter_subrecords(data, record: RecordHeader):
+    """
+    Подзаписи записи: тип, смещение данных и их длина
+    """
+    offset = record.data_offset
+    end = offset + record.record_length
+    while offset < end:
+        subrecord_type, subrecord_length = SUBRECORD_HEADER.unpack_from(data, offset)
+        offset += SUBRECORD_HEADER.size
+        if offset + subrecord_length > end:
+            raise ValueError(f"Subrecord {subrecord_type} exceeds the record data")
+        yield subrecord_type, offset, subrecord_length
+        offset += subrecord_length
+
+
+def _check_length(name: str, size: int, length: int):
+    """
+    Подзапись должна вмещать читаемые поля: разбор не выходит за SRL
+    """
+    if size > length:
+        raise ValueError(f"{name} needs {size} bytes, SRL is {length}")
+
+
+def decode_pos_data(data, offset: int, length: int = POS_DATA.size):
+    """
+    Разбор подзаписи EGTS_SR_POS_DATA
+    """
+    _check_length("EGTS_SR_POS_DATA", POS_DATA.size, length)
+    (
+        navigate_time,
+        lat,
+        long,
+        flags,
+        speed,
+        direction,
+        odometer,
+        digital_inputs,
+        source,
+    ) = POS_DATA.unpack_from(data, offset)
+    lat_deg = round(lat * 90 / 0xFFFFFFFF, 7)
+    long_deg = round(long * 180 / 0xFFFFFFFF, 7)
+    if flags & POS_LAHS:
+        lat_deg = -lat_deg
+    if flags & POS_LOHS:
+        long_deg = -long_deg
+    altitude = None
+    if flags & POS_ALTE and length >= POS_DATA.size + 3:
+        altitude = int.from_bytes(
+            data[offset + POS_DATA.size : offset + POS_DATA.size + 3], "little"
+        )
+        if speed & SPEED_ALTS:
+            altitude = -altitude
+    return PosData(
+        egts_timestamp(navigate_time),
+        lat_deg,
+        long_deg,
+        flags,
+        (speed & SPEED_MASK) / 10,
+        direction | (speed & SPEED_DIRH) >> 7,
+        int.from_bytes(odometer, "little"),
+        digital_inputs,
+        source,
+        altitude,
+    )
+
+
+class ExtPosData(NamedTuple):
+    """
+    Подзапись EGTS_SR_EXT_POS_DATA, DOP в сотых долях
+    """
+
+    vdop: Optional[int]
+    hdop: Optional[int]
+    pdop: Optional[int]
+    satellites: Optional[int]
+    navigation_systems: Optional[int]
+
+
+class AdSensorsData(NamedTuple):
+    """
+    Подзапись EGTS_SR_AD_SENSORS_DATA: номера входов начинаются с 1
+    """
+
+    digital_outputs: int
+    digital_inputs: dict
+    analog_sensors: dict
+
+
+class CountersData(NamedTuple):
+    """
+    Подзапись EGTS_SR_COUNTERS_DATA: номера счетчиков начинаются с 1
+    """
+
+    counters: dict
+
+
+class StateData(NamedTuple):
+    """
+    Подзапись EGTS_SR_STATE_DATA, напряжения в вольтах
+    """
+
+    state: int
+    main_power_voltage: float
+    backup_battery_voltage: float
+    internal_battery_voltage: float
+    flags: int
+
+
+class LiquidLevelSensor(NamedTuple):
+    """
+    Подзапись EGTS_SR_LIQUID_LEVEL_SENSOR
+    """
+
+    number: int
+    units: int
+    error: bool
+    module_address: int
+    value: Optional[int]
+    raw: Optional[bytes]
+
+
+def decode_record_response(data, offset: int, length: int):
+    """
+    Разбор подзаписи EGTS_SR_RECORD_RESPONSE
+    """
+    _check_length("EGTS_SR_RECORD_RESPONSE", RECORD_RESPONSE.size, length)
+    return RecordResponse(*RECORD_RESPONSE.unpack_from(data, offset))
+
+
+def decode_ext_pos_data(data, offset: int, length: int):
+    """
+    Разбор подзаписи EGTS_SR_EXT_POS_DATA
+    """
+    _check_length("EGTS_SR_EXT_POS_DATA", 1, length)
+    flags = data[offset]
+    size = 1 + 2 * (flags & (EXT_POS_VFE | EXT_POS_HFE | EXT_POS_PFE)).bit_count()
+    size += bool(flags & EXT_POS_SFE) + 2 * bool(flags & EXT_POS_NSFE)
+    _check_length("EGTS_SR_EXT_POS_DATA", size, length)
+    offset += 1
+    vdop = hdop = pdop = satellites = navigation_systems = None
+    if flags & EXT_POS_VFE:
+        (vdop,) = UINT16.unpack_from(data, offset)
+        offset += 2
+    if flags & EXT_POS_HFE:
+        (hdop,) = UINT16.unpack_from(data, offset)
+        offset += 2
+    if flags & EXT_POS_PFE:
+        (pdop,) = UINT16.unpack_from(data, offset)
+        offset += 2
+    if flags & EXT_POS_SFE:
+        satellites = data[offset]
+        offset += 1
+    if flags & EXT_POS_NSFE:
+        (navigation_systems,) = UINT16.unpack_from(data, offset)
+    return ExtPosData(vdop, hdop, pdop, satellites, navigation_systems)
+
+
+def _uint24_fields(data, offset: int, mask: int):
+    """
+    Значения по 3 байта для установленных битов маски
+    """
+    values = {}
+    for bit in range(8):
+        if mask >> bit & 1:
+            values[bit + 1] = int.from_bytes(data[offset : offset + 3], "little")
+            offset += 3
+    return values, offset
+
+
+def decode_ad_sensors_data(data, offset: int, length: int):
+    """
+    Разбор подзаписи EGTS_SR_AD_SENSORS_DATA
+    """
+    _check_length("EGTS_SR_AD_SENSORS_DATA", AD_SENSORS_HEADER.size, length)
+    digital_inputs_mask, digital_outputs, analog_mask = (
+        AD_SENSORS_HEADER.unpack_from(data, offset)
+    )
+    size = AD_SENSORS_HEADER.size + digital_inputs_mask.bit_count()
+    _check_length("EGTS_SR_AD_SENSORS_DATA", size + 3 * analog_mask.bit_count(), length)
+    offset += AD_SENSORS_HEADER.size
+    digital_inputs = {}
+    for bit in range(8):
+        if digital_inputs_mask >> bit & 1:
+            digital_inputs[bit + 1] = data[offset]
+            offset += 1
+    analog_sensors, _ = _uint24_fields(data, offset, analog_mask)
+    return AdSensorsData(digital_outputs, digital_inputs, analog_sensors)
+
+
+def decode_counters_data(data, offset: int, length: int):
+    """
+    Разбор подзаписи EGTS_SR_COUNTERS_DATA
+    """
+    _check_length("EGTS_SR_COUNTERS_DATA", 1, length)
+    mask = data[offset]
+    _check_length("EGTS_SR_COUNTERS_DATA", 1 + 3 * mask.bit_count(), length)
+    counters, _ = _uint24_fields(data, offset + 1, mask)
+    return CountersData(counters)
+
+
+def decode_state_data(data, offset: int, length: int):
+    """
+    Разбор подзаписи EGTS_SR_STATE_DATA
+    """
+    _check_length("EGTS_SR_STATE_DATA", STATE_DATA.size, length)
+    state, main_power, backup_battery, internal_battery, flags = (
+        STATE_DATA.unpack_from(data, offset)
+    )
+    return StateData(
+        state, main_power / 10, backup_battery / 10, internal_battery / 10, flags
+    )
+
+
+def decode_liquid_level_sensor(data, offset: int, length: int):
+    """
+    Разбор подзаписи EGTS_SR_LIQUID_LEVEL_SENSOR: при RDF = 1 показания
+    передаются без обработки и возвращаются как есть
+    """
+    name = "EGTS_SR_LIQUID_LEVEL_SENSOR"
+    _check_length(name, LIQUID_LEVEL_SENSOR_HEADER.size, length)
+    flags, module_address = LIQUID_LEVEL_SENSOR_HEADER.unpack_from(data, offset)
+    start = offset + LIQUID_LEVEL_SENSOR_HEADER.size
+    value = raw = None
+    if flags & LLS_RDF:
+        raw = bytes(data[start : offset + length])
+    else:
+        _check_length(name, LIQUID_LEVEL_SENSOR_HEADER.size + UINT32.size, length)
+        (value,) = UINT32.unpack_from(data, start)
+    return LiquidLevelSensor(
+        flags & LLS_NUMBER,
+        (flags & LLS_UNITS) >> 4,
+        bool(flags & LLS_ERROR),
+        module_address,
+        value,
+        raw,
+    )
+
+
+# Разбор подзаписей по типу SRT
+SUBRECORD_DECODERS = {
+    EGTS_SR_RECORD_RESPONSE: decode_record_response,
+    EGTS_SR_POS_DATA: decode_pos_data,
+    EGTS_SR_EXT_POS_DATA: decode_ext_pos_data,
+    EGTS_SR_AD_SENSORS_DATA: decode_ad_sensors_data,
+    EGTS_SR_COUNTERS_DATA: decode_counters_data,
+    EGTS_SR_STATE_DATA: decode_state_data,
+    EGTS_SR_LIQUID_LEVEL_SENSOR: decode_liquid_level_sensor,
+}
+
+
+def register_subrecord_decoder(subrecord_type: int, decoder=None):
+    """
+    Регистрация разбора подзаписи типа subrecord_type. Разбор вызывается
+    как decoder(data, offset, length) и не читает больше length байт,
+    иначе ValueError. Без decoder работает как декоратор
+    """
+    if decoder is None:
+        return lambda decoder: register_subrecord_decoder(subrecord_type, decoder)
+    SUBRECORD_DECODERS[subrecord_type] = decoder
+    return decoder
+
+
+def decode_subrecords(data, record: RecordHeader, decoders: dict = None):
+    """
+    Разбор всех подзаписей записи за один проход: список пар тип и
+    результат. Для типов без разбора результат None, данные пропускаются по SRL
+    """
+    if decoders is None:
+        decoders = SUBRECORD_DECODERS
+    subrecords = []
+    offset = record.data_offset
+    end = offset + record.record_length
+    unpack_header = SUBRECORD_HEADER.unpack_from
+    while offset < end:
+        subrecord_type, subrecord_length = unpack_header(data, offset)
+        offset += 3
+        next_offset = offset + subrecord_length
+        if next_offset > end:
+            raise ValueError(f"Subrecord {subrecord_type} exceeds the record data")
+        decoder = decoders.get(subrecord_type)
+        subrecords.append(
+            (
+                subrecord_type,
+                None if decoder is None else decoder(data, offset, subrecord_length),
+            )
+        )
+        offset = next_offset
+    return subrecords
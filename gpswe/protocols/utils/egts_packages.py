@@ -1,16 +1,39 @@
-import datetime
 import logging
-from ctypes import c_uint8, c_uint16, c_uint32
-from .calculation_data.crc import crc
-from ..models.egts import EGTSData
+import struct
+from .calculation_data.checksum import CRC8_EGTS, CRC_CCITT_FALSE
+from .egts_decoder import (
+    EGTS_SR_POS_DATA,
+    EGTS_SR_RECORD_RESPONSE,
+    RECORD_RESPONSE,
+    ROUTED_HEADER_LENGTH,
+    SUBRECORD_DECODERS,
+    SUBRECORD_HEADER,
+    TRANSPORT_HEADER,
+    decode_pos_data,
+    decode_transport_header,
+    iter_records,
+    iter_subrecords,
+)
+from ..models.records import EGTSRecord
 from enum import Enum
-import pickle
 from ..db.postgres import save_egts_data
+from ..db.ingest import IngestQueue
+from .log_summary import LogSummary
 
-logging.basicConfig(level=logging.DEBUG)
+headers_logger = logging.getLogger("gpswe::headers_package")
+data_logger = logging.getLogger("gpswe::data_encode_package")
+headers_summary = LogSummary(headers_logger)
+sections_summary = LogSummary(data_logger)
 
-EGTS_SR_RECORD_RESPONSE = 0
-EGTS_SR_POS_DATA = 16
+SFRCS = struct.Struct("<H")
+
+EGTS_PT_RESPONSE = 0
+EGTS_RESPONSE_HEADER_LENGTH = 11
+# RPID и PR перед записями ответа
+RESPONSE_BODY = struct.Struct("<HB")
+# Запись с подзаписью EGTS_SR_RECORD_RESPONSE: RL, RN, RFL, SST, RST, SRT, SRL, CRN, RST
+RESPONSE_RECORD = struct.Struct("<HHBBBBHHB")
+RECORD_RESPONSE_LENGTH = SUBRECORD_HEADER.size + RECORD_RESPONSE.size
 
 
 class ResultCodes(Enum):
@@ -32,54 +55,50 @@ async def headers_package(data: bytearray):
     """
     Парсинг заголовка
     """
-    logger = logging.getLogger("gpswe::headers_package")
-    protocol_version = c_uint16(data[0]).value
-    prefix = c_uint16(data[2] << 8 * 7).value + c_uint16(data[2] << 8 * 6).value
-    rte = c_uint16(data[2] << 8 * 5).value
-    ena = str(c_uint16(data[2] << 8 * 4).value) + str(c_uint16(data[2] << 8 * 3).value)
-    cmp = c_uint16(data[2] << 8 * 3).value
-    pid = c_uint16(data[7] << 8 * 0).value + c_uint16(data[8] << 8 * 1).value
-    if protocol_version != 1 or prefix != 0:
+    view = memoryview(data)
+    header = decode_transport_header(view)
+    pid = header.pid
+    if header.protocol_version != 1 or header.prefix != 0:
         return ResultCodes.EGTS_PC_UNS_PROTOCOL.value, pid, None
-    header_length = c_uint16(data[3]).value
+    header_length = header.header_length
     if header_length not in [11, 16]:
         return ResultCodes.EGTS_PC_INC_HEADERFORM.value, pid, None
-    frame_data_length = (
-        c_uint16(data[5] << 8 * 0).value + c_uint16(data[6] << 8 * 1).value
-    )
-    ttl = c_uint16(data[14]).value
-    hcs = c_uint16(data[15]).value
-    if hcs != crc(data[:15], "crc-8", False):
-        logger.warning("EGTS_PC_HEADERCRC_ERROR")
+    if header.route != (header_length == ROUTED_HEADER_LENGTH):
+        # HL не совпадает с наличием полей маршрутизации
+        headers_logger.warning("EGTS_PC_INC_HEADERFORM")
+        return ResultCodes.EGTS_PC_INC_HEADERFORM.value, pid, None
+    if header.hcs != CRC8_EGTS(view[: header_length - 1]):
+        headers_logger.warning("EGTS_PC_HEADERCRC_ERROR")
         return ResultCodes.EGTS_PC_HEADERCRC_ERROR.value, pid, None
-    if rte != 0:
-        if ttl > 0:
-            logger.warning("Plug on the router")
+    if header.route:
+        if header.ttl > 0:
+            headers_logger.warning("Plug on the router")
             # Заглушка на маршрутизатор
             return None, None, None
         else:
-            logger.warning("EGTS_PC_TTLEXPIRED")
+            headers_logger.warning("EGTS_PC_TTLEXPIRED")
             return ResultCodes.EGTS_PC_TTLEXPIRED.value, pid, None
-        pass
+    frame_data_length = header.frame_data_length
     if frame_data_length <= 0:
-        logger.warning("EGTS_PC_OK")
+        # Пустые пакеты (keep-alive) приходят часто, поэтому только считаются
+        headers_summary.add("EGTS_PC_OK")
         return ResultCodes.EGTS_PC_OK.value, pid, None
-    sfrcs = c_uint16(data[-2] << 8 * 0).value + c_uint16(data[-1] << 8 * 1).value
-    if sfrcs != crc(data[header_length:-2], "crc-ccitt-false", False):
-        logger.warning("EGTS_PC_DATACRC_ERROR")
+    body_end = header_length + frame_data_length
+    (sfrcs,) = SFRCS.unpack_from(view, body_end)
+    if sfrcs != CRC_CCITT_FALSE(view[header_length:body_end]):
+        headers_logger.warning("EGTS_PC_DATACRC_ERROR")
         return ResultCodes.EGTS_PC_DATACRC_ERROR.value, pid, None
-    if ena != "00":
-        logger.warning("EGTS_PC_DECRYPT_ERROR")
+    if header.encryption != 0:
+        headers_logger.warning("EGTS_PC_DECRYPT_ERROR")
         return ResultCodes.EGTS_PC_DECRYPT_ERROR.value, pid, None
-    if cmp != 0:
-        logger.warning("EGTS_PC_INC_DATAFORM")
+    if header.compressed:
+        headers_logger.warning("EGTS_PC_INC_DATAFORM")
         return ResultCodes.EGTS_PC_INC_DATAFORM.value, pid, None
-    current_offset = header_length
     return (
         ResultCodes.EGTS_PC_OK.value,
         pid,
         {
-            "current_offset": current_offset,
+            "current_offset": header_length,
             "header_length": header_length,
             "frame_data_length": frame_data_length,
         },
@@ -87,141 +106,111 @@ async def headers_package(data: bytearray):
 
 
 async def data_encode_package(
-    data: bytearray, current_offset: int, header_length: int, frame_data_length: int
+    data: bytearray,
+    current_offset: int,
+    header_length: int,
+    frame_data_length: int,
+    records: list = None,
 ):
     """
-    Парсинг тела запроса
+    Парсинг тела запроса. Заголовки разобранных записей добавляются
+    в records для подтверждения в ответе. Возвращает код результата
+    обработки пакета и точки; при ошибке разбора точки и записи
+    отбрасываются, чтобы трекер повторил пакет целиком. Сохраняются только
+    EGTS_SR_POS_DATA, остальные подзаписи пропускаются по SRL без разбора
     """
-    logger = logging.getLogger("gpswe::data_encode_package")
     encoded_data = []
-    while current_offset < header_length + frame_data_length - 7:
-        record_len = (
-            c_uint16(data[current_offset] << 8 * 0).value
-            + c_uint16(data[current_offset + 1] << 8 * 1).value
-        )
-        current_offset += 2
-        current_offset += 2
-        rfl = c_uint16(data[current_offset]).value
-        current_offset += 1
-        oid = None
-        if rfl & 1:
-            oid = (
-                c_uint32(data[current_offset] << 8 * 0).value
-                + c_uint32(data[current_offset + 1] << 8 * 1).value
-                + c_uint32(data[current_offset + 2] << 8 * 2).value
-                + c_uint32(data[current_offset + 3] << 8 * 3).value
-            )
-            current_offset += 4
-        if rfl & 2:
-            current_offset += 4
-        if rfl & 4:
-            current_offset += 4
-        current_offset += 2
-        srd_offset = current_offset
-        if oid:
-            while srd_offset < record_len:
-                subrecord_type = c_uint16(data[srd_offset]).value
-                srd_offset += 3
-                if subrecord_type == EGTS_SR_RECORD_RESPONSE:
-                    logger.info("parsing EGTS_SR_RECORD_RESPONSE section")
-                    break
-                elif subrecord_type == EGTS_SR_POS_DATA:
-                    logger.info("parsing EGTS_SR_POS_DATA section")
-                    navigate_time = (
-                        c_uint32(data[srd_offset] << 8 * 0).value
-                        + c_uint32(data[srd_offset + 1] << 8 * 1).value
-                        + c_uint32(data[srd_offset + 2] << 8 * 2).value
-                        + c_uint32(data[srd_offset + 3] << 8 * 3).value
-                    )
-                    navigate_time += 1262304000
-                    date_time = datetime.datetime.utcfromtimestamp(navigate_time)
-                    date = date_time.date()
-                    time = date_time.time()
-                    lat_deg = (
-                        (
-                            c_uint32(data[srd_offset + 4] << 8 * 0).value
-                            + c_uint32(data[srd_offset + 5] << 8 * 1).value
-                            + c_uint32(data[srd_offset + 6] << 8 * 2).value
-                            + c_uint32(data[srd_offset + 7] << 8 * 3).value
+    view = memoryview(data)
+    try:
+        for record in iter_records(
+            view, current_offset, header_length + frame_data_length
+        ):
+            if records is not None:
+                records.append(record)
+            if record.oid is None:
+                continue
+            for subrecord_type, offset, length in iter_subrecords(view, record):
+                if subrecord_type == EGTS_SR_POS_DATA:
+                    subrecord = decode_pos_data(view, offset, length)
+                    encoded_data.append(
+                        EGTSRecord(
+                            record.oid,
+                            subrecord.navigate_time.date(),
+                            subrecord.navigate_time.time(),
+                            subrecord.lat_deg,
+                            subrecord.long_deg,
+                            # Целые км/ч, как при приведении модели EGTSData
+                            int(subrecord.speed),
+                            subrecord.course,
+                            subrecord.navigate_time,
                         )
-                        * 90
-                        / 0xFFFFFFFF
                     )
-                    long_deg = (
-                        (
-                            c_uint32(data[srd_offset + 8] << 8 * 0).value
-                            + c_uint32(data[srd_offset + 9] << 8 * 1).value
-                            + c_uint32(data[srd_offset + 10] << 8 * 2).value
-                            + c_uint32(data[srd_offset + 11] << 8 * 3).value
-                        )
-                        * 180
-                        / 0xFFFFFFFF
-                    )
-                    flags = [
-                        int(x)
-                        for x in "{:08b}".format(c_uint8(data[srd_offset + 12]).value)
-                    ]
-                    if flags[2]:
-                        lat_deg = round(-lat_deg, 7)
-                    else:
-                        lat_deg = round(lat_deg, 7)
-                    if flags[1]:
-                        long_deg = round(-long_deg, 7)
-                    else:
-                        long_deg = round(long_deg, 7)
-                    speed = (
-                        c_uint16(data[srd_offset + 13] << 14 * 0).value
-                        + c_uint16(data[srd_offset + 14] << 2 * 1).value
-                    )
-                    dir_higest_bit = speed >> 15
-                    speed <<= 2
-                    speed >>= 2
-                    speed = speed / 10
-                    direction = c_uint16(data[srd_offset + 15]).value
-                    srd_offset += 15
-                    course = direction | dir_higest_bit << 7
-                    encoded_data_item = [
-                        oid,
-                        date,
-                        time,
-                        lat_deg,
-                        long_deg,
-                        speed,
-                        course,
-                    ]
-                    encoded_data.append(encoded_data_item)
-                else:
-                    logger.warning(f"Unknown section type: {subrecord_type}")
-                current_offset += srd_offset
-    return encoded_data
+                elif subrecord_type not in SUBRECORD_DECODERS:
+                    sections_summary.add(f"Unknown section type: {subrecord_type}")
+    except (ValueError, IndexError, struct.error) as e:
+        data_logger.warning(f"EGTS_PC_INC_DATAFORM: {e}")
+        if records is not None:
+            records.clear()
+        return ResultCodes.EGTS_PC_INC_DATAFORM.value, []
+    return ResultCodes.EGTS_PC_OK.value, encoded_data
 
 
-async def data_response(pid: int, result_code: int):
+async def data_response(pid: int, result_code: int, records: list = (), session=None):
     """
-    Формирование ответа для EGTS
+    Формирование ответа EGTS_PT_RESPONSE с подтверждением каждой
+    принятой записи. PID и RN ответов берутся из сессии трекера
     """
-    response = []
-    body_len = 3
-    response.append(0x01)
-    response.append(0x00)
-    response.append(0x00)
-    response.append(0x0B)
-    response.append(0x00)
-    response.append(body_len & 0xFF)
-    response.append(body_len >> 8)
-    response.append((pid + 1) & 0xFF)
-    response.append((pid + 1) >> 8)
-    response.append(0x00)
-    resp_crc = crc(bytearray(pickle.dumps(response)), "crc-8", False)
-    response.append(hex(resp_crc))
-    response.append(pid & 0xFF)
-    response.append(pid >> 8)
-    response.append(hex(result_code))
-    return bytearray(pickle.dumps(response))
+    response_pid = record_number = 0
+    if session is not None:
+        response_pid = session.packet_id
+        record_number = session.record_number
+        session.packet_id = (response_pid + 1) & 0xFFFF
+        session.record_number = (record_number + len(records)) & 0xFFFF
+    body_end = EGTS_RESPONSE_HEADER_LENGTH + RESPONSE_BODY.size
+    body_end += RESPONSE_RECORD.size * len(records)
+    # Ответ собирается в буфере итогового размера без промежуточных копий
+    response = bytearray(body_end + SFRCS.size)
+    TRANSPORT_HEADER.pack_into(
+        response,
+        0,
+        1,
+        0,
+        0,
+        EGTS_RESPONSE_HEADER_LENGTH,
+        0,
+        body_end - EGTS_RESPONSE_HEADER_LENGTH,
+        response_pid,
+        EGTS_PT_RESPONSE,
+    )
+    view = memoryview(response)
+    response[TRANSPORT_HEADER.size] = CRC8_EGTS(view[: TRANSPORT_HEADER.size])
+    RESPONSE_BODY.pack_into(response, EGTS_RESPONSE_HEADER_LENGTH, pid, result_code)
+    offset = EGTS_RESPONSE_HEADER_LENGTH + RESPONSE_BODY.size
+    for record in records:
+        RESPONSE_RECORD.pack_into(
+            response,
+            offset,
+            RECORD_RESPONSE_LENGTH,
+            record_number,
+            0,
+            record.recipient_service,
+            record.source_service,
+            EGTS_SR_RECORD_RESPONSE,
+            RECORD_RESPONSE.size,
+            record.record_number,
+            ResultCodes.EGTS_PC_OK.value,
+        )
+        record_number = (record_number + 1) & 0xFFFF
+        offset += RESPONSE_RECORD.size
+    SFRCS.pack_into(
+        response, body_end, CRC_CCITT_FALSE(view[EGTS_RESPONSE_HEADER_LENGTH:body_end])
+    )
+    view.release()
+    return response
 
 
-async def data_package(data: EGTSData, dsl: dict):
+async def data_package(data: EGTSRecord, ingest: IngestQueue):
     """
     Сохранение данных с EGTS
     """
-    await save_egts_data(dsl, data)
+    await ingest.put(save_egts_data, data)
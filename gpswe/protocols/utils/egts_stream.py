@@ -0,0 +1,80 @@
+import logging
+from .wialon_stream import FrameSizeError
+
+EGTS_PROTOCOL_VERSION = 1
+EGTS_HEADER_LENGTHS = (11, 16)
+# PRV, SKID, флаги, HL, HE и FDL - минимум для вычисления длины пакета
+EGTS_MIN_HEADER_LENGTH = 7
+EGTS_SFRCS_LENGTH = 2
+
+logger = logging.getLogger("gpswe::egts_framer")
+
+
+class EGTSFramer:
+    """
+    Нарезка потока EGTS на транспортные пакеты по полям HL и FDL
+    """
+
+    __slots__ = ("_buffer", "max_buffer_size", "max_frame_size")
+
+    def __init__(self, max_buffer_size: int = 131072, max_frame_size: int = 65553):
+        self._buffer = bytearray()
+        self.max_buffer_size = max_buffer_size
+        self.max_frame_size = max_frame_size
+
+    @property
+    def pending(self):
+        """
+        Количество байт незавершенного пакета в буфере
+        """
+        return len(self._buffer)
+
+    def feed(self, data: bytes):
+        """
+        Добавление прочитанных данных и получение всех завершенных пакетов
+        """
+        buffer = self._buffer
+        buffer += data
+        frames = []
+        start = 0
+        size = len(buffer)
+        oversized = 0
+        with memoryview(buffer) as view:
+            while size - start >= EGTS_MIN_HEADER_LENGTH:
+                header_length = buffer[start + 3]
+                if (
+                    buffer[start] != EGTS_PROTOCOL_VERSION
+                    or header_length not in EGTS_HEADER_LENGTHS
+                ):
+                    # Поиск начала следующего пакета после мусора
+                    next_start = buffer.find(EGTS_PROTOCOL_VERSION, start + 1)
+                    logger.warning("Skipping bytes without an EGTS transport header")
+                    start = size if next_start == -1 else next_start
+                    continue
+                frame_data_length = buffer[start + 5] | buffer[start + 6] << 8
+                frame_length = header_length + frame_data_length
+                if frame_data_length:
+                    frame_length += EGTS_SFRCS_LENGTH
+                if frame_length > self.max_frame_size:
+                    # Буфер очищается после освобождения view
+                    oversized = frame_length
+                    break
+                if size - start < frame_length:
+                    break
+                frames.append(bytes(view[start : start + frame_length]))
+                start += frame_length
+        if oversized:
+            buffer.clear()
+            raise FrameSizeError(oversized)
+        if start:
+            del buffer[:start]
+        if len(buffer) > self.max_buffer_size:
+            logger.warning("EGTS buffer limit exceeded, dropping buffered data")
+            buffer.clear()
+        return frames
+
+    def clear(self):
+        """
+        Сброс незавершенного пакета
+        """
+        self._buffer.clear()
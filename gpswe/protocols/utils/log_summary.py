@@ -0,0 +1,65 @@
+import logging
+import time
+
+# Период вывода сводки по сообщениям в секундах
+LOG_SUMMARY_INTERVAL = 60.0
+
+_summaries = []
+
+
+class LogSummary:
+    """
+    Сводка частых сообщений: вместо записи на каждый пакет выводятся
+    счетчики событий раз в interval секунд. Отдельные сообщения
+    пишутся только при включенном уровне DEBUG
+    """
+
+    __slots__ = ("logger", "interval", "counts", "_started")
+
+    def __init__(self, logger: logging.Logger, interval: float = None):
+        self.logger = logger
+        self.interval = interval or LOG_SUMMARY_INTERVAL
+        self.counts = {}
+        self._started = time.monotonic()
+        _summaries.append(self)
+
+    def add(self, event: str, message: str = None, *args):
+        """
+        Учет события, message форматируется только для уровня DEBUG
+        """
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug(message or event, *args)
+        self.counts[event] = self.counts.get(event, 0) + 1
+        now = time.monotonic()
+        if now - self._started >= self.interval:
+            self.flush(now)
+
+    def flush(self, now: float = None):
+        """
+        Вывод накопленных счетчиков
+        """
+        now = now or time.monotonic()
+        if self.counts:
+            self.logger.info(
+                "Summary for %.0fs: %s", now - self._started, self.counts
+            )
+        self.counts = {}
+        self._started = now
+
+
+def set_log_summary_interval(interval: float):
+    """
+    Изменение периода вывода всех сводок
+    """
+    global LOG_SUMMARY_INTERVAL
+    LOG_SUMMARY_INTERVAL = interval
+    for summary in _summaries:
+        summary.interval = interval
+
+
+def flush_log_summaries():
+    """
+    Вывод всех накопленных сводок, например, при остановке сервера
+    """
+    for summary in _summaries:
+        summary.flush()
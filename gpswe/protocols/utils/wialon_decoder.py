@@ -0,0 +1,226 @@
+import datetime
+import decimal
+import json
+import logging
+import math
+
+from ..models.records import WialonCutRecord, WialonExtendRecord
+from ..models.validators import ErrorData
+from .datetime_decoder import UTC, decode_date, decode_time, timestamp
+
+# Количество полей сообщений вместе с crc16
+CUT_FIELDS = 11
+EXTEND_FIELDS = 17
+
+STRUCTURE_ERROR = "-1"
+
+# Типы значений доп. параметров по коду из сообщения: 1 - целое, 2 - дробное
+PARAM_TYPES = {1: int, 2: float}
+# JSON доп. параметров без проверки циклов и пробелов между полями
+SENSORS_ENCODER = json.JSONEncoder(check_circular=False, separators=(",", ":"))
+
+
+def _decode_navigation(fields: list, logger: logging.Logger):
+    """
+    Проверка и преобразование навигационных полей за один проход.
+    Порядок проверок и коды ошибок совпадают с cut_validate.
+    Без даты или времени момент navigate_time - время получения
+    """
+    date, time, lat, lat_sign, lon, lon_sign, speed, course, alt, sats = fields[:10]
+    navigate_time = None
+    try:
+        if date == "NA":
+            date = datetime.datetime.now().date()
+            navigate_time = datetime.datetime.now(UTC)
+        else:
+            date = decode_date(date)
+    except ValueError:
+        logger.warning("Incorrect date")
+        return ErrorData.DATETIME.value, None, None
+    try:
+        if time == "NA":
+            time = datetime.datetime.now().time()
+            navigate_time = datetime.datetime.now(UTC)
+        else:
+            time = decode_time(time)
+    except ValueError:
+        logger.warning("Incorrect time")
+        return ErrorData.DATETIME.value, None, None
+    try:
+        if lat_sign == "N":
+            lat = round(int(lat[:2]) + float(lat[2:]) / 60, 7)
+        elif lat_sign == "S":
+            lat = round(int(lat[:2]) - float(lat[2:]) / 60, 7)
+        else:
+            raise ValueError(lat_sign)
+    except ValueError:
+        logger.warning("Error getting latitude")
+        return ErrorData.COORD.value, None, None
+    try:
+        if lon_sign == "E":
+            lon = round(int(lon[:3]) + float(lon[3:]) / 60, 7)
+        elif lon_sign == "W":
+            lon = round(int(lon[:3]) - float(lon[3:]) / 60, 7)
+        else:
+            raise ValueError(lon_sign)
+    except ValueError:
+        logger.warning("Error getting longitude")
+        return ErrorData.COORD.value, None, None
+    try:
+        alt = None if alt == "NA" else int(alt)
+    except ValueError:
+        logger.warning("Error in obtaining altitude")
+        return ErrorData.SPEED_COURSE_ALT.value, None, None
+    try:
+        speed = None if speed == "NA" else int(speed)
+    except ValueError:
+        logger.warning("Error in obtaining speed")
+        return ErrorData.SPEED_COURSE_ALT.value, None, None
+    try:
+        if course != "NA":
+            course = int(course)
+            if not 0 <= course < 359:
+                raise ValueError(course)
+        else:
+            course = None
+    except ValueError:
+        logger.warning("Error in obtaining course")
+        return ErrorData.SPEED_COURSE_ALT.value, None, None
+    try:
+        sats = None if sats == "NA" else int(sats)
+    except ValueError:
+        logger.warning("Error in getting the number of satellites")
+        return ErrorData.SATS_HDOP.value, None, None
+    if navigate_time is None:
+        navigate_time = timestamp(date, time)
+    values = (date, time, lat, lat_sign, lon, lon_sign, speed, course, alt, sats)
+    return "1", values, navigate_time
+
+
+def decode_cut(fields: list, imei: str, logger: logging.Logger):
+    """
+    Разбор и проверка полей сокращенного пакета Wialon без промежуточной
+    модели, значения записи совпадают с WialonCutData после cut_validate
+    """
+    try:
+        crc16 = int(fields[CUT_FIELDS - 1])
+    except (IndexError, ValueError):
+        logger.warning("The structure of the message is broken")
+        return STRUCTURE_ERROR, None
+    valid_code, values, navigate_time = _decode_navigation(fields, logger)
+    if valid_code != "1":
+        return valid_code, None
+    return "1", WialonCutRecord(imei, *values, crc16, navigate_time)
+
+
+def param_value(param_type: int, value: str):
+    """
+    Значение доп. параметра по коду типа. Значение, которое не приводится
+    к типу, и бесконечные числа (их нет в JSON) остаются строкой
+    """
+    try:
+        typed_value = PARAM_TYPES[param_type](value)
+    except ValueError:
+        return value
+    if param_type == 2 and not math.isfinite(typed_value):
+        return value
+    return typed_value
+
+
+def _decode_params(params: str, logger: logging.Logger):
+    """
+    Проверка доп. параметров и их значения по типам за тот же проход,
+    коды совпадают с check_params
+    """
+    if " " in params:
+        logger.warning("Error receiving Params")
+        return ErrorData.PARAMS_SPACE.value, None
+    sensors = {}
+    try:
+        for param in params.split(","):
+            param_values = param.split(":", 2)
+            if len(param_values[0]) > 40:
+                logger.warning("Error receiving Params")
+                return ErrorData.PARAMS_LEN_LIMIT.value, None
+            param_type = int(param_values[1])
+            if not 1 <= param_type < 3:
+                raise ValueError(param_values[1])
+            sensors[param_values[0]] = (
+                param_value(param_type, param_values[2])
+                if len(param_values) == 3
+                else None
+            )
+    except (IndexError, ValueError):
+        logger.warning("Error receiving Params")
+        return ErrorData.PARAMS.value, None
+    return "1", sensors
+
+
+def decode_adc(adc: str):
+    """
+    Значения ADC для столбца numeric[], нечисловые и бесконечные - NULL
+    """
+    values = []
+    for value in adc.split(","):
+        try:
+            value = decimal.Decimal(value)
+        except decimal.InvalidOperation:
+            values.append(None)
+            continue
+        values.append(value if value.is_finite() else None)
+    return values
+
+
+def decode_extend(fields: list, imei: str, logger: logging.Logger):
+    """
+    Разбор и проверка полей расширенного пакета Wialon без промежуточной
+    модели, значения записи совпадают с WialonExtendData после extend_validate
+    """
+    try:
+        crc16 = int(fields[EXTEND_FIELDS - 1])
+    except (IndexError, ValueError):
+        logger.warning("The structure of the message is broken")
+        return STRUCTURE_ERROR, None
+    valid_code, values, navigate_time = _decode_navigation(fields, logger)
+    if valid_code != "1":
+        return valid_code, None
+    hdop, inputs, outputs, adc, lbutton, params = fields[10:16]
+    try:
+        hdop = None if hdop == "NA" else float(hdop)
+    except ValueError:
+        logger.warning("Error in getting the number of hdop")
+        return ErrorData.SATS_HDOP.value, None
+    try:
+        inputs = None if inputs == "NA" else int(inputs)
+    except ValueError:
+        logger.warning("Error receiving inputs")
+        return ErrorData.INPUTS_OUTPUTS.value, None
+    try:
+        outputs = None if outputs == "NA" else int(outputs)
+    except ValueError:
+        logger.warning("Error receiving outputs")
+        return ErrorData.INPUTS_OUTPUTS.value, None
+    if adc == "":
+        adc = adc_values = None
+    elif adc[0] != "1":
+        logger.warning("Error receiving ADC")
+        return ErrorData.ADC.value, None
+    else:
+        adc_values = decode_adc(adc)
+    valid_code, sensors = _decode_params(params, logger)
+    if valid_code != "1":
+        return valid_code, None
+    return "1", WialonExtendRecord(
+        imei,
+        *values,
+        crc16,
+        navigate_time,
+        hdop,
+        inputs,
+        outputs,
+        adc,
+        lbutton,
+        params,
+        SENSORS_ENCODER.encode(sensors),
+        adc_values,
+    )
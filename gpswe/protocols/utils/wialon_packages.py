@@ -1,6 +1,11 @@
 import logging
 
-from ..models.wialon import WialonLogin, WialonCutData, WialonExtendData
+from ..models.wialon import WialonCutData, WialonExtendData
+from ..models.records import (
+    WialonLoginRecord,
+    WialonCutRecord,
+    WialonExtendRecord,
+)
 from ..models.validators import (
     check_datetime,
     check_coord,
@@ -9,25 +14,34 @@ from ..models.validators import (
     check_params,
 )
 from ..models.validators import DataFieldNames
-from ..utils.wialon_parser import login_parser, cut_parser, extend_parser
+from .wialon_decoder import decode_cut, decode_extend
 from .calculation_data.crc import crc
 from ..db.postgres import (
     save_wialon_login,
     save_wialon_cut_data,
     save_wialon_extend_data,
+    save_wialon_black_box,
 )
+from ..db.ingest import IngestQueue
+
+login_logger = logging.getLogger("gpswe::login_check")
+cut_logger = logging.getLogger("gpswe::cut_check")
+extend_logger = logging.getLogger("gpswe::extend_check")
+black_box_logger = logging.getLogger("gpswe::black_box_check")
 
-logging.basicConfig(level=logging.DEBUG)
+# Количество полей сообщения сокращенного формата вместе с crc16
+BLACK_BOX_CUT_FIELDS = 11
 
 
 async def login_check(data: str):
     """
     Проверка корректности пакета логина Wialon
     """
-    logger = logging.getLogger("gpswe::login_check")
+    logger = login_logger
+    fields = data[3:].split(";")
     try:
-        login_data = WialonLogin(**login_parser(data[3:].split(";")))
-    except Exception:
+        login_data = WialonLoginRecord(fields[1], fields[0], fields[2], int(fields[3]))
+    except (IndexError, ValueError):
         logger.warning("The structure of the message is broken")
         return "0", None
     if login_data.protocol_version != "2.0":
@@ -42,162 +56,178 @@ async def login_check(data: str):
     return "1", login_data
 
 
-async def login_package(dsl: dict, data: WialonLogin):
+async def login_package(ingest: IngestQueue, data: WialonLoginRecord):
     """
     Сохранение пакета логина Wialon
     """
-    await save_wialon_login(dsl, data)
+    # Логин сохраняется сразу: на него ссылаются данные из очереди
+    await save_wialon_login(ingest.pool, data)
 
 
-async def cut_check(data: str, imei: str):
+def cut_validate(cut_data: WialonCutData, logger: logging.Logger):
     """
-    Проверка корректности сокращенного пакета Wialon
+    Проверка и преобразование полей сокращенного пакета Wialon по модели.
+    Рабочий путь - decode_cut, эта проверка служит эталоном для сверки
     """
-    logger = logging.getLogger("gpswe::cut_check")
-    try:
-        cut_data = WialonCutData(**cut_parser(data[4:].split(";"), imei))
-    except Exception as e:
-        logger.warning("The structure of the message is broken")
-        return "-1", None
     valid_code, cut_data.date = check_datetime(cut_data.date, DataFieldNames.DATE)
     if valid_code != "1":
         logger.warning("Incorrect date")
-        return valid_code, None
+        return valid_code
     valid_code, cut_data.time = check_datetime(cut_data.time, DataFieldNames.TIME)
     if valid_code != "1":
         logger.warning("Incorrect time")
-        return valid_code, None
+        return valid_code
     valid_code, cut_data.lat_deg = check_coord(
         cut_data.lat_deg, cut_data.lat_sign, DataFieldNames.LAT
     )
     if valid_code != "1":
         logger.warning("Error getting latitude")
-        return valid_code, None
+        return valid_code
     valid_code, cut_data.long_deg = check_coord(
         cut_data.long_deg, cut_data.long_sign, DataFieldNames.LON
     )
     if valid_code != "1":
         logger.warning("Error getting longitude")
-        return valid_code, None
+        return valid_code
     valid_code, cut_data.alt = check_speed_course_alt_sats_hdop(cut_data.alt)
     if valid_code != "1":
         logger.warning("Error in obtaining altitude")
-        return valid_code, None
+        return valid_code
     valid_code, cut_data.speed = check_speed_course_alt_sats_hdop(cut_data.speed)
     if valid_code != "1":
         logger.warning("Error in obtaining speed")
-        return valid_code, None
+        return valid_code
     valid_code, cut_data.course = check_speed_course_alt_sats_hdop(
         cut_data.course, DataFieldNames.COURSE
     )
     if valid_code != "1":
         logger.warning("Error in obtaining course")
-        return valid_code, None
+        return valid_code
     valid_code, cut_data.sats = check_speed_course_alt_sats_hdop(
         cut_data.sats, DataFieldNames.SATS
     )
     if valid_code != "1":
         logger.warning("Error in getting the number of satellites")
-        return valid_code, None
-    if cut_data.crc16 != crc(data[4 : data.rfind(";") + 1], "crc-16"):
-        logger.warning("Checksum verification error")
-        return "13", None
-    # TODO! проверка на пароль будет позже, valid_code 01
-    return "1", cut_data
-
-
-async def cut_package(dsl: dict, data: WialonCutData):
-    """
-    Сохранение сокращенного пакета Wialon
-    """
-    await save_wialon_cut_data(dsl, data)
+        return valid_code
+    return "1"
 
 
-async def extend_check(data: str, imei: str):
+def extend_validate(extend_data: WialonExtendData, logger: logging.Logger):
     """
-    Проверка корректности расширенного пакета Wialon
+    Проверка и преобразование полей расширенного пакета Wialon по модели.
+    Рабочий путь - decode_extend, эта проверка служит эталоном для сверки
     """
-    logger = logging.getLogger("gpswe::extend_check")
-    try:
-        extend_data = WialonExtendData(**extend_parser(data[3:].split(";"), imei))
-    except Exception:
-        logger.warning("The structure of the message is broken")
-        return "-1", None
-    valid_code, extend_data.date = check_datetime(extend_data.date, DataFieldNames.DATE)
-    if valid_code != "1":
-        logger.warning("Incorrect date")
-        return valid_code, None
-    valid_code, extend_data.time = check_datetime(extend_data.time, DataFieldNames.TIME)
-    if valid_code != "1":
-        logger.warning("Incorrect time")
-        return valid_code, None
-    valid_code, extend_data.lat_deg = check_coord(
-        extend_data.lat_deg, extend_data.lat_sign, DataFieldNames.LAT
-    )
-    if valid_code != "1":
-        logger.warning("Error getting latitude")
-        return valid_code, None
-    valid_code, extend_data.long_deg = check_coord(
-        extend_data.long_deg, extend_data.long_sign, DataFieldNames.LON
-    )
-    if valid_code != "1":
-        logger.warning("Error getting longitude")
-        return valid_code, None
-    valid_code, extend_data.alt = check_speed_course_alt_sats_hdop(extend_data.alt)
+    valid_code = cut_validate(extend_data, logger)
     if valid_code != "1":
-        logger.warning("Error in obtaining altitude")
-        return valid_code, None
-    valid_code, extend_data.speed = check_speed_course_alt_sats_hdop(extend_data.speed)
-    if valid_code != "1":
-        logger.warning("Error in obtaining speed")
-        return valid_code, None
-    valid_code, extend_data.course = check_speed_course_alt_sats_hdop(
-        extend_data.course, DataFieldNames.COURSE
-    )
-    if valid_code != "1":
-        logger.warning("Error in obtaining course")
-        return valid_code, None
-    valid_code, extend_data.sats = check_speed_course_alt_sats_hdop(
-        extend_data.sats, DataFieldNames.SATS
-    )
-    if valid_code != "1":
-        logger.warning("Error in getting the number of satellites")
-        return valid_code, None
+        return valid_code
     valid_code, extend_data.hdop = check_speed_course_alt_sats_hdop(
         extend_data.hdop, DataFieldNames.HDOP
     )
     if valid_code != "1":
         logger.warning("Error in getting the number of hdop")
-        return valid_code, None
+        return valid_code
     valid_code, extend_data.inputs = check_speed_course_alt_sats_hdop(
         extend_data.inputs, DataFieldNames.INPUTS
     )
     if valid_code != "1":
         logger.warning("Error receiving inputs")
-        return valid_code, None
+        return valid_code
     valid_code, extend_data.outputs = check_speed_course_alt_sats_hdop(
         extend_data.outputs, DataFieldNames.OUTPUTS
     )
     if valid_code != "1":
         logger.warning("Error receiving outputs")
-        return valid_code, None
+        return valid_code
     valid_code, extend_data.adc = check_adc(extend_data.adc)
     if valid_code != "1":
         logger.warning("Error receiving ADC")
-        return valid_code, None
+        return valid_code
     valid_code, extend_data.params = check_params(extend_data.params)
     if valid_code != "1":
         logger.warning("Error receiving Params")
+        return valid_code
+    return "1"
+
+
+async def cut_check(data: str, imei: str):
+    """
+    Проверка корректности сокращенного пакета Wialon
+    """
+    logger = cut_logger
+    valid_code, cut_data = decode_cut(data[4:].split(";"), imei, logger)
+    if valid_code != "1":
         return valid_code, None
-    if extend_data.crc16 != crc(data[4 : data.rfind(";") + 1], "crc-16"):
+    if cut_data.crc16 != crc(data[4 : data.rfind(";") + 1], "crc-16"):
+        logger.warning("Checksum verification error")
+        return "13", None
+    # TODO! проверка на пароль будет позже, valid_code 01
+    return "1", cut_data
+
+
+async def cut_package(ingest: IngestQueue, data: WialonCutRecord):
+    """
+    Сохранение сокращенного пакета Wialon
+    """
+    await ingest.put(save_wialon_cut_data, data)
+
+
+async def extend_check(data: str, imei: str):
+    """
+    Проверка корректности расширенного пакета Wialon
+    """
+    logger = extend_logger
+    valid_code, extend_data = decode_extend(data[3:].split(";"), imei, logger)
+    if valid_code != "1":
+        return valid_code, None
+    # crc16 считается по всему телу пакета после "#D#"
+    if extend_data.crc16 != crc(data[3 : data.rfind(";") + 1], "crc-16"):
         logger.warning("Checksum verification error")
         return "16", None
     # TODO! проверка на пароль будет позже, valid_code 01
     return "1", extend_data
 
 
-async def extend_package(dsl: dict, data: WialonExtendData):
+async def extend_package(ingest: IngestQueue, data: WialonExtendRecord):
     """
     Сохранение расширенного пакета Wialon
     """
-    await save_wialon_extend_data(dsl, data)
+    await ingest.put(save_wialon_extend_data, data)
+
+
+async def black_box_check(data: str, imei: str):
+    """
+    Проверка пакета черного ящика Wialon: сообщения разделены "|",
+    каждое проверяется как сокращенный или расширенный пакет.
+    Возвращает список прошедших проверку сообщений
+    """
+    logger = black_box_logger
+    # crc16 идет после последнего разделителя и считается по всему телу пакета
+    body_end = max(data.rfind("|"), data.rfind(";"))
+    try:
+        crc16 = int(data[body_end + 1 :])
+    except ValueError:
+        logger.warning("The structure of the message is broken")
+        return []
+    if crc16 != crc(data[3 : body_end + 1], "crc-16"):
+        logger.warning("Checksum verification error")
+        return []
+    records = []
+    for record in data[3:body_end].split("|"):
+        if not record:
+            continue
+        fields = record.split(";")
+        fields.append(crc16)
+        if len(fields) == BLACK_BOX_CUT_FIELDS:
+            valid_code, record_data = decode_cut(fields, imei, logger)
+        else:
+            valid_code, record_data = decode_extend(fields, imei, logger)
+        if valid_code == "1":
+            records.append(record_data)
+    return records
+
+
+async def black_box_package(ingest: IngestQueue, data: list):
+    """
+    Сохранение сообщений пакета черного ящика Wialon одной записью в БД
+    """
+    await ingest.put(save_wialon_black_box, data)
@@ -0,0 +1,95 @@
+WIALON_FRAME_START = ord("#")
+WIALON_FRAME_END = b"\r\n"
+# Самое короткое начало пакета с типом, например "#L#"
+WIALON_MIN_FRAME = 3
+
+
+class FrameSizeError(ValueError):
+    """
+    Пакет превышает допустимый размер
+    """
+
+
+class WialonFramer:
+    """
+    Инкрементальная нарезка потока Wialon IPS на пакеты
+    """
+
+    __slots__ = ("_buffer", "max_frame_size")
+
+    def __init__(self, max_frame_size: int = 65536):
+        self._buffer = bytearray()
+        self.max_frame_size = max_frame_size
+
+    @property
+    def pending(self):
+        """
+        Количество байт незавершенного пакета в буфере
+        """
+        return len(self._buffer)
+
+    def feed(self, data: bytes):
+        """
+        Добавление прочитанных данных и получение всех завершенных пакетов
+        """
+        buffer = self._buffer
+        buffer += data
+        frames = []
+        start = 0
+        oversized = 0
+        with memoryview(buffer) as view:
+            while True:
+                end = buffer.find(WIALON_FRAME_END, start)
+                if end == -1:
+                    break
+                if end - start > self.max_frame_size:
+                    # Буфер очищается после освобождения view
+                    oversized = end - start
+                    break
+                # Пропускаем пустые строки, мусор без начала пакета
+                # и обрывки короче типа пакета
+                if (
+                    end - start >= WIALON_MIN_FRAME
+                    and buffer[start] == WIALON_FRAME_START
+                ):
+                    frames.append(
+                        str(view[start:end], "utf-8", "replace").upper()
+                    )
+                start = end + len(WIALON_FRAME_END)
+        if oversized:
+            buffer.clear()
+            raise FrameSizeError(oversized)
+        if start:
+            del buffer[:start]
+        # Незавершенная строка уже больше допустимого пакета
+        size = len(buffer)
+        if size > self.max_frame_size:
+            buffer.clear()
+            raise FrameSizeError(size)
+        return frames
+
+    def clear(self):
+        """
+        Сброс незавершенного пакета
+        """
+        self._buffer.clear()
+
+
+def split_wialon_datagram(data: bytes):
+    """
+    Разбор UDP-датаграммы Wialon IPS без состояния: каждая строка
+    содержит пакет с префиксом "IMEI;" или "версия;IMEI;пароль;".
+    Возвращает список пар (IMEI или None, пакет)
+    """
+    frames = []
+    for line in data.split(WIALON_FRAME_END):
+        start = line.find(WIALON_FRAME_START)
+        if start == -1 or len(line) - start < WIALON_MIN_FRAME:
+            continue
+        imei = None
+        if start:
+            prefix = line[:start].rstrip(b";").split(b";")
+            imei = prefix[1] if len(prefix) > 1 else prefix[0]
+            imei = str(imei, "utf-8", "replace") or None
+        frames.append((imei, str(line[start:], "utf-8", "replace").upper()))
+    return frames
@@ -7,45 +7,83 @@ from .utils.wialon_packages import (
     cut_check,
     extend_package,
     extend_check,
+    black_box_package,
+    black_box_check,
 )
 from .db.postgres import get_client, save_client
-from .models.client import Client
+from .models.records import ClientRecord
+from .db.ingest import IngestQueue
+from .session import Session
+from .utils.log_summary import LogSummary
+from .metrics import packet_seconds, wialon_packets
 
-logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger("gpswe::wialon_protocol")
+packets_summary = LogSummary(logger)
 
 
-async def wialon_protocol(data: str, addr: list, dsl: dict):
+async def get_session_imei(session: Session, ingest: IngestQueue):
+    """
+    IMEI трекера из состояния соединения, таблица client - запасной вариант.
+    Таблица читается не больше одного раза за соединение, даже если
+    трекер в ней не найден
+    """
+    if session.imei is None and not session.client_looked_up:
+        session.client_looked_up = True
+        session.imei = await get_client(ingest.pool, session.addr[0])
+    return session.imei
+
+
+@packet_seconds.timed("wialon")
+async def wialon_protocol(data: str, session: Session, ingest: IngestQueue):
     """
     Парсинг данных протокола Wialon
     """
-    logger = logging.getLogger("gpswe::wialon_protocol")
-    if len(data) >= 1:
+    if len(data) > 2:
         if data[1] == "L":
             # Обработка пакета логина
-            logger.info("Processing the login package")
+            packets_summary.add("Processing the login package")
             valid_code, validated_data = await login_check(data)
             if valid_code == "1":
-                await login_package(dsl, validated_data)
-                logger.info("Save the client's address and IMEI")
-                await save_client(
-                    dsl, Client(ip=addr[0], port=addr[1], imei=validated_data.imei)
-                )
+                session.imei = validated_data.imei
+                login = (validated_data.protocol_version, session.addr[0])
+                # Повторный логин известного трекера не требует записи в БД
+                if ingest.logins.get(validated_data.imei) != login:
+                    await ingest.logins.wait()
+                    await login_package(ingest, validated_data)
+                    packets_summary.add("Save the client's address and IMEI")
+                    await ingest.put(
+                        save_client,
+                        ClientRecord(
+                            session.addr[0], session.addr[1], validated_data.imei
+                        ),
+                    )
+                    ingest.logins.add(validated_data.imei, login)
+            wialon_packets.inc("L", valid_code)
             return f"#AL#{valid_code}\r\n"
         elif data[1] == "S" and data[2] == "D":
             # Обработка сокращенного пакета с данными
-            logger.info("Processing a shortened data packet")
-            logger.info("Get the client's address and IMEI")
-            imei = await get_client(dsl, addr[0])
+            packets_summary.add("Processing a shortened data packet")
+            imei = await get_session_imei(session, ingest)
             valid_code, validated_data = await cut_check(data, imei)
             if valid_code == "1":
-                await cut_package(dsl, validated_data)
+                await cut_package(ingest, validated_data)
+            wialon_packets.inc("SD", valid_code)
             return f"#ASD#{valid_code}\r\n"
         elif data[1] == "D":
             # Обработка расширенного пакета с данными
-            logger.info("Processing an extended data package")
-            logger.info("Get the client's address and IMEI")
-            imei = await get_client(dsl, addr[0])
+            packets_summary.add("Processing an extended data package")
+            imei = await get_session_imei(session, ingest)
             valid_code, validated_data = await extend_check(data, imei)
             if valid_code == "1":
-                await extend_package(dsl, validated_data)
+                await extend_package(ingest, validated_data)
+            wialon_packets.inc("D", valid_code)
             return f"#AD#{valid_code}\r\n"
+        elif data[1] == "B":
+            # Обработка пакета черного ящика
+            packets_summary.add("Processing a black box package")
+            imei = await get_session_imei(session, ingest)
+            records = await black_box_check(data, imei)
+            if records:
+                await black_box_package(ingest, records)
+            wialon_packets.inc("B", "1" if records else "0")
+            return f"#AB#{len(records)}\r\n"
@@ -0,0 +1,193 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import queue
+import signal
+import time
+from config.settings import settings
+from config.logging_config import configure_logging
+from gps_server import _start_server, new_event_loop
+
+logger = logging.getLogger("gpswe::worker_supervisor")
+
+# Минимальное время жизни воркера, после которого перезапуск не откладывается
+WORKER_MIN_UPTIME = 1.0
+
+
+def merge_stats(total: dict, item: dict):
+    """
+    Сложение статистики воркеров: суммы и максимумы,
+    средние значения пересчитываются по итоговым суммам
+    """
+    for key, value in item.items():
+        if isinstance(value, dict):
+            merge_stats(total.setdefault(key, {}), value)
+        elif key.endswith("_avg") or not isinstance(value, (int, float)):
+            continue
+        elif key not in total:
+            total[key] = value
+        elif key.endswith("_max"):
+            total[key] = max(total[key], value)
+        else:
+            total[key] += value
+    return total
+
+
+async def _report_stats(index: int, stats_queue, server_stats):
+    """
+    Периодическая отправка статистики воркера супервизору
+    """
+    while True:
+        await asyncio.sleep(settings.WORKER_STATS_INTERVAL)
+        stats_queue.put((index, server_stats()))
+
+
+def _run_worker(index: int, stats_queue, wialon_port: int, egts_port: int):
+    """
+    Запуск сервера в процессе воркера со своим циклом событий и пулом
+    """
+
+    async def report_stats(server_stats):
+        await _report_stats(index, stats_queue, server_stats)
+
+    # Поток QueueListener не переживает fork, поэтому у воркера свой
+    listener = configure_logging()
+    # Каждый воркер отдает свои метрики на отдельном порту
+    metrics_port = settings.METRICS_PORT + index if settings.METRICS_PORT else None
+    loop = new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        loop.run_until_complete(
+            _start_server(wialon_port, egts_port, True, report_stats, metrics_port)
+        )
+    finally:
+        if listener is not None:
+            listener.stop()
+
+
+class WorkerSupervisor:
+    """
+    Супервизор процессов-воркеров, слушающих один порт через SO_REUSEPORT
+    """
+
+    def __init__(
+        self, workers: int = None, wialon_port: int = None, egts_port: int = None
+    ):
+        self.workers = workers or settings.WORKERS or os.cpu_count() or 1
+        self.wialon_port = wialon_port
+        self.egts_port = egts_port
+        self.restarts = 0
+        self._context = multiprocessing.get_context("fork")
+        self._stats_queue = self._context.Queue()
+        self._processes = {}
+        self._started = {}
+        self._stats = {}
+        self._running = False
+
+    def _spawn(self, index: int):
+        process = self._context.Process(
+            target=_run_worker,
+            args=(index, self._stats_queue, self.wialon_port, self.egts_port),
+            name=f"gpswe-worker-{index}",
+            daemon=True,
+        )
+        process.start()
+        self._processes[index] = process
+        self._started[index] = time.monotonic()
+
+    def stats(self):
+        """
+        Общая статистика всех воркеров
+        """
+        total = {"workers": len(self._processes), "restarts": self.restarts}
+        for worker_stats in self._stats.values():
+            merge_stats(total, worker_stats)
+        pool = total.get("pool")
+        if pool and pool.get("acquired"):
+            pool["wait_avg"] = round(pool["wait_total"] / pool["acquired"], 6)
+        ingest = total.get("ingest")
+        if ingest and ingest.get("written", 0) + ingest.get("failed", 0):
+            ingest["wait_avg"] = round(
+                ingest["wait_total"] / (ingest["written"] + ingest["failed"]), 6
+            )
+        return total
+
+    def run(self):
+        """
+        Запуск воркеров и перезапуск упавших процессов
+        """
+        for index in range(self.workers):
+            self._spawn(index)
+        logger.info(f"Started {self.workers} workers")
+        self._running = True
+        # Воркеры останавливаются плавно, упавшие больше не перезапускаются
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, self._handle_signal)
+        next_report = time.monotonic() + settings.WORKER_STATS_INTERVAL
+        try:
+            while self._running:
+                try:
+                    index, worker_stats = self._stats_queue.get(timeout=1)
+                    self._stats[index] = worker_stats
+                except queue.Empty:
+                    pass
+                for index, process in list(self._processes.items()):
+                    if process.is_alive():
+                        continue
+                    process.join()
+                    # Не перезапускаем слишком часто воркер, падающий при старте
+                    if time.monotonic() - self._started[index] < WORKER_MIN_UPTIME:
+                        continue
+                    logger.warning(
+                        f"Worker {index} exited with code {process.exitcode}, "
+                        f"restarting"
+                    )
+                    self.restarts += 1
+                    self._stats.pop(index, None)
+                    self._spawn(index)
+                if time.monotonic() >= next_report:
+                    logger.info(f"Workers stats: {self.stats()}")
+                    next_report = time.monotonic() + settings.WORKER_STATS_INTERVAL
+        finally:
+            self.stop()
+
+    def _handle_signal(self, signum, frame):
+        self._running = False
+
+    def stop(self):
+        """
+        Плавная остановка всех воркеров: по SIGTERM воркер закрывает
+        соединения и записывает очередь в БД, не успевший - завершается
+        """
+        self._running = False
+        for process in self._processes.values():
+            if process.is_alive():
+                process.terminate()
+        # Каждому воркеру на закрытие соединений и на запись очереди
+        # дается по SHUTDOWN_TIMEOUT
+        deadline = None
+        if settings.SHUTDOWN_TIMEOUT is not None:
+            deadline = time.monotonic() + 2 * settings.SHUTDOWN_TIMEOUT + 1
+        for index, process in self._processes.items():
+            process.join(
+                max(0, deadline - time.monotonic()) if deadline is not None else None
+            )
+            if process.is_alive():
+                logger.warning(f"Worker {index} did not stop in time, killing")
+                process.kill()
+                process.join()
+
+
+def start_workers(
+    workers: int = None, wialon_port: int = None, egts_port: int = None
+):
+    """
+    Запуск сервера в нескольких процессах на одном порту
+    """
+    listener = configure_logging()
+    try:
+        WorkerSupervisor(workers, wialon_port, egts_port).run()
+    finally:
+        if listener is not None:
+            listener.stop()
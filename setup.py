@@ -37,6 +37,7 @@ setup(
 
     packages=['gpswe'],
     install_requires=["asgiref", "asyncio", "pydantic", "crcmod", "asyncpg", "geopy"],
+    extras_require={"uvloop": ["uvloop"]},
 
     classifiers=[
         'License :: The MIT License (MIT)',
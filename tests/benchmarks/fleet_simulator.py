@@ -0,0 +1,529 @@
+"""
+Нагрузочный тест: имитация парка трекеров Wialon IPS и EGTS с движением
+по трекам, переподключениями и выгрузкой черного ящика.
+Выводит пропускную способность и задержку ответа (p50/p99)
+
+Запуск против работающего start_server:
+    python tests/benchmarks/fleet_simulator.py --port 10500 --wialon 2000 --egts 1000
+
+Запуск сервера с заменой Postgres (запись в БД только выдерживает задержку):
+    python tests/benchmarks/fleet_simulator.py --serve --db-latency 0.002
+
+Для нескольких тысяч соединений с одного адреса на сервере нужно
+увеличить MAX_CONNECTIONS_PER_IP
+"""
+import argparse
+import asyncio
+import datetime
+import logging
+import math
+import multiprocessing
+import os
+import random
+import resource
+import socket
+import struct
+import sys
+import time
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "gpswe")
+)
+
+from config.settings import settings  # noqa: E402
+from config.logging_config import configure_logging  # noqa: E402
+from gps_server import _start_server, new_event_loop  # noqa: E402
+from protocols.db.pool import PostgresPool  # noqa: E402
+from protocols.utils.calculation_data.crc import crc  # noqa: E402
+
+HOST = "127.0.0.1"
+WIALON_IMEI_BASE = 860000000000000
+EGTS_OID_BASE = 100000
+# Начало отсчета времени EGTS: 2010-01-01 00:00:00 UTC
+EGTS_EPOCH = 1262304000
+EGTS_PT_APPDATA = 1
+EGTS_SR_POS_DATA = 16
+EGTS_TELEDATA_SERVICE = 2
+REQUEST_TIMEOUT = 30
+
+
+class StandInConnection:
+    """
+    Соединение замены Postgres: запросы только выдерживают задержку
+    """
+
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    async def _wait(self):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    async def fetch(self, query: str, *args):
+        await self._wait()
+        return []
+
+    async def fetchval(self, query: str, *args):
+        await self._wait()
+        return None
+
+    async def execute(self, query: str, *args):
+        await self._wait()
+
+    async def copy_records_to_table(self, table: str, **kwargs):
+        await self._wait()
+
+    def transaction(self):
+        return self
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+
+class StandInConnections:
+    """
+    Ограниченный набор соединений замены Postgres, как у asyncpg.Pool
+    """
+
+    def __init__(self, latency: float, size: int):
+        self._free = asyncio.Semaphore(size)
+        self._connection = StandInConnection(latency)
+
+    async def acquire(self):
+        await self._free.acquire()
+        return self._connection
+
+    async def release(self, conn):
+        self._free.release()
+
+    async def close(self):
+        pass
+
+
+class StandInPool(PostgresPool):
+    """
+    Пул сервера без Postgres для измерения всего, кроме самой БД
+    """
+
+    def __init__(self, latency: float = 0.0, max_size: int = 20):
+        super().__init__({}, max_size, max_size)
+        self.latency = latency
+
+    async def open(self):
+        self._pool = StandInConnections(self.latency, self.max_size)
+        return self
+
+
+class Track:
+    """
+    Движение трекера: случайное изменение курса и скорости
+    """
+
+    def __init__(self, rnd: random.Random):
+        self.rnd = rnd
+        self.lat = rnd.uniform(43.0, 67.0)
+        self.lon = rnd.uniform(30.0, 90.0)
+        self.course = rnd.randrange(358)
+        self.speed = rnd.uniform(0, 90)
+        self.alt = rnd.randrange(50, 300)
+        self.sats = rnd.randrange(6, 16)
+        self.time = time.time()
+
+    def step(self, seconds: float):
+        self.course = int(self.course + self.rnd.uniform(-20, 20)) % 358
+        self.speed = min(max(self.speed + self.rnd.uniform(-10, 10), 0), 130)
+        distance = self.speed * seconds / 3600 / 111.0
+        self.lat += distance * math.cos(math.radians(self.course))
+        self.lon += distance * math.sin(math.radians(self.course)) / math.cos(
+            math.radians(self.lat)
+        )
+        self.time += seconds
+        return self
+
+
+def _wialon_coord(value: float, degrees: int):
+    minutes = (value - int(value)) * 60
+    return f"{int(value):0{degrees}d}{minutes:07.4f}"
+
+
+def wialon_record(track: Track, extended: bool):
+    """
+    Сообщение Wialon IPS без crc16
+    """
+    moment = datetime.datetime.utcfromtimestamp(track.time)
+    fields = [
+        moment.strftime("%d%m%y"),
+        moment.strftime("%H%M%S.%f"),
+        _wialon_coord(track.lat, 2),
+        "N",
+        _wialon_coord(track.lon, 3),
+        "E",
+        str(int(track.speed)),
+        str(track.course),
+        str(track.alt),
+        str(track.sats),
+    ]
+    if extended:
+        fields += [
+            "0.800000",
+            "0",
+            "0",
+            "1.250000,2.500000",
+            "NA",
+            f"PWR_EXT:2:{track.rnd.uniform(11, 14):.3f},GSM_STATUS:1:3,"
+            f"ODOMETER:1:{int(track.time) % 100000}",
+        ]
+    return ";".join(fields)
+
+
+def wialon_login_packet(imei: str):
+    body = f"2.0;{imei};NA;"
+    return f"#L#{body}{crc(body, 'crc-16')}\r\n".encode()
+
+
+def wialon_data_packet(track: Track, extended: bool):
+    body = wialon_record(track, extended) + ";"
+    packet_type = "D" if extended else "SD"
+    return f"#{packet_type}#{body}{crc(body, 'crc-16')}\r\n".encode()
+
+
+def wialon_black_box_packet(track: Track, size: int, interval: float):
+    """
+    Пакет черного ящика из size сообщений, накопленных без связи
+    """
+    track.time -= size * interval
+    records = [
+        wialon_record(track.step(interval), bool(index % 2)) for index in range(size)
+    ]
+    body = "|".join(records) + "|"
+    return f"#B#{body}{crc(body, 'crc-16')}\r\n".encode()
+
+
+def egts_pos_data(track: Track):
+    """
+    Подзапись EGTS_SR_POS_DATA
+    """
+    flags = 0x01 | (0x10 if track.speed > 0 else 0)
+    speed = int(track.speed * 10) & 0x3FFF
+    speed |= (track.course >> 8) << 15
+    return struct.pack(
+        "<IIIBHB3sBB",
+        int(track.time) - EGTS_EPOCH,
+        int(abs(track.lat) / 90 * 0xFFFFFFFF),
+        int(abs(track.lon) / 180 * 0xFFFFFFFF),
+        flags,
+        speed,
+        track.course & 0xFF,
+        b"\x00\x00\x00",
+        0,
+        0,
+    )
+
+
+def egts_packet(oid: int, pid: int, rn: int, positions: list):
+    """
+    Транспортный пакет EGTS_PT_APPDATA с записью на каждую подзапись POS_DATA
+    """
+    records = b""
+    for subrecord in positions:
+        record_data = struct.pack("<BH", EGTS_SR_POS_DATA, len(subrecord)) + subrecord
+        records += (
+            struct.pack(
+                "<HHBIBB",
+                len(record_data),
+                rn & 0xFFFF,
+                0x01,
+                oid,
+                EGTS_TELEDATA_SERVICE,
+                EGTS_TELEDATA_SERVICE,
+            )
+            + record_data
+        )
+        rn += 1
+    header = struct.pack(
+        "<BBBBBHHB", 1, 0, 0, 11, 0, len(records), pid & 0xFFFF, EGTS_PT_APPDATA
+    )
+    header += bytes([crc(header, "crc-8-egts", False)])
+    return header + records + struct.pack("<H", crc(records, "crc-ccitt-false", False))
+
+
+class Stats:
+    """
+    Задержки ответов и ошибки по видам пакетов
+    """
+
+    def __init__(self):
+        self.latencies = {}
+        self.points = 0
+        self.rejected = 0
+        self.errors = {}
+        self.reconnects = 0
+
+    def add(self, kind: str, latency: float, points: int, accepted: bool):
+        self.latencies.setdefault(kind, []).append(latency)
+        if accepted:
+            self.points += points
+        else:
+            self.rejected += 1
+
+    def error(self, kind: str):
+        self.errors[kind] = self.errors.get(kind, 0) + 1
+
+    def report(self, elapsed: float):
+        lines = [f"{'packet':<18}{'acks':>9}{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}"]
+        total = 0
+        for kind, values in sorted(self.latencies.items()):
+            values.sort()
+            total += len(values)
+            lines.append(
+                f"{kind:<18}{len(values):>9}"
+                f"{_percentile(values, 50) * 1000:>10.2f}"
+                f"{_percentile(values, 99) * 1000:>10.2f}"
+                f"{values[-1] * 1000:>10.2f}"
+            )
+        lines.append(
+            f"acks/s: {total / elapsed:.0f}, points/s: {self.points / elapsed:.0f}, "
+            f"rejected: {self.rejected}, reconnects: {self.reconnects}, "
+            f"errors: {self.errors}"
+        )
+        return "\n".join(lines)
+
+
+def _percentile(values: list, percent: float):
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(len(values) * percent / 100))]
+
+
+async def _wialon_request(reader, writer, packet: bytes):
+    writer.write(packet)
+    await writer.drain()
+    return await asyncio.wait_for(reader.readuntil(b"\r\n"), REQUEST_TIMEOUT)
+
+
+async def _egts_request(reader, writer, packet: bytes):
+    writer.write(packet)
+    await writer.drain()
+    return await asyncio.wait_for(_read_egts_response(reader), REQUEST_TIMEOUT)
+
+
+async def _read_egts_response(reader):
+    """
+    Чтение транспортного пакета ответа EGTS по полям HL и FDL
+    """
+    header = await reader.readexactly(11)
+    if header[0] != 1:
+        # Ответ не в формате транспортного уровня - считаем его целиком
+        return header + await reader.read(65536)
+    frame_data_length = header[5] | header[6] << 8
+    rest = header[3] - 11 + frame_data_length + (2 if frame_data_length else 0)
+    return header + await reader.readexactly(rest)
+
+
+def _egts_accepted(response: bytes):
+    # Код обработки PR идет после RPID в начале данных EGTS_PT_RESPONSE
+    if response[0] != 1 or len(response) < response[3] + 3:
+        return True
+    return response[response[3] + 2] == 0
+
+
+async def wialon_tracker(index: int, options, stats: Stats, stop_at: float):
+    """
+    Трекер Wialon IPS: логин, пакеты с данными, черный ящик, переподключения
+    """
+    rnd = random.Random(index)
+    imei = str(WIALON_IMEI_BASE + index)
+    track = Track(rnd)
+    loop = asyncio.get_running_loop()
+    await asyncio.sleep(rnd.uniform(0, options.interval))
+    while loop.time() < stop_at:
+        try:
+            reader, writer = await asyncio.open_connection(options.host, options.port)
+        except OSError:
+            stats.error("connect")
+            await asyncio.sleep(options.interval)
+            continue
+        try:
+            started = time.perf_counter()
+            answer = await _wialon_request(reader, writer, wialon_login_packet(imei))
+            stats.add(
+                "wialon_login", time.perf_counter() - started, 0, answer == b"#AL#1\r\n"
+            )
+            while loop.time() < stop_at:
+                await asyncio.sleep(options.interval * rnd.uniform(0.8, 1.2))
+                if rnd.random() < options.black_box:
+                    kind, points = "wialon_black_box", options.black_box_size
+                    packet = wialon_black_box_packet(track, points, options.interval)
+                else:
+                    extended = rnd.random() < 0.5
+                    kind, points = ("wialon_d" if extended else "wialon_sd"), 1
+                    packet = wialon_data_packet(track.step(options.interval), extended)
+                started = time.perf_counter()
+                answer = await _wialon_request(reader, writer, packet)
+                accepted = answer.endswith(b"#1\r\n") or (
+                    kind == "wialon_black_box" and not answer.startswith(b"#AB#0")
+                )
+                stats.add(kind, time.perf_counter() - started, points, accepted)
+                if rnd.random() < options.reconnect:
+                    stats.reconnects += 1
+                    break
+        except (OSError, asyncio.IncompleteReadError, asyncio.TimeoutError) as e:
+            stats.error(type(e).__name__)
+        finally:
+            writer.close()
+
+
+async def egts_tracker(index: int, options, stats: Stats, stop_at: float):
+    """
+    Трекер EGTS: пакеты с одной точкой и пачки точек после потери связи
+    """
+    rnd = random.Random(-index - 1)
+    oid = EGTS_OID_BASE + index
+    track = Track(rnd)
+    pid = rn = 0
+    loop = asyncio.get_running_loop()
+    await asyncio.sleep(rnd.uniform(0, options.interval))
+    while loop.time() < stop_at:
+        try:
+            reader, writer = await asyncio.open_connection(options.host, options.port)
+        except OSError:
+            stats.error("connect")
+            await asyncio.sleep(options.interval)
+            continue
+        try:
+            while loop.time() < stop_at:
+                await asyncio.sleep(options.interval * rnd.uniform(0.8, 1.2))
+                if rnd.random() < options.black_box:
+                    kind, points = "egts_burst", options.black_box_size
+                    track.time -= points * options.interval
+                else:
+                    kind, points = "egts", 1
+                positions = [
+                    egts_pos_data(track.step(options.interval)) for _ in range(points)
+                ]
+                packet = egts_packet(oid, pid, rn, positions)
+                pid += 1
+                rn += points
+                started = time.perf_counter()
+                response = await _egts_request(reader, writer, packet)
+                stats.add(
+                    kind,
+                    time.perf_counter() - started,
+                    points,
+                    _egts_accepted(response),
+                )
+                if rnd.random() < options.reconnect:
+                    stats.reconnects += 1
+                    break
+        except (OSError, asyncio.IncompleteReadError, asyncio.TimeoutError) as e:
+            stats.error(type(e).__name__)
+        finally:
+            writer.close()
+
+
+async def simulate(options):
+    stats = Stats()
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    stop_at = started + options.duration
+    trackers = [
+        wialon_tracker(index, options, stats, stop_at) for index in range(options.wialon)
+    ] + [egts_tracker(index, options, stats, stop_at) for index in range(options.egts)]
+    await asyncio.gather(*trackers)
+    return stats, loop.time() - started
+
+
+def _serve(port: int, db_latency: float):
+    """
+    Сервер с заменой Postgres в отдельном процессе
+    """
+    settings.HOST = HOST
+    settings.PORT = port
+    settings.WIALON_UDP_PORT = None
+    settings.MAX_CONNECTIONS_PER_IP = None
+    configure_logging("WARNING")
+
+    async def serve():
+        pool = StandInPool(db_latency, settings.POSTGRES_POOL_MAX_SIZE)
+        await _start_server(pool=await pool.open())
+
+    loop = new_event_loop()
+    asyncio.set_event_loop(loop)
+    loop.run_until_complete(serve())
+
+
+def _wait_port(host: str, port: int, timeout: float = 10):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            socket.create_connection((host, port)).close()
+            return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.1)
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind((HOST, 0))
+        return sock.getsockname()[1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=10500)
+    parser.add_argument("--wialon", type=int, default=1000, help="Wialon trackers")
+    parser.add_argument("--egts", type=int, default=1000, help="EGTS trackers")
+    parser.add_argument(
+        "--interval", type=float, default=5, help="seconds between packets"
+    )
+    parser.add_argument("--duration", type=float, default=60, help="seconds")
+    parser.add_argument(
+        "--reconnect", type=float, default=0.01, help="reconnect probability"
+    )
+    parser.add_argument(
+        "--black-box", type=float, default=0.01, help="black box burst probability"
+    )
+    parser.add_argument("--black-box-size", type=int, default=50)
+    parser.add_argument(
+        "--serve", action="store_true", help="start a server with a Postgres stand-in"
+    )
+    parser.add_argument(
+        "--db-latency", type=float, default=0.001, help="stand-in insert seconds"
+    )
+    options = parser.parse_args()
+
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    needed = (options.wialon + options.egts) * 2 + 256
+    if soft < needed:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (min(needed, hard), hard))
+    logging.disable(logging.CRITICAL)
+    process = None
+    if options.serve:
+        options.host, options.port = HOST, _free_port()
+        context = multiprocessing.get_context("fork")
+        process = context.Process(
+            target=_serve, args=(options.port, options.db_latency), daemon=True
+        )
+        process.start()
+        _wait_port(options.host, options.port)
+    try:
+        stats, elapsed = asyncio.run(simulate(options))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.join()
+    print(
+        f"{options.wialon} Wialon + {options.egts} EGTS trackers, "
+        f"{elapsed:.0f} s, interval {options.interval} s"
+    )
+    print(stats.report(elapsed))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Сравнение памяти сервера на простаивающие соединения:
+StreamReader/StreamWriter (handle_connection) и TrackerProtocol
+
+Запуск: python tests/benchmarks/idle_connections.py [кол-во соединений]
+"""
+import asyncio
+import functools
+import gc
+import logging
+import multiprocessing
+import os
+import resource
+import socket
+import sys
+import time
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "gpswe")
+)
+
+from connections import handle_connection, tracker_protocol_factory  # noqa: E402
+
+HOST = "127.0.0.1"
+PER_CONNECTIONS = 10000
+
+
+def _rss():
+    """
+    Текущий размер резидентной памяти процесса в байтах
+    """
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _serve(mode: str, pipe):
+    """
+    Сервер без БД: простаивающим соединениям она не нужна
+    """
+
+    async def main():
+        loop = asyncio.get_running_loop()
+        if mode == "protocol":
+            server = await loop.create_server(
+                tracker_protocol_factory(None), HOST, 0, backlog=4096
+            )
+        else:
+            server = await asyncio.start_server(
+                functools.partial(handle_connection, ingest=None),
+                HOST,
+                0,
+                backlog=4096,
+            )
+
+        def answer():
+            pipe.recv()
+            gc.collect()
+            pipe.send(_rss())
+
+        loop.add_reader(pipe.fileno(), answer)
+        pipe.send(server.sockets[0].getsockname()[1])
+        await server.serve_forever()
+
+    logging.disable(logging.CRITICAL)
+    asyncio.run(main())
+
+
+def _request_rss(pipe):
+    pipe.send(None)
+    return pipe.recv()
+
+
+def measure(mode: str, connections: int):
+    """
+    Прирост памяти сервера на PER_CONNECTIONS простаивающих соединений
+    """
+    context = multiprocessing.get_context("fork")
+    parent_pipe, child_pipe = context.Pipe()
+    process = context.Process(target=_serve, args=(mode, child_pipe), daemon=True)
+    process.start()
+    port = parent_pipe.recv()
+    before = _request_rss(parent_pipe)
+    sockets = []
+    try:
+        for _ in range(connections):
+            sockets.append(socket.create_connection((HOST, port)))
+        # Ожидание, пока сервер примет все соединения
+        time.sleep(1 + connections / 5000)
+        after = _request_rss(parent_pipe)
+    finally:
+        for sock in sockets:
+            sock.close()
+        process.terminate()
+        process.join()
+    return (after - before) / connections * PER_CONNECTIONS
+
+
+def main():
+    connections = int(sys.argv[1]) if len(sys.argv) > 1 else PER_CONNECTIONS
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    needed = connections + 256
+    if soft < needed:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (min(needed, hard), hard))
+    for mode in ("streams", "protocol"):
+        memory = measure(mode, connections)
+        print(
+            f"{mode:>8}: {memory / 1024 / 1024:.1f} MiB "
+            f"per {PER_CONNECTIONS} idle connections"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Замер CPU и памяти на пакет для записей сохранения (NamedTuple) и прежних
+моделей pydantic: создание значения и получение аргументов запроса INSERT
+
+Запуск: python tests/benchmarks/ingest_records.py [--count 10000]
+"""
+import argparse
+import datetime
+import os
+import sys
+import time
+import tracemalloc
+from decimal import Decimal
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHMARKS_DIR, "..", "..", "gpswe"))
+
+from protocols.models.records import (  # noqa: E402
+    WialonLoginRecord,
+    WialonCutRecord,
+    WialonExtendRecord,
+    EGTSRecord,
+    ClientRecord,
+)
+
+NOW = datetime.datetime(2023, 5, 1, 12, 30, 15, 500000, datetime.timezone.utc)
+NAVIGATION = (NOW.date(), NOW.time(), 55.7433750, "N", 37.6613900, "E", 60, 120, 150)
+
+# Значения в порядке столбцов INSERT, как их передают разборщики
+SAMPLES = {
+    WialonLoginRecord: ("123456789012345", "2.0", "NA", 12345),
+    WialonCutRecord: ("123456789012345", *NAVIGATION, 11, 12345, NOW),
+    WialonExtendRecord: (
+        "123456789012345",
+        *NAVIGATION,
+        11,
+        12345,
+        NOW,
+        0.9,
+        3,
+        0,
+        "1,2.5",
+        "NA",
+        "SOS:1:1,temp:2:21.5",
+        '{"SOS": 1, "temp": 21.5}',
+        [Decimal("1"), Decimal("2.5")],
+    ),
+    EGTSRecord: (1001, NOW.date(), NOW.time(), 55.743375, 37.66139, 60, 120, NOW),
+    ClientRecord: ("127.0.0.1", 50123, "123456789012345"),
+}
+
+
+def model_args(record_type, values: tuple):
+    """
+    Прежний путь: модель pydantic и аргументы из dict().values()
+    """
+    data = record_type.model(**dict(zip(record_type._fields, values)))
+    return list(data.dict().values())
+
+
+def record_args(record_type, values: tuple):
+    """
+    Новый путь: запись уже является аргументами запроса
+    """
+    return record_type(*values)
+
+
+def per_call(func, record_type, values: tuple, count: int, repeats: int = 5):
+    """
+    Лучшее из repeats среднее время вызова в микросекундах
+    """
+    best = None
+    for _ in range(repeats):
+        started = time.perf_counter()
+        for _ in range(count):
+            func(record_type, values)
+        elapsed = (time.perf_counter() - started) / count * 1e6
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def retained(build, record_type, values: tuple, count: int):
+    """
+    Память в байтах на одно хранимое значение (записи в очереди до COPY)
+    """
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    items = [build(record_type, values) for _ in range(count)]
+    size = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del items
+    return size / count
+
+
+def build_model(record_type, values: tuple):
+    return record_type.model(**dict(zip(record_type._fields, values)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--count", type=int, default=10000)
+    options = parser.parse_args()
+
+    for record_type, values in SAMPLES.items():
+        # Столбцы моделей и записей совпадают по порядку
+        assert list(record_type.model.__fields__) == list(record_type._fields)
+
+    print(
+        f"{'record':<22}{'model us':>10}{'record us':>11}{'speedup':>9}"
+        f"{'model B':>10}{'record B':>10}"
+    )
+    for record_type, values in SAMPLES.items():
+        model_time = per_call(model_args, record_type, values, options.count)
+        record_time = per_call(record_args, record_type, values, options.count)
+        model_size = retained(build_model, record_type, values, options.count)
+        record_size = retained(record_args, record_type, values, options.count)
+        print(
+            f"{record_type.__name__:<22}{model_time:>10.2f}{record_time:>11.2f}"
+            f"{model_time / record_time:>8.1f}x{model_size:>10.0f}{record_size:>10.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
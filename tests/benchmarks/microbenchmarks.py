@@ -0,0 +1,308 @@
+"""
+Микробенчмарки разбора, проверки, crc и сборки ответов без БД.
+Результаты сравниваются с сохраненной базой, замедление больше
+допустимого и больше порога шума завершает запуск с кодом 1
+
+Запуск: python tests/benchmarks/microbenchmarks.py [--save] [--tolerance 0.3]
+    [--noise-floor 1.0] [имена]
+База для текущей машины сохраняется с --save
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import sys
+import time
+
+import crcmod.predefined
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHMARKS_DIR, "..", "..", "gpswe"))
+sys.path.insert(0, os.path.join(BENCHMARKS_DIR, "..", ".."))
+
+from protocols.models.validators import (  # noqa: E402
+    DataFieldNames,
+    check_datetime,
+    check_coord,
+    check_params,
+)
+from protocols.utils.calculation_data.crc import crc  # noqa: E402
+from protocols.utils.calculation_data.checksum import (  # noqa: E402
+    CRC_ENGINES,
+    CRC_CCITT_FALSE,
+)
+from protocols.utils.datetime_decoder import decode_date, decode_time  # noqa: E402
+from protocols.utils.egts_decoder import decode_subrecords, iter_records  # noqa: E402
+from protocols.utils.egts_packages import (  # noqa: E402
+    headers_package,
+    data_encode_package,
+    data_response,
+)
+from protocols.session import Session  # noqa: E402
+from protocols.wialon import wialon_protocol  # noqa: E402
+from protocols.egts import egts_protocol  # noqa: E402
+from tests.gpswe import EGTS_PACKET  # noqa: E402
+from fleet_simulator import (  # noqa: E402
+    Track,
+    egts_packet,
+    egts_pos_data,
+    wialon_black_box_packet,
+    wialon_data_packet,
+)
+
+BASELINE_PATH = os.path.join(BENCHMARKS_DIR, "microbenchmarks_baseline.json")
+# Минимальное время одного замера в секундах
+MIN_MEASURE_TIME = 0.2
+REPEATS = 9
+# Повторные замеры подозрительного замедления перед отметкой регрессии
+CONFIRM_MEASURES = 3
+# Пауза перед повторным замером, чтобы переждать фоновую нагрузку, секунды
+CONFIRM_PAUSE = 1.0
+
+
+class NullLogins:
+    def get(self, imei: str):
+        return None
+
+    def add(self, imei: str, value):
+        pass
+
+    async def wait(self):
+        pass
+
+
+class NullIngest:
+    """
+    Очередь записи без БД: данные только считаются
+    """
+
+    pool = None
+    logins = NullLogins()
+
+    def __init__(self):
+        self.saved = 0
+
+    async def put(self, save, data):
+        self.saved += 1
+
+
+def legacy_crc(data: bytes, crc_type: str):
+    """
+    Прежний расчет crc: объект crcmod создается на каждый вызов
+    """
+    return int(crcmod.predefined.Crc(crc_type).new(data).hexdigest(), 16)
+
+
+def _incremental_crc(data: memoryview, chunk: int):
+    state = CRC_CCITT_FALSE.new()
+    for start in range(0, len(data), chunk):
+        state.update(data[start : start + chunk])
+    return state.value
+
+
+def _text(packet: bytes):
+    return packet.decode().rstrip("\r\n").upper()
+
+
+def _large_params_packet(track: Track, count: int):
+    packet = _text(wialon_data_packet(track, True))
+    body = packet[3 : packet.rfind(";") + 1]
+    params = ",".join(f"PARAM_{index}:2:{index * 1.5:.3f}" for index in range(count))
+    body = body[: body.rfind(";", 0, -1) + 1] + params + ";"
+    return f"#D#{body}{crc(body, 'crc-16')}"
+
+
+def build_corpus():
+    """
+    Пакеты для замеров: корректные, с ошибками и с большим числом параметров
+    """
+    track = Track(random.Random(1))
+    track.time = 1684800000.125
+    cut = _text(wialon_data_packet(track, False))
+    extend = _text(wialon_data_packet(track, True))
+    egts_single = bytearray(egts_packet(100000, 1, 1, [egts_pos_data(track)]))
+    egts_batch = bytearray(
+        egts_packet(100000, 2, 2, [egts_pos_data(track.step(5)) for _ in range(20)])
+    )
+    return {
+        "wialon_cut": cut,
+        "wialon_cut_bad_crc": cut[: cut.rfind(";") + 1] + "0",
+        "wialon_cut_bad_coord": cut.replace(";N;", ";X;", 1),
+        "wialon_extend": extend,
+        "wialon_extend_large_params": _large_params_packet(track, 200),
+        "wialon_black_box": _text(wialon_black_box_packet(track, 50, 5)),
+        "egts_single": egts_single,
+        "egts_batch": egts_batch,
+        "egts_reference": bytearray(EGTS_PACKET),
+        "egts_bad_crc": egts_single[:-2] + b"\x00\x00",
+    }
+
+
+def build_cases(corpus: dict):
+    """
+    Замеряемые функции: имя и корутина или функция без аргументов
+    """
+    session = Session(("127.0.0.1", 10500))
+    session.imei = "860000000000001"
+    ingest = NullIngest()
+    cut = corpus["wialon_cut"].split(";")
+    reference = corpus["egts_reference"]
+    reference_body = memoryview(reference)[11:-2]
+    batch = corpus["egts_batch"]
+    batch_records = list(iter_records(batch, 11, len(batch) - 2))
+    extend = corpus["wialon_extend"].encode()
+    for crc_type, sample in (
+        ("crc-16", extend),
+        ("crc-8", reference[:10]),
+        ("crc-ccitt-false", reference_body),
+    ):
+        assert CRC_ENGINES[crc_type](sample) == legacy_crc(sample, crc_type)
+    assert _incremental_crc(reference_body, 64) == CRC_CCITT_FALSE(reference_body)
+    cases = {
+        "check_datetime_date": lambda: check_datetime(cut[0][4:], DataFieldNames.DATE),
+        "check_datetime_time": lambda: check_datetime(cut[1], DataFieldNames.TIME),
+        "decode_date": lambda: decode_date(cut[0][4:]),
+        "decode_date_uncached": lambda: decode_date.__wrapped__(cut[0][4:]),
+        "decode_time": lambda: decode_time(cut[1]),
+        "check_coord_lat": lambda: check_coord(cut[2], cut[3], DataFieldNames.LAT),
+        "check_coord_lon": lambda: check_coord(cut[4], cut[5], DataFieldNames.LON),
+        "check_params_large": lambda: check_params(
+            corpus["wialon_extend_large_params"].split(";")[-2]
+        ),
+        "crc16_wialon": lambda: crc(corpus["wialon_extend"], "crc-16"),
+        "crc8_egts_header": lambda: crc(reference[:10], "crc-8-egts", False),
+        "crc_ccitt_egts_body": lambda: crc(reference[11:-2], "crc-ccitt-false", False),
+        "crc16_wialon_legacy": lambda: legacy_crc(extend, "crc-16"),
+        "crc_ccitt_egts_body_legacy": lambda: legacy_crc(
+            reference_body, "crc-ccitt-false"
+        ),
+        "crc_ccitt_egts_body_view": lambda: CRC_CCITT_FALSE(reference_body),
+        "crc_ccitt_egts_body_incremental": lambda: _incremental_crc(reference_body, 64),
+        "headers_package": lambda: headers_package(reference),
+        "data_encode_package": lambda: data_encode_package(
+            reference, 11, 11, len(reference) - 13
+        ),
+        "data_response": lambda: data_response(1, 0),
+        "data_response_batch": lambda: data_response(2, 0, batch_records),
+        "egts_decode_subrecords": lambda: [
+            decode_subrecords(reference, record)
+            for record in iter_records(reference, 11, len(reference) - 2)
+        ],
+    }
+    for name, packet in corpus.items():
+        if name.startswith("wialon"):
+            cases[f"wialon_protocol_{name[7:]}"] = (
+                lambda packet=packet: wialon_protocol(packet, session, ingest)
+            )
+        else:
+            cases[f"egts_protocol_{name[5:]}"] = (
+                lambda packet=packet: egts_protocol(packet, ingest)
+            )
+    return cases
+
+
+def measure(loop, func):
+    """
+    Лучшее из REPEATS время одного вызова в секундах
+    """
+    first = func()
+    is_async = asyncio.iscoroutine(first)
+    if is_async:
+        loop.run_until_complete(first)
+
+    async def run_async(number: int):
+        for _ in range(number):
+            await func()
+
+    def run(number: int):
+        started = time.perf_counter()
+        if is_async:
+            loop.run_until_complete(run_async(number))
+        else:
+            for _ in range(number):
+                func()
+        return time.perf_counter() - started
+
+    number = 1
+    elapsed = run(number)
+    while elapsed < MIN_MEASURE_TIME / 10:
+        number *= 10
+        elapsed = run(number)
+    number = max(1, int(number * MIN_MEASURE_TIME / max(elapsed, 1e-9)))
+    return min(run(number) / number for _ in range(REPEATS))
+
+
+def is_slower(result: float, base: float, options):
+    """
+    Замедление больше допустимого и больше абсолютного порога шума
+    """
+    return (
+        result > base * (1 + options.tolerance)
+        and (result - base) * 1e6 > options.noise_floor
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("names", nargs="*", help="only these benchmarks")
+    parser.add_argument("--save", action="store_true", help="save as the baseline")
+    parser.add_argument(
+        "--tolerance", type=float, default=0.3, help="allowed slowdown, 0.3 = 30%%"
+    )
+    parser.add_argument(
+        "--noise-floor",
+        type=float,
+        default=1.0,
+        help="ignore slowdowns below this many microseconds",
+    )
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    options = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    cases = build_cases(build_corpus())
+    if options.names:
+        cases = {name: cases[name] for name in options.names}
+    baseline = {}
+    if os.path.exists(options.baseline):
+        with open(options.baseline) as file:
+            baseline = json.load(file)
+
+    loop = asyncio.new_event_loop()
+    results = {}
+    regressions = []
+    print(f"{'benchmark':<40}{'us/op':>10}{'baseline':>10}{'change':>9}")
+    for name, func in cases.items():
+        results[name] = measure(loop, func)
+        line = f"{name:<40}{results[name] * 1e6:>10.2f}"
+        if name in baseline:
+            for _ in range(CONFIRM_MEASURES):
+                # Повторные замеры отсеивают кратковременные выбросы
+                if not is_slower(results[name], baseline[name], options):
+                    break
+                time.sleep(CONFIRM_PAUSE)
+                results[name] = min(results[name], measure(loop, func))
+            change = results[name] / baseline[name] - 1
+            line += f"{baseline[name] * 1e6:>10.2f}{change:>+9.0%}"
+            if is_slower(results[name], baseline[name], options):
+                regressions.append(name)
+                line += "  REGRESSION"
+        print(line)
+    loop.close()
+
+    if options.save:
+        # Полный запуск заменяет базу целиком, без устаревших значений
+        if options.names:
+            results = {**baseline, **results}
+        with open(options.baseline, "w") as file:
+            json.dump(results, file, indent=2, sort_keys=True)
+            file.write("\n")
+        print(f"Baseline saved to {options.baseline}")
+    elif regressions:
+        print(f"Slower than the baseline: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+"""
+Сверка однопроходного разбора Wialon (decode_cut, decode_extend) с исходным
+путем через модели pydantic и cut_validate/extend_validate на большом наборе
+корректных и испорченных сообщений, и замер времени на пакет для обоих путей.
+При расхождении результатов завершается с кодом 1
+
+Запуск: python tests/benchmarks/wialon_decoder.py [--packets 5000]
+"""
+import argparse
+import logging
+import os
+import random
+import sys
+import time
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHMARKS_DIR, "..", "..", "gpswe"))
+
+from protocols.models.wialon import WialonCutData, WialonExtendData  # noqa: E402
+from protocols.utils.wialon_parser import cut_parser, extend_parser  # noqa: E402
+from protocols.utils.wialon_decoder import decode_cut, decode_extend  # noqa: E402
+from protocols.utils.datetime_decoder import timestamp  # noqa: E402
+from protocols.utils.wialon_packages import cut_validate, extend_validate  # noqa: E402
+from protocols.utils.calculation_data.crc import crc  # noqa: E402
+from fleet_simulator import Track, wialon_data_packet, wialon_record  # noqa: E402
+
+logger = logging.getLogger("gpswe::wialon_decoder_benchmark")
+
+# Значения для порчи полей: пограничные числа, знаки, пустые и NA
+FIELD_VALUES = ["", "NA", "X", "0", "-1", "+1", "1_0", " 5", "5 ", "1.5", "nan"]
+FIELD_VALUES += ["inf", "358", "359", "\u0661\u0662", "1e3"]
+DATE_VALUES = ["010100", "290223", "290224", "320523", "000523", "011323", "1523"]
+DATE_VALUES += ["1.0523", " 10523", "3105230"]
+TIME_VALUES = ["000000.0", "235959.999999", "240000.0", "235960.5", "000000."]
+TIME_VALUES += ["120000.1234567", "12:00:00", "1200.5", "120000", "9999.99"]
+COORD_VALUES = ["5544.6025", "0000.0000", "9959.9999", "55", "5a44.6", "-544.6"]
+COORD_VALUES += ["03739.6834", "18000.0000"]
+SIGN_VALUES = ["N", "S", "E", "W", "n", ""]
+ADC_VALUES = ["", "NA", "1", "1,2.5", "0,1", "1.25,x"]
+PARAMS_VALUES = [
+    "",
+    "NA",
+    "A:1:2",
+    "A:3:2",
+    "A:0:2",
+    "A:2",
+    "A",
+    "A" * 41 + ":1:1",
+    "A" * 41,
+    "A:1:1,B C:1:1",
+    "A:1:1,,B:2:3",
+    "A:x:1",
+]
+
+
+def legacy_cut(fields: list, imei: str):
+    """
+    Исходный путь: модель pydantic и поочередные проверки полей
+    """
+    try:
+        data = WialonCutData(**cut_parser(fields, imei))
+    except Exception:
+        return "-1", None
+    valid_code = cut_validate(data, logger)
+    return valid_code, data if valid_code == "1" else None
+
+
+def legacy_extend(fields: list, imei: str):
+    try:
+        data = WialonExtendData(**extend_parser(fields, imei))
+    except Exception:
+        return "-1", None
+    valid_code = extend_validate(data, logger)
+    return valid_code, data if valid_code == "1" else None
+
+
+def _values_for(index: int):
+    if index == 0:
+        return DATE_VALUES + FIELD_VALUES
+    if index == 1:
+        return TIME_VALUES + FIELD_VALUES
+    if index in (2, 4):
+        return COORD_VALUES + FIELD_VALUES
+    if index in (3, 5):
+        return SIGN_VALUES
+    if index == 13:
+        return ADC_VALUES
+    if index == 15:
+        return PARAMS_VALUES
+    return FIELD_VALUES
+
+
+def build_corpus(packets: int, seed: int = 1):
+    """
+    Наборы полей сообщений: корректные, с испорченным полем, короче и длиннее
+    """
+    rnd = random.Random(seed)
+    track = Track(rnd)
+    corpus = []
+    for index in range(packets):
+        extended = bool(index % 2)
+        fields = wialon_record(track.step(rnd.uniform(1, 30)), extended).split(";")
+        fields.append(str(rnd.randrange(65536)))
+        corpus.append(fields)
+        field = rnd.randrange(len(fields))
+        broken = list(fields)
+        broken[field] = rnd.choice(_values_for(field))
+        corpus.append(broken)
+        if index % 50 == 0:
+            corpus.append(fields[:-2])
+            corpus.append(fields + ["extra"])
+            corpus.append(fields[:-1] + ["12a"])
+    return corpus
+
+
+def _values(data):
+    """
+    Значения модели pydantic или записи NamedTuple. navigate_time, sensors
+    и adc_values заполняет только однопроходный разбор
+    """
+    values = data._asdict() if isinstance(data, tuple) else data.dict()
+    for name in ("navigate_time", "sensors", "adc_values"):
+        values.pop(name, None)
+    return values
+
+
+def _comparable(result):
+    valid_code, data = result
+    if data is None:
+        return valid_code, None
+    values = _values(data)
+    # Для NA подставляется текущее время, сравнивается только тип
+    for name in ("date", "time"):
+        values[name] = type(values[name])
+    # repr, чтобы nan в hdop считался равным
+    return valid_code, repr(values)
+
+
+def check_parity(corpus: list):
+    """
+    Сравнение кодов и значений двух путей, возвращает список расхождений
+    """
+    mismatches = []
+    for fields in corpus:
+        if len(fields) == 11:
+            pairs = (legacy_cut(fields, "1"), decode_cut(fields, "1", logger))
+        else:
+            pairs = (legacy_extend(fields, "1"), decode_extend(fields, "1", logger))
+        legacy, fused = map(_comparable, pairs)
+        if legacy != fused:
+            mismatches.append((fields, legacy, fused))
+        elif pairs[0][1] is not None:
+            # Точные значения, если дата и время заданы
+            legacy, fused = (repr(_values(result[1])) for result in pairs)
+            if "NA" not in fields[:2] and legacy != fused:
+                mismatches.append((fields, legacy, fused))
+            record = pairs[1][1]
+            if record.navigate_time != timestamp(record.date, record.time):
+                if "NA" not in fields[:2]:
+                    mismatches.append((fields, legacy, record.navigate_time))
+    return mismatches
+
+
+def per_call(func, items: list, repeats: int = 5):
+    """
+    Лучшее из repeats среднее время вызова func на элементах items
+    """
+    best = None
+    for _ in range(repeats):
+        started = time.perf_counter()
+        for item in items:
+            func(item)
+        elapsed = (time.perf_counter() - started) / len(items)
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--packets", type=int, default=5000)
+    options = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    corpus = build_corpus(options.packets)
+    mismatches = check_parity(corpus)
+    print(f"Parity: {len(corpus)} field sets, {len(mismatches)} mismatches")
+    for fields, legacy, fused in mismatches[:20]:
+        print(f"  {';'.join(map(str, fields))}")
+        print(f"    legacy: {legacy}\n    fused:  {fused}")
+
+    rnd = random.Random(2)
+    track = Track(rnd)
+    cut = [wialon_record(track.step(5), False).split(";") + ["1"] for _ in range(500)]
+    extend = [wialon_record(track.step(5), True).split(";") + ["1"] for _ in range(500)]
+    packets = [
+        wialon_data_packet(track.step(5), True).decode().rstrip("\r\n")
+        for _ in range(500)
+    ]
+
+    def check_packet(decode):
+        # Как в extend_check: разбор и проверка полей, затем crc16
+        def check(data: str):
+            valid_code, extend_data = decode(data[3:].split(";"), "1")
+            if valid_code == "1":
+                body = data[3 : data.rfind(";") + 1]
+                return extend_data.crc16 == crc(body, "crc-16")
+
+        return check
+
+    def fused_extend(fields: list, imei: str):
+        return decode_extend(fields, imei, logger)
+
+    assert all(map(check_packet(fused_extend), packets))
+    results = [
+        (
+            "cut fields",
+            per_call(lambda fields: legacy_cut(fields, "1"), cut),
+            per_call(lambda fields: decode_cut(fields, "1", logger), cut),
+        ),
+        (
+            "extend fields",
+            per_call(lambda fields: legacy_extend(fields, "1"), extend),
+            per_call(lambda fields: fused_extend(fields, "1"), extend),
+        ),
+        (
+            "extend packet",
+            per_call(check_packet(legacy_extend), packets),
+            per_call(check_packet(fused_extend), packets),
+        ),
+    ]
+    print(f"{'benchmark':<24}{'legacy us':>12}{'fused us':>12}{'speedup':>10}")
+    for name, legacy, fused in results:
+        speedup = legacy / fused
+        print(f"{name:<24}{legacy * 1e6:>12.2f}{fused * 1e6:>12.2f}{speedup:>9.1f}x")
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
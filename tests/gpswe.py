@@ -1,4 +1,59 @@
+import asyncio
+import contextlib
+import datetime
+import decimal
+import json
+import logging
+import os
 import socket
+import struct
+import sys
+import time
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(TESTS_DIR, "..", "gpswe"))
+
+from protocols.utils.egts_decoder import (  # noqa: E402
+    RecordHeader,
+    decode_pos_data,
+    decode_subrecords,
+    decode_transport_header,
+    iter_records,
+    iter_subrecords,
+    register_subrecord_decoder,
+    SUBRECORD_DECODERS,
+)
+from protocols.utils.egts_packages import (  # noqa: E402
+    data_encode_package,
+    data_response,
+)
+from protocols.egts import egts_protocol  # noqa: E402
+from protocols.db.decorator import backoff  # noqa: E402
+from protocols.detection import Protocols  # noqa: E402
+from protocols.session import Session  # noqa: E402
+from protocols.wialon import get_session_imei  # noqa: E402
+import connections  # noqa: E402
+from db import postgres  # noqa: E402
+from protocols.utils.wialon_decoder import decode_extend  # noqa: E402
+from protocols.models.validators import check_params  # noqa: E402
+from protocols.utils.wialon_stream import (  # noqa: E402
+    FrameSizeError,
+    WialonFramer,
+    split_wialon_datagram,
+)
+from protocols.utils.egts_stream import EGTSFramer  # noqa: E402
+from protocols.utils.datetime_decoder import (  # noqa: E402
+    decode_date,
+    decode_time,
+    timestamp,
+)
+from protocols.utils.calculation_data.checksum import (  # noqa: E402
+    CRC8_EGTS,
+    CRC_CCITT_FALSE,
+)
+
+EGTS_PACKET = b'\x01\x00\x02\x0b\x00\xe4\x01\x00\x00\x01\xb9j\x00\xcf/\x959\xfa\xd4C\xdeM)\x19\x02\x02\x10\x18\x00\xdeM)\x19\xec\x0e*\xae\x13+IH\x81\x00\x00\xff\x00\x00\x00\x10\x00?\x00\x00\x11\x04\x00\x18\x0c\x03\x00\x12\t\x00\x00\x00\x03\xff\x00\x00\xe8\x03\x00\x1b\x07\x00\x01\x00\x00H\x0b\x00\x00\x1b\x07\x00B\x00\x00\x00\x00\x00\x00\x1b\x07\x00C\x00\x00\x00\x00\x00\x00\x1b\x07\x00D\x00\x00\x00\x00\x00\x00\x1b\x07\x00E\x00\x00\x00\x00\x00\x00\x1b\x07\x00F\x00\x00\x00\x00\x00\x00j\x00\xd0/\x959\xfa\xd4C\xe0M)\x19\x02\x02\x10\x18\x00\xe0M)\x19L\x11*\xaeY,IH\x81M\x000\x00\x00\x00\x10\x00?\x00\x00\x11\x04\x00\x18\x0c\x03\x00\x12\t\x00\x00\x00\x03\xff\x00\x00\xe8\x03\x00\x1b\x07\x00\x01\x00\x00H\x0b\x00\x00\x1b\x07\x00B\x00\x00\x00\x00\x00\x00\x1b\x07\x00C\x00\x00\x00\x00\x00\x00\x1b\x07\x00D\x00\x00\x00\x00\x00\x00\x1b\x07\x00E\x00\x00\x00\x00\x00\x00\x1b\x07\x00F\x00\x00\x00\x00\x00\x00j\x00\xd1/\x959\xfa\xd4C\x07N)\x19\x02\x02\x10\x18\x00\x07N)\x19S\x15*\xaeN/IH\x81\x1e\x008\x00\x00\x00\x10\x00C\x00\x00\x11\x04\x00\x18\x0c\x03\x00\x12\t\x00\x00\x00\x03\xff\x00\x00\xe8\x03\x00\x1b\x07\x00\x01\x00\x00H\x0b\x00\x00\x1b\x07\x00B\x00\x00\x00\x00\x00\x00\x1b\x07\x00C\x00\x00\x00\x00\x00\x00\x1b\x07\x00D\x00\x00\x00\x00\x00\x00\x1b\x07\x00E\x00\x00\x00\x00\x00\x00\x1b\x07\x00F\x00\x00\x00\x00\x00\x00j\x00\xd2/\x959\xfa\xd4CAN)\x19\x02\x02\x10\x18\x00AN)\x19\xd5\x14*\xae\xca,IH\x81\x00\x80\x07\x00\x00\x00\x10\x00B\x00\x00\x11\x04\x00\x18\x0c\x03\x00\x12\t\x00\x00\x00\x03\xff\x00\x00\xe8\x03\x00\x1b\x07\x00\x01\x00\x00H\x0b\x00\x00\x1b\x07\x00B\x00\x00\x00\x00\x00\x00\x1b\x07\x00C\x00\x00\x00\x00\x00\x00\x1b\x07\x00D\x00\x00\x00\x00\x00\x00\x1b\x07\x00E\x00\x00\x00\x00\x00\x00\x1b\x07\x00F\x00\x00\x00\x00\x00\x00\x0f\x1b'
+EGTS_RESPONSE = b'\x01\x00\x00\x0b\x007\x00\x00\x00\x00\xcb\x00\x00\x00\x06\x00\x00\x00\x00\x02\x02\x00\x03\x00\xcf/\x00\x06\x00\x01\x00\x00\x02\x02\x00\x03\x00\xd0/\x00\x06\x00\x02\x00\x00\x02\x02\x00\x03\x00\xd1/\x00\x06\x00\x03\x00\x00\x02\x02\x00\x03\x00\xd2/\x00\xf9W'
 
 
 def check_login_wialon():
@@ -13,6 +68,42 @@ def check_login_wialon():
     assert check_data == data
 
 
+def check_split_login_wialon():
+    """
+    Проверка на обработку пакета логина Wialon, разбитого на несколько чтений
+    """
+    check_data = b'#AL#1\r\n'
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.connect(("localhost", 10500))
+        s.sendall(b"#L#2.0;1231")
+        time.sleep(0.2)
+        s.sendall(b"23123;NA;45387\r")
+        time.sleep(0.2)
+        s.sendall(b"\n")
+        data = s.recv(1024)
+    assert check_data == data
+
+
+def check_pipelined_wialon():
+    """
+    Проверка на обработку нескольких пакетов Wialon в одном чтении
+    """
+    check_data = b'#AL#1\r\n#ASD#1\r\n'
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.connect(("localhost", 10500))
+        s.sendall(
+            b"#L#2.0;123123123;NA;45387\r\n"
+            b"#SD#230521;022715.154786;5544.6025;N;03739.6834;E;120;15;10;2;37391\r\n"
+        )
+        data = b""
+        while len(data) < len(check_data):
+            chunk = s.recv(1024)
+            if not chunk:
+                break
+            data += chunk
+    assert check_data == data
+
+
 def check_cut_wialon():
     """
     Проверка на обработку сокращенного пакета с данными Wialon
@@ -33,19 +124,649 @@ def check_extend_wialon():
     with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
         s.connect(("localhost", 10500))
         s.sendall(
-            b"#D#180523;191852.125476;6718.3062;N;07904.4501;E;0;307;8;13;0.600000;57344;838926351;12.425000,,2.501000,,0.563000,,0.000000,NA,NA,NA,NA,3.183000,,0.000000,,2425.000000,,2501.000000,,563.000000,,0.000000;NA;GSM_STATUS:1:3,ACC_TRIGGER:1:1,PWR_EXT:2:25.527000,PWR_INT:2:4.183000,ACC:2:497530.544000,ACCX:1:688,ACCY:1:493,ACCZ:1:474,VALID:1:0,SOFT:1:201;19869\r\n")
+            b"#D#180523;191852.125476;6718.3062;N;07904.4501;E;0;307;8;13;0.600000;57344;838926351;12.425000,,2.501000,,0.563000,,0.000000,NA,NA,NA,NA,3.183000,,0.000000,,2425.000000,,2501.000000,,563.000000,,0.000000;NA;GSM_STATUS:1:3,ACC_TRIGGER:1:1,PWR_EXT:2:25.527000,PWR_INT:2:4.183000,ACC:2:497530.544000,ACCX:1:688,ACCY:1:493,ACCZ:1:474,VALID:1:0,SOFT:1:201;38115\r\n")
         data = s.recv(1024)
     assert check_data == data
 
 
+def check_black_box_wialon():
+    """
+    Проверка на обработку пакета черного ящика Wialon
+    """
+    check_data = b'#AB#2\r\n'
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.connect(("localhost", 10500))
+        s.sendall(b"#L#2.0;123123123;NA;45387\r\n")
+        s.recv(1024)
+        s.sendall(
+            b"#B#230521;022715.154786;5544.6025;N;03739.6834;E;120;15;10;2|"
+            b"180523;191852.125476;6718.3062;N;07904.4501;E;0;307;8;13;0.600000;57344;838926351;12.425000,,2.501000;NA;GSM_STATUS:1:3,PWR_EXT:2:25.527000|8888\r\n"
+        )
+        data = s.recv(1024)
+    assert check_data == data
+
+
+def check_udp_cut_wialon():
+    """
+    Проверка на обработку сокращенного пакета Wialon, полученного по UDP.
+    Сервер запускается с settings.WIALON_UDP_PORT = 10500
+    """
+    check_data = b'#ASD#1\r\n'
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+        s.settimeout(5)
+        s.sendto(
+            b"123123123;#SD#230521;022715.154786;5544.6025;N;03739.6834;E;120;15;10;2;37391\r\n",
+            ("localhost", 10500),
+        )
+        data, _ = s.recvfrom(1024)
+    assert check_data == data
+
+
 def check_egts():
     """
     Проверка на обработку пакета с данными EGTS
     """
-    check_data = b'\x80\x04\x95*\x00\x00\x00\x00\x00\x00\x00]\x94(K\x01K\x00K\x00K\x0bK\x00K\x03K\x00K\x01K\x00K\x00\x8c\x040x8e\x94K\x00K\x00\x8c\x030x0\x94e.'
+    check_data = EGTS_RESPONSE
     with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
         s.connect(("localhost", 10500))
-        s.sendall(
-            b'\x01\x00\x02\x0b\x00\xe4\x01\x00\x00\x01\xb9J\x00\xcf/\x959\xfa\xd4C\xdeM)\x19\x02\x02\x10\x18\x00\xdeM)\x19\xec\x0e*\xae\x13+IH\x81\x00\x00\xff\x00\x00\x00\x10\x00?\x00\x00\x11\x04\x00\x18\x0c\x03\x00\x12\t\x00\x00\x00\x03\xff\x00\x00\xe8\x03\x00\x1b\x07\x00\x01\x00\x00H\x0b\x00\x00\x1b\x07\x00B\x00\x00\x00\x00\x00\x00\x1b\x07\x00C\x00\x00\x00\x00\x00\x00\x1b\x07\x00D\x00\x00\x00\x00\x00\x00\x1b\x07\x00E\x00\x00\x00\x00\x00\x00\x1b\x07\x00F\x00\x00\x00\x00\x00\x00J\x00\xd0/\x959\xfa\xd4C\xe0M)\x19\x02\x02\x10\x18\x00\xe0M)\x19L\x11*\xaeY,IH\x81M\x000\x00\x00\x00\x10\x00?\x00\x00\x11\x04\x00\x18\x0c\x03\x00\x12\t\x00\x00\x00\x03\xff\x00\x00\xe8\x03\x00\x1b\x07\x00\x01\x00\x00H\x0b\x00\x00\x1b\x07\x00B\x00\x00\x00\x00\x00\x00\x1b\x07\x00C\x00\x00\x00\x00\x00\x00\x1b\x07\x00D\x00\x00\x00\x00\x00\x00\x1b\x07\x00E\x00\x00\x00\x00\x00\x00\x1b\x07\x00F\x00\x00\x00\x00\x00\x00J\x00\xd1/\x959\xfa\xd4C\x07N)\x19\x02\x02\x10\x18\x00\x07N)\x19S\x15*\xaeN/IH\x81\x1e\x008\x00\x00\x00\x10\x00C\x00\x00\x11\x04\x00\x18\x0c\x03\x00\x12\t\x00\x00\x00\x03\xff\x00\x00\xe8\x03\x00\x1b\x07\x00\x01\x00\x00H\x0b\x00\x00\x1b\x07\x00B\x00\x00\x00\x00\x00\x00\x1b\x07\x00C\x00\x00\x00\x00\x00\x00\x1b\x07\x00D\x00\x00\x00\x00\x00\x00\x1b\x07\x00E\x00\x00\x00\x00\x00\x00\x1b\x07\x00F\x00\x00\x00\x00\x00\x00J\x00\xd2/\x959\xfa\xd4CAN)\x19\x02\x02\x10\x18\x00AN)\x19\xd5\x14*\xae\xca,IH\x81\x00\x80\x07\x00\x00\x00\x10\x00B\x00\x00\x11\x04\x00\x18\x0c\x03\x00\x12\t\x00\x00\x00\x03\xff\x00\x00\xe8\x03\x00\x1b\x07\x00\x01\x00\x00H\x0b\x00\x00\x1b\x07\x00B\x00\x00\x00\x00\x00\x00\x1b\x07\x00C\x00\x00\x00\x00\x00\x00\x1b\x07\x00D\x00\x00\x00\x00\x00\x00\x1b\x07\x00E\x00\x00\x00\x00\x00\x00\x1b\x07\x00F\x00\x00\x00\x00\x00\x00\xc5\xc6')
+        s.sendall(EGTS_PACKET)
         data = s.recv(1024)
     assert check_data == data
+
+
+def check_pipelined_egts():
+    """
+    Проверка на обработку нескольких пакетов EGTS в одном чтении и пакета,
+    разбитого на несколько чтений
+    """
+    size = len(EGTS_RESPONSE)
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.connect(("localhost", 10500))
+        s.sendall(EGTS_PACKET + EGTS_PACKET + EGTS_PACKET[:20])
+        time.sleep(0.2)
+        s.sendall(EGTS_PACKET[20:])
+        data = b""
+        while len(data) < size * 3:
+            chunk = s.recv(1024)
+            if not chunk:
+                break
+            data += chunk
+    assert data[:size] == EGTS_RESPONSE
+    assert len(data) == size * 3
+    for index in range(3):
+        response = data[index * size : (index + 1) * size]
+        # PID и RN ответов продолжают нумерацию в пределах соединения
+        assert decode_transport_header(response).pid == index
+        assert response[11:14] == b"\x00\x00\x00"
+        records = list(iter_records(response, 14, size - 2))
+        assert [record.record_number for record in records] == [
+            index * 4 + number for number in range(4)
+        ]
+        assert response[-2:] == struct.pack("<H", CRC_CCITT_FALSE(response[11:-2]))
+
+
+def check_egts_transport_header():
+    """
+    Проверка разбора транспортного заголовка EGTS эталонного пакета
+    """
+    header = decode_transport_header(EGTS_PACKET)
+    assert header.protocol_version == 1
+    assert header.security_key_id == 0
+    assert (header.prefix, header.route, header.encryption) == (0, False, 0)
+    assert (header.compressed, header.priority) == (False, 2)
+    assert header.header_length == 11
+    assert header.frame_data_length == 484
+    assert (header.pid, header.packet_type) == (0, 1)
+    assert header.hcs == 0xB9 == CRC8_EGTS(EGTS_PACKET[:10])
+    assert EGTS_PACKET[-2:] == struct.pack("<H", CRC_CCITT_FALSE(EGTS_PACKET[11:-2]))
+
+
+def check_egts_routed_header():
+    """
+    Проверка разбора заголовка с маршрутизацией (HL = 16) по ГОСТ 33472
+    """
+    header = bytearray(
+        struct.pack("<BBBBBHHBHHB", 1, 7, 0b01111011, 16, 0, 0, 513, 1, 2, 3, 4)
+    )
+    header.append(CRC8_EGTS(header))
+    decoded = decode_transport_header(header)
+    assert (decoded.prefix, decoded.route, decoded.encryption) == (1, True, 3)
+    assert (decoded.compressed, decoded.priority) == (False, 3)
+    assert (decoded.pid, decoded.pra, decoded.rca, decoded.ttl) == (513, 2, 3, 4)
+    assert decoded.hcs == header[15]
+
+
+def check_egts_routed_header_length():
+    """
+    Проверка ответа EGTS_PC_INC_HEADERFORM, если HL не совпадает с флагом RTE
+    """
+    for flags, header_length in ((0b00100000, 11), (0b00000000, 16)):
+        header = bytearray(
+            struct.pack("<BBBBBHHB", 1, 0, flags, header_length, 0, 0, 7, 1)
+        )
+        header += bytes(header_length - len(header) - 1)
+        header.append(CRC8_EGTS(header))
+        decoded = decode_transport_header(header)
+        assert (decoded.pra, decoded.rca, decoded.ttl) == (None, None, None)
+        response = asyncio.run(egts_protocol(header, None))
+        assert response[11:14] == struct.pack("<HB", 7, 131)
+
+
+def check_egts_records():
+    """
+    Проверка разбора записей и подзаписей эталонного пакета
+    """
+    records = list(iter_records(EGTS_PACKET, 11, len(EGTS_PACKET) - 2))
+    assert [record.record_number for record in records] == [12239, 12240, 12241, 12242]
+    for record in records:
+        assert record.record_length == 106
+        assert record.flags == 0x95
+        assert (record.oid, record.evid) == (1138031161, None)
+        assert (record.source_service, record.recipient_service) == (2, 2)
+        subrecords = [item[0] for item in iter_subrecords(EGTS_PACKET, record)]
+        assert subrecords == [16, 17, 18] + [27] * 6
+    assert records[0].time == 422137310
+    assert records[0].data_offset == 26
+
+
+def check_egts_pos_data():
+    """
+    Проверка разбора подзаписей EGTS_SR_POS_DATA эталонного пакета
+    """
+    expected = [
+        (datetime.datetime(2023, 5, 18, 20, 21, 50), 61.2296333, 50.8259626, 0.0, 255),
+        (datetime.datetime(2023, 5, 18, 20, 21, 52), 61.229646, 50.8259763, 7.7, 48),
+        (datetime.datetime(2023, 5, 18, 20, 22, 31), 61.2296676, 50.826008, 3.0, 56),
+        (datetime.datetime(2023, 5, 18, 20, 23, 29), 61.229665, 50.825981, 0.0, 263),
+    ]
+    decoded = []
+    for record in iter_records(EGTS_PACKET, 11, len(EGTS_PACKET) - 2):
+        _, offset, length = next(iter_subrecords(EGTS_PACKET, record))
+        pos_data = decode_pos_data(EGTS_PACKET, offset, length)
+        assert (pos_data.flags, pos_data.odometer, pos_data.source) == (0x81, 0, 0)
+        assert pos_data.navigate_time.tzinfo is datetime.timezone.utc
+        decoded.append(
+            (
+                pos_data.navigate_time.replace(tzinfo=None),
+                pos_data.lat_deg,
+                pos_data.long_deg,
+                pos_data.speed,
+                pos_data.course,
+            )
+        )
+    assert decoded == expected
+
+
+def check_egts_pos_data_flags():
+    """
+    Проверка знаков координат и высоты, старшего бита направления
+    """
+    subrecord = struct.pack(
+        "<IIIBHB3sBB3s",
+        100,
+        0xFFFFFFFF // 2,
+        0xFFFFFFFF // 4,
+        0x01 | 0x20 | 0x40 | 0x80,
+        0x8000 | 0x4000 | 1234,
+        0x2C,
+        (5).to_bytes(3, "little"),
+        0,
+        0,
+        (150).to_bytes(3, "little"),
+    )
+    pos_data = decode_pos_data(subrecord, 0, len(subrecord))
+    assert pos_data.navigate_time == datetime.datetime(
+        2010, 1, 1, 0, 1, 40, tzinfo=datetime.timezone.utc
+    )
+    assert (pos_data.lat_deg, pos_data.long_deg) == (-45.0, -45.0)
+    assert (pos_data.speed, pos_data.course) == (123.4, 300)
+    assert (pos_data.odometer, pos_data.altitude) == (5, -150)
+
+
+def check_egts_subrecords():
+    """
+    Проверка разбора всех подзаписей записи эталонного пакета
+    """
+    record = next(iter_records(EGTS_PACKET, 11, len(EGTS_PACKET) - 2))
+    decoded = decode_subrecords(EGTS_PACKET, record)
+    subrecords = dict(decoded[:3])
+    assert subrecords[16].altitude == 63
+    assert subrecords[17] == (None, None, None, 12, 3)
+    assert subrecords[18] == (0, {}, {1: 255, 2: 1000})
+    sensors = [item for srt, item in decoded if srt == 27]
+    assert [(item.number, item.error, item.value) for item in sensors] == [
+        (1, False, 2888),
+        (2, True, 0),
+        (3, True, 0),
+        (4, True, 0),
+        (5, True, 0),
+        (6, True, 0),
+    ]
+
+
+def check_egts_subrecord_registry():
+    """
+    Проверка пропуска неизвестных подзаписей по SRL и регистрации своего разбора
+    """
+    record_data = (
+        struct.pack("<BH", 200, 4)
+        + b"\xff\xff\xff\xff"
+        + struct.pack("<BH", 19, 7)
+        + bytes([0b101])
+        + (7).to_bytes(3, "little")
+        + (9).to_bytes(3, "little")
+        + struct.pack("<BH", 20, 5)
+        + bytes([2, 124, 41, 0, 1])
+    )
+    record = RecordHeader(len(record_data), 1, 0, None, None, None, 2, 2, 0)
+    subrecords = decode_subrecords(record_data, record)
+    assert [srt for srt, _ in subrecords] == [200, 19, 20]
+    assert subrecords[0][1] is None
+    assert subrecords[1][1].counters == {1: 7, 3: 9}
+    assert subrecords[2][1] == (2, 12.4, 4.1, 0.0, 1)
+    try:
+        register_subrecord_decoder(200)(lambda data, offset, length: length)
+        assert decode_subrecords(record_data, record)[0] == (200, 4)
+    finally:
+        SUBRECORD_DECODERS.pop(200)
+
+
+def check_egts_subrecord_length():
+    """
+    Проверка ошибки разбора подзаписей, поля которых не помещаются в SRL
+    """
+    subrecords = [
+        (16, bytes(20)),
+        (17, bytes([0b01000])),
+        (18, bytes([0b1, 0, 0b11, 1, 0, 0, 0])),
+        (19, bytes([0b101, 7, 0, 0])),
+        (20, bytes(4)),
+        (27, bytes([0, 1, 0, 5])),
+    ]
+    for subrecord_type, subrecord in subrecords:
+        record_data = struct.pack("<BH", subrecord_type, len(subrecord)) + subrecord
+        # Следующая подзапись, из которой нельзя читать
+        record_data += struct.pack("<BH", 200, 8) + b"\xff" * 8
+        record = RecordHeader(len(record_data), 1, 0, None, None, None, 2, 2, 0)
+        try:
+            decode_subrecords(record_data, record)
+        except ValueError:
+            continue
+        raise AssertionError(f"SRT {subrecord_type} is decoded past SRL")
+
+
+def check_egts_ingest_subrecords():
+    """
+    Проверка сохранения точек EGTS_SR_POS_DATA, если остальные подзаписи
+    записи испорчены или их разбор завершается ошибкой
+    """
+    pos_data = struct.pack(
+        "<IIIBHB3sBB", 100, 0xFFFFFFFF // 2, 0xFFFFFFFF // 4, 1, 10, 0, bytes(3), 0, 0
+    )
+    record_data = (
+        struct.pack("<BH", 16, len(pos_data))
+        + pos_data
+        + struct.pack("<BH", 18, 3)
+        + bytes([0, 0, 0b11])
+        + struct.pack("<BH", 200, 1)
+        + b"\x00"
+    )
+    data = struct.pack("<HHBIBB", len(record_data), 1, 1, 1001, 2, 2) + record_data
+
+    def broken_decoder(data, offset, length):
+        raise RuntimeError("broken decoder")
+
+    records = []
+    try:
+        register_subrecord_decoder(200, broken_decoder)
+        result_code, points = asyncio.run(
+            data_encode_package(data, 0, 0, len(data), records)
+        )
+    finally:
+        SUBRECORD_DECODERS.pop(200)
+    assert (result_code, len(records)) == (0, 1)
+    assert [(point.oid, point.lat_deg, point.long_deg) for point in points] == [
+        (1001, 45.0, 45.0)
+    ]
+
+
+def check_egts_response():
+    """
+    Проверка ответа EGTS_PT_RESPONSE на эталонный пакет и ответа с ошибкой
+    """
+    records = list(iter_records(EGTS_PACKET, 11, len(EGTS_PACKET) - 2))
+    response = asyncio.run(data_response(0, 0, records))
+    assert response == EGTS_RESPONSE
+    header = decode_transport_header(response)
+    assert (header.packet_type, header.frame_data_length) == (0, 3 + 13 * 4)
+    assert header.hcs == CRC8_EGTS(response[:10])
+    confirmed = [
+        decode_subrecords(response, record)
+        for record in iter_records(response, 14, len(response) - 2)
+    ]
+    assert confirmed == [[(0, (number, 0))] for number in range(12239, 12243)]
+    response = asyncio.run(data_response(513, 138))
+    assert response[11:14] == struct.pack("<HB", 513, 138)
+    assert decode_transport_header(response).frame_data_length == 3
+    assert response[-2:] == struct.pack("<H", CRC_CCITT_FALSE(response[11:-2]))
+
+
+def check_egts_response_broken_record():
+    """
+    Проверка ответа EGTS_PC_INC_DATAFORM без подтверждения записей и без
+    сохранения точек, если разбор записей прерывается на середине пакета
+    """
+    saved = []
+
+    class Ingest:
+        async def put(self, save, data):
+            saved.append(data)
+
+    first = next(iter_records(EGTS_PACKET, 11, len(EGTS_PACKET) - 2))
+    second = first.data_offset + first.record_length
+    packet = bytearray(EGTS_PACKET)
+    # RL второй записи выходит за границу тела пакета
+    packet[second : second + 2] = struct.pack("<H", 0xFFFF)
+    packet[-2:] = struct.pack("<H", CRC_CCITT_FALSE(packet[11:-2]))
+    logging.disable(logging.CRITICAL)
+    try:
+        response = asyncio.run(egts_protocol(packet, Ingest()))
+    finally:
+        logging.disable(logging.NOTSET)
+    assert response[11:14] == struct.pack("<HB", 0, 132)
+    assert decode_transport_header(response).frame_data_length == 3
+    assert saved == []
+
+
+def check_datetime_decoder():
+    """
+    Проверка разбора даты и времени Wialon по сравнению с strptime
+    """
+    dates = ["180523", "010100", "311299", "010169", "290224", "1523", "0105 23"]
+    errors = ["290223", "320523", "000523", "011323", "1.0523", "18052", "NA"]
+    for value in dates + errors:
+        try:
+            expected = datetime.datetime.strptime(value, "%d%m%y").date()
+        except ValueError:
+            expected = ValueError
+        try:
+            assert decode_date(value) == expected
+        except ValueError:
+            assert expected is ValueError, value
+    times = ["202150.0", "000000.000001", "235959.999999", "120000.5", "1200.5"]
+    errors = ["240000.0", "235960.5", "000000.", "120000", "120000.1234567"]
+    for value in times + errors:
+        try:
+            expected = datetime.datetime.strptime(value, "%H%M%S.%f").time()
+        except ValueError:
+            expected = ValueError
+        try:
+            assert decode_time(value) == expected
+        except ValueError:
+            assert expected is ValueError, value
+    moment = timestamp(decode_date("180523"), decode_time("202150.25"))
+    assert moment.isoformat() == "2023-05-18T20:21:50.250000+00:00"
+
+
+def check_wialon_sensors():
+    """
+    Проверка значений доп. параметров по типам и значений ADC
+    """
+    fields = "180523;202150.0;5544.6025;N;03739.6834;E;10;90;150;11;0.9;3;0;"
+    fields += "1,2.5,x,inf;NA;GSM_STATUS:1:3,PWR_EXT:2:25.527,NAME:1:abc,EMPTY:2;1"
+    logger = logging.getLogger("gpswe::check_wialon_sensors")
+    valid_code, record = decode_extend(fields.split(";"), "1", logger)
+    assert valid_code == "1"
+    assert json.loads(record.sensors) == {
+        "GSM_STATUS": 3,
+        "PWR_EXT": 25.527,
+        "NAME": "abc",
+        "EMPTY": None,
+    }
+    assert record.adc_values == [decimal.Decimal(1), decimal.Decimal("2.5"), None, None]
+
+
+def check_wialon_params_codes():
+    """
+    Проверка кодов ошибок доп. параметров: строковые значения ErrorData
+    """
+    prefix = "180523;202150.0;5544.6025;N;03739.6834;E;10;90;150;11;0.9;3;0;1;NA;"
+    logger = logging.getLogger("gpswe::check_wialon_params_codes")
+    for params, expected in (
+        ("A:1:1,B C:1:1", "15.2"),
+        ("A" * 41 + ":1:1", "15.1"),
+        ("A:x:1", "15"),
+    ):
+        fields = f"{prefix}{params};1".split(";")
+        valid_code, record = decode_extend(fields, "1", logger)
+        assert (valid_code, record) == (expected, None), params
+        assert check_params(params) == (expected, None), params
+
+
+def check_backoff_coroutine():
+    """
+    Проверка повторных попыток backoff для корутин (создание пула postgres)
+    """
+    attempts = []
+
+    @backoff(start_sleep_time=0.001, border_sleep_time=0.01, tries=3)
+    async def connect(fail: int):
+        attempts.append(fail)
+        if len(attempts) <= fail:
+            raise ConnectionRefusedError()
+        return "connected"
+
+    assert asyncio.run(connect(2)) == "connected" and len(attempts) == 3
+    attempts.clear()
+    try:
+        asyncio.run(connect(3))
+        raise AssertionError("the last error is not raised")
+    except ConnectionRefusedError:
+        assert len(attempts) == 3
+
+
+def check_wialon_short_frames():
+    """
+    Проверка пропуска обрывков короче типа пакета ("#", "#L")
+    """
+    framer = WialonFramer()
+    frames = framer.feed(b"#\r\n#L\r\n\r\n#P#\r\n")
+    assert frames == ["#P#"] and framer.pending == 0
+    assert split_wialon_datagram(b"1;#\r\n1;#SD\r\n") == [("1", "#SD")]
+
+
+class FakeTransport:
+    """
+    Транспорт для проверки TrackerProtocol без сокета
+    """
+
+    def __init__(self):
+        self.closed = False
+        self.written = []
+
+    def get_extra_info(self, name):
+        return ("127.0.0.1", 50000)
+
+    def write(self, data):
+        self.written.append(data)
+
+    def is_closing(self):
+        return self.closed
+
+    def close(self):
+        self.closed = True
+
+    def pause_reading(self):
+        pass
+
+    def resume_reading(self):
+        pass
+
+
+def check_buffered_protocol_handler_error():
+    """
+    Проверка закрытия соединения TrackerProtocol при ошибке обработчика
+    """
+
+    async def failing_processor(frames, session, ingest):
+        raise RuntimeError("handler failed")
+
+    async def run():
+        buffer = memoryview(bytearray(64))
+        protocol = connections.TrackerProtocol(None, buffer, Protocols.WIALON)
+        transport = FakeTransport()
+        protocol.connection_made(transport)
+        packet = b"#L#2.0;1;NA;1\r\n"
+        buffer[: len(packet)] = packet
+        protocol.buffer_updated(len(packet))
+        await protocol.task
+        return protocol, transport
+
+    processor = connections.PROCESSORS[Protocols.WIALON]
+    connections.PROCESSORS[Protocols.WIALON] = failing_processor
+    logging.disable(logging.CRITICAL)
+    try:
+        protocol, transport = asyncio.run(run())
+    finally:
+        connections.PROCESSORS[Protocols.WIALON] = processor
+        logging.disable(logging.NOTSET)
+    assert transport.closed and protocol.task is None and not protocol.frames
+
+
+def check_stream_handler_error():
+    """
+    Проверка закрытия соединения handle_connection при ошибке обработчика
+    """
+
+    async def failing_processor(frames, session, ingest):
+        raise RuntimeError("handler failed")
+
+    async def run():
+        errors = []
+        asyncio.get_running_loop().set_exception_handler(
+            lambda loop, context: errors.append(context)
+        )
+        limits = connections.ConnectionLimits()
+        server = await asyncio.start_server(
+            lambda reader, writer: connections.handle_connection(
+                reader, writer, None, Protocols.WIALON, limits
+            ),
+            "127.0.0.1",
+            0,
+        )
+        port = server.sockets[0].getsockname()[1]
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(b"#L#2.0;1;NA;1\r\n")
+        data = await asyncio.wait_for(reader.read(), 5)
+        writer.close()
+        server.close()
+        await server.wait_closed()
+        return data, limits.active, errors
+
+    processor = connections.PROCESSORS[Protocols.WIALON]
+    connections.PROCESSORS[Protocols.WIALON] = failing_processor
+    logging.disable(logging.CRITICAL)
+    try:
+        data, active, errors = asyncio.run(run())
+    finally:
+        connections.PROCESSORS[Protocols.WIALON] = processor
+        logging.disable(logging.NOTSET)
+    assert (data, active, errors) == (b"", 0, [])
+
+
+def check_session_client_lookup_once():
+    """
+    Проверка одного запроса к таблице client за соединение для неизвестного
+    трекера
+    """
+    queries = []
+
+    class Connection:
+        async def fetchval(self, sql, ip):
+            queries.append(ip)
+
+    class Pool:
+        @contextlib.asynccontextmanager
+        async def acquire(self):
+            yield Connection()
+
+    class Ingest:
+        pool = Pool()
+
+    async def run(session):
+        return [await get_session_imei(session, Ingest()) for _ in range(3)]
+
+    session = Session(("127.0.0.1", 50000))
+    assert asyncio.run(run(session)) == [None, None, None]
+    assert queries == ["127.0.0.1"]
+
+
+def check_postgres_get_info_sources():
+    """
+    Проверка получения данных по GPS по параметрам подключения и через пул
+    """
+    queries = []
+
+    class Connection:
+        async def fetchval(self, sql):
+            queries.append(sql)
+            return False
+
+        async def close(self):
+            queries.append("close")
+
+    class Pool:
+        @contextlib.asynccontextmanager
+        async def acquire(self):
+            yield Connection()
+
+    async def connect(**dsl):
+        queries.append(dsl)
+        return Connection()
+
+    async def run():
+        moment = datetime.datetime(2023, 5, 18)
+        return [
+            await postgres.postgres_get_info({"host": "db"}, "1", moment, moment),
+            await postgres.postgres_pool_get_info(Pool(), "1", moment, moment),
+        ]
+
+    original_connect = postgres.asyncpg.connect
+    postgres.asyncpg.connect = connect
+    try:
+        results = asyncio.run(run())
+    finally:
+        postgres.asyncpg.connect = original_connect
+    assert results == [{"speed": "", "distance": "", "coordinates": []}] * 2
+    assert queries[0] == {"host": "db"} and queries[4] == "close"
+    assert len(queries) == 8
+
+
+def check_wialon_framer_frame_size():
+    """
+    Проверка FrameSizeError и очистки буфера для слишком длинной строки Wialon
+    """
+    framer = WialonFramer(max_frame_size=100)
+    try:
+        framer.feed(b"#D#" + b"1" * 300 + b"\r\n#P#\r\n")
+        raise AssertionError("FrameSizeError is not raised")
+    except FrameSizeError as e:
+        assert e.args == (303,)
+    assert framer.pending == 0
+    assert framer.feed(b"#P#\r\n") == ["#P#"]
+
+
+def check_egts_framer_frame_size():
+    """
+    Проверка FrameSizeError и очистки буфера для слишком длинного пакета EGTS
+    """
+    framer = EGTSFramer(max_frame_size=100)
+    try:
+        framer.feed(b"\x01\x00\x00\x0b\x00\x2c\x01" + bytes(304))
+        raise AssertionError("FrameSizeError is not raised")
+    except FrameSizeError as e:
+        assert e.args == (11 + 300 + 2,)
+    assert framer.pending == 0
+    # Пакет без данных уровня поддержки услуг (FDL = 0)
+    header = b"\x01\x00\x00\x0b\x00\x00\x00\x01\x00\x01\x00"
+    assert framer.feed(header) == [header]